@@ -211,7 +211,7 @@ def load(trajfiles, features=None, top=None, stride=1, chunk_size=None, **kw):
         raise ValueError('unsupported type (%s) of input' % type(trajfiles))
 
 
-def source(inp, features=None, top=None, chunk_size=None, **kw):
+def source(inp, features=None, top=None, chunk_size=None, lazy=False, **kw):
     r""" Defines trajectory data source
 
     This function defines input trajectories without loading them. You can pass
@@ -250,6 +250,8 @@ def source(inp, features=None, top=None, chunk_size=None, **kw):
         9. Nested lists (1 level) like), eg.:
                 [['traj1_0.xtc', 'traj1_1.xtc'], 'traj2_full.xtc'], ['traj3_0.xtc, ...]]
            the grouped fragments will be treated as a joint trajectory.
+        10. Directory of a feature store, written by
+            :meth:`write_store <chainsaw.data._base.iterable.Iterable.write_store>`.
 
     features : MDFeaturizer, optional, default = None
         a featurizer object specifying how molecular dynamics files should be
@@ -263,9 +265,18 @@ def source(inp, features=None, top=None, chunk_size=None, **kw):
         trajectories are given and no featurizer is given.
         In this case, only the Cartesian coordinates will be read.
 
-    chunk_size: int, optional, default = 100 for file readers and 5000 for
+    chunk_size: int or 'auto', optional, default = 100 for file readers and 5000 for
         already loaded data The chunk size at which the input file is being
-        processed.
+        processed. If 'auto', the number of frames is derived from
+        config.memory_budget and the dimension of the data.
+
+    lazy : bool, default = False
+        Only applies to (non fragmented) file input. The files are not opened
+        up front, but their lengths are obtained once a trajectory is first
+        accessed (eg. by :func:`trajectory_length` or by an iteration reaching
+        the file). Only functions needing all lengths, like
+        :func:`n_frames_total`, obtain them all. Useful to start working on a
+        subset of a huge list of files instantly.
 
     Returns
     -------
@@ -334,7 +345,8 @@ def source(inp, features=None, top=None, chunk_size=None, **kw):
     if isinstance(inp, _string_types) or (
             isinstance(inp, (list, tuple))
             and (any(isinstance(item, (list, tuple, _string_types)) for item in inp) or len(inp) is 0)):
-        reader = create_file_reader(inp, top, features, chunk_size=chunk_size if chunk_size is not None else 100, **kw)
+        reader = create_file_reader(inp, top, features, chunk_size=chunk_size if chunk_size is not None else 100,
+                                    lazy=lazy, **kw)
 
     elif isinstance(inp, _np.ndarray) or (isinstance(inp, (list, tuple))
                                           and (any(isinstance(item, _np.ndarray) for item in inp) or len(inp) is 0)):
@@ -797,11 +809,14 @@ def save_trajs(traj_inp, indexes, prefix='set_', fmt=None, outfiles=None,
 
 def _get_input_stage(previous_stage):
     # this is a pipelining stage, so let's parametrize from it
+    from chainsaw import config
     from chainsaw.data._base.iterable import Iterable
     from chainsaw.data.data_in_memory import DataInMemory as _DataInMemory
 
     if isinstance(previous_stage, Iterable):
         inputstage = previous_stage
+        if config.cache_stages:
+            inputstage = _cached(inputstage)
     # second option: data is array or list of arrays
     else:
         data = _types.ensure_traj_list(previous_stage)
@@ -810,6 +825,14 @@ def _get_input_stage(previous_stage):
     return inputstage
 
 
+def _cached(stage):
+    # the cache identifies data by the files it originates from.
+    from chainsaw.data.cache import Cache
+    if isinstance(stage, Cache) or stage.filenames is None:
+        return stage
+    return Cache(stage, chunksize=stage.chunksize, fill_cache=False)
+
+
 def _param_stage(previous_stage, this_stage, stride=1, chunk_size=None):
     r""" Parametrizes the given pipelining stage if a valid source is given.
 
@@ -836,7 +859,7 @@ def _param_stage(previous_stage, this_stage, stride=1, chunk_size=None):
     return this_stage
 
 
-def pca(data=None, dim=-1, var_cutoff=0.95, stride=1, mean=None, skip=0):
+def pca(data=None, dim=-1, var_cutoff=0.95, stride=1, mean=None, skip=0, n_jobs=None):
     r""" Principal Component Analysis (PCA).
 
     PCA is a linear transformation method that finds coordinates of maximal
@@ -891,6 +914,13 @@ def pca(data=None, dim=-1, var_cutoff=0.95, stride=1, mean=None, skip=0):
         Optionally pass pre-calculated means to avoid their re-computation.
         The shape has to match the input dimension.
 
+    skip : int, default=0
+        skip the first initial n frames per trajectory.
+
+    n_jobs : int, optional, default=None
+        if greater than one, the input is read (and featurized) by this many worker
+        processes during the estimation.
+
     Returns
     -------
     pca : a :class:`PCA<chainsaw.transform.PCA>` transformation object
@@ -974,12 +1004,12 @@ def pca(data=None, dim=-1, var_cutoff=0.95, stride=1, mean=None, skip=0):
         import warnings
         warnings.warn("provided mean ignored", DeprecationWarning)
 
-    res = PCA(dim=dim, var_cutoff=var_cutoff, mean=None, skip=skip)
+    res = PCA(dim=dim, var_cutoff=var_cutoff, mean=None, skip=skip, n_jobs=n_jobs)
     return _param_stage(data, res, stride=stride)
 
 
 def tica(data=None, lag=10, dim=-1, var_cutoff=0.95, kinetic_map=True, stride=1,
-         force_eigenvalues_le_one=False, mean=None, remove_mean=True, skip=0):
+         force_eigenvalues_le_one=False, mean=None, remove_mean=True, skip=0, n_jobs=None):
     r""" Time-lagged independent component analysis (TICA).
 
     TICA is a linear transformation method. In contrast to PCA, which finds
@@ -1051,6 +1081,10 @@ def tica(data=None, lag=10, dim=-1, var_cutoff=0.95, kinetic_map=True, stride=1,
     skip : int, default=0
         skip the first initial n frames per trajectory.
 
+    n_jobs : int, optional, default=None
+        if greater than one, the input is read (and featurized) by this many worker
+        processes during the estimation.
+
     Returns
     -------
     tica : a :class:`TICA <chainsaw.transform.TICA>` transformation object
@@ -1150,7 +1184,7 @@ def tica(data=None, lag=10, dim=-1, var_cutoff=0.95, kinetic_map=True, stride=1,
         warnings.warn("user provided mean for TICA is deprecated and its value is ignored.")
 
     res = TICA(lag, dim=dim, var_cutoff=var_cutoff, kinetic_map=kinetic_map,
-               mean=mean, remove_mean=remove_mean, skip=skip)
+               mean=mean, remove_mean=remove_mean, skip=skip, n_jobs=n_jobs)
     return _param_stage(data, res, stride=stride)
 
 
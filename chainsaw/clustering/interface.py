@@ -32,6 +32,7 @@ from chainsaw.base.model import Model
 from chainsaw.clustering.indexes import index_states, sample_indexes_by_state
 from chainsaw.transform.transformer import StreamingTransformer
 from chainsaw.util.annotators import fix_docs
+from chainsaw.util.buffers import empty
 from chainsaw.util.files import mkdir_p
 from six.moves import range, zip
 
@@ -193,12 +194,16 @@ class AbstractClustering(StreamingTransformer, Model, ClusterMixin):
 
         return sample_indexes_by_state(self._index_states[clusters], nsample, replace=replace)
 
-    def _transform_array(self, X):
+    def _transform_array(self, X, buffers=None):
         """get closest index of point in :attr:`clustercenters` to x."""
-        dtraj = np.empty(X.shape[0], dtype=self.output_type())
+        # always return a column vector in this function
+        res = empty(buffers, self, 'dtraj', (X.shape[0], 1), self.output_type())
+        if buffers is not None and (X.dtype != np.float32 or not X.flags.c_contiguous):
+            X_f32 = buffers.empty(self, 'X', X.shape, np.float32)
+            X_f32[:] = X
+            X = X_f32
         _regspatial.assign(X.astype(np.float32, order='C', copy=False),
-                           self.clustercenters, dtraj, self.metric, self.n_jobs)
-        res = dtraj[:, None]  # always return a column vector in this function
+                           self.clustercenters, res[:, 0], self.metric, self.n_jobs)
         return res
 
     def dimension(self):
@@ -208,7 +213,7 @@ class AbstractClustering(StreamingTransformer, Model, ClusterMixin):
     def output_type(self):
         return np.int32
 
-    def assign(self, X=None, stride=1):
+    def assign(self, X=None, stride=1, n_jobs=None):
         """
         Assigns the given trajectory or list of trajectories to cluster centers by using the discretization defined
         by this clustering method (usually a Voronoi tesselation).
@@ -231,6 +236,11 @@ class AbstractClustering(StreamingTransformer, Model, ClusterMixin):
             Note that the stride option used to conduct the clustering is independent of the assign stride.
             This argument is only accepted if X is not given.
 
+        n_jobs : int, optional, default = None
+            If greater than one, the input data is read (and featurized) by this many worker processes, see
+            :meth:`iterator <chainsaw.data._base.iterable.Iterable.iterator>`. The chunks are assigned in this
+            process with the threads given by the n_jobs attribute. This argument is only accepted if X is not given.
+
         Returns
         -------
         Y : ndarray(T, dtype=int) or list of ndarray(T_i, dtype=int)
@@ -245,6 +255,9 @@ class AbstractClustering(StreamingTransformer, Model, ClusterMixin):
                 return self._dtrajs
             self._previous_stride = stride
             skip = self.skip if hasattr(self, 'skip') else 0
+            if n_jobs is not None and n_jobs > 1 and not self.in_memory:
+                self._dtrajs = self._assign_parallel(stride, skip, n_jobs)
+                return self._dtrajs
             # map to column vectors
             mapped = self.get_output(stride=stride, chunk=self.chunksize, skip=skip)
             # flatten and save
@@ -252,9 +265,9 @@ class AbstractClustering(StreamingTransformer, Model, ClusterMixin):
             # return
             return self._dtrajs
         else:
-            if stride != 1:
-                raise ValueError('assign accepts either X or stride parameters, but not both. If you want to map '+
-                                 'only a subset of your data, extract the subset yourself and pass it as X.')
+            if stride != 1 or n_jobs is not None:
+                raise ValueError('assign accepts either X or stride/n_jobs parameters, but not both. If you want to '
+                                 'map only a subset of your data, extract the subset yourself and pass it as X.')
             # map to column vector(s)
             mapped = self.transform(X)
             # flatten
@@ -265,6 +278,19 @@ class AbstractClustering(StreamingTransformer, Model, ClusterMixin):
             # return
             return mapped
 
+    def _assign_parallel(self, stride, skip, n_jobs):
+        # the worker processes only produce the input, the assignment runs multi-threaded in this process
+        # (OpenMP is not safe to use in forked processes).
+        dtrajs = [np.empty(l, dtype=self.output_type())
+                  for l in self.trajectory_lengths(stride=stride, skip=skip)]
+        with self.data_producer.iterator(stride=stride, skip=skip, chunk=self.chunksize, n_jobs=n_jobs) as it:
+            self._progress_register(it._n_chunks, description='assigning data', stage=1)
+            for itraj, X in it:
+                if len(X) > 0:
+                    dtrajs[itraj][it.pos:it.pos + len(X)] = self._transform_array(X)[:, 0]
+                self._progress_update(1, stage=1)
+        return dtrajs
+
     def save_dtrajs(self, trajfiles=None, prefix='',
                     output_dir='.',
                     output_format='ascii',
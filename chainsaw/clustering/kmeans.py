@@ -104,7 +104,10 @@ class KmeansClustering(AbstractClustering, ProgressReporter):
         self._centers_iter_list = []
 
     def _init_in_memory_chunks(self, size):
+        from chainsaw import config
         available_mem = psutil.virtual_memory().available
+        if config.memory_budget > 0:
+            available_mem = min(available_mem, config.memory_budget * 1024**2)
         required_mem = self._calculate_required_memory(size)
         if required_mem <= available_mem:
             self._in_memory_chunks = np.empty(shape=(size, self.data_producer.dimension()),
@@ -42,6 +42,8 @@ Reader
     FeatureReader - reads features via featurizer
     NumPyFileReader - reads numpy files
     PyCSVReader - reads tabulated ascii files
+    H5FileReader - reads datasets of HDF5 files
+    FeatureStoreReader - reads compressed feature stores written by write_store
     DataInMemory - used if data is already available in mem
 
 """
@@ -50,6 +52,8 @@ from chainsaw.data.md.feature_reader import FeatureReader
 from .data_in_memory import DataInMemory
 from .numpy_filereader import NumPyFileReader
 from .py_csv_reader import PyCSVReader
+from .h5_reader import H5FileReader
+from .feature_store import FeatureStoreReader
 from .util.reader_utils import create_file_reader
 
 
@@ -41,7 +41,7 @@ class DataSource(Iterable, TrajectoryRandomAccessible):
     """File extensions this DataSource can read."""
     SUPPORTED_EXTENSIONS = ()
 
-    def __init__(self, chunksize=1000):
+    def __init__(self, chunksize=1000, lazy=False):
         super(DataSource, self).__init__(chunksize=chunksize)
 
         # following properties have to be set in subclass
@@ -50,6 +50,10 @@ class DataSource(Iterable, TrajectoryRandomAccessible):
         self._offsets = []
         self._filenames = None
         self._is_reader = False
+        # readers obtain the lengths of their files on first access, if lazy
+        self._lazy = lazy
+        self._lazy_infos = None
+        self._n_resolved = 0
 
     @property
     def ntraj(self):
@@ -94,17 +98,8 @@ class DataSource(Iterable, TrajectoryRandomAccessible):
 
             # validate files
             for f in filename_list:
-                try:
-                    stat = os.stat(f)
-                except EnvironmentError:
-                    self.logger.exception('Error during access of file "%s"' % f)
-                    raise ValueError('could not read file "%s"' % f)
-
-                if not os.path.isfile(f):  # can be true for symlinks to directories
-                    raise ValueError('"%s" is not a valid file')
-
-                if stat.st_size == 0:
-                    raise ValueError('file "%s" is empty' % f)
+                if not self._lazy:
+                    self._validate_file(f)
 
                 n, ext = os.path.splitext(f)
                 if ext not in self.SUPPORTED_EXTENSIONS:
@@ -113,24 +108,22 @@ class DataSource(Iterable, TrajectoryRandomAccessible):
 
             # number of trajectories/data sets
             self._filenames = filename_list
+            if self._lazy:
+                # lengths and offsets are obtained once a trajectory is first accessed.
+                self._lazy_infos = [None] * self._ntraj
+                self._n_resolved = 0
+                self._lengths = _LazyTrajectoryInfos(self, 'length')
+                self._offsets = _LazyTrajectoryInfos(self, 'offsets')
+                return
+
             # determine len and dim via cache lookup,
             lengths = []
             offsets = []
             ndims = []
-            # avoid cyclic imports
-            from ..util.traj_info_cache import TrajectoryInfoCache
-            if len(filename_list) > 3:
-                self._progress_register(len(filename_list), 'Obtaining file info')
-            for filename in filename_list:
-                if config.use_trajectory_lengths_cache:
-                    info = TrajectoryInfoCache.instance()[filename, self]
-                else:
-                    info = self._get_traj_info(filename)
+            for info in self._obtain_traj_infos(filename_list):
                 lengths.append(info.length)
                 offsets.append(info.offsets)
                 ndims.append(info.ndim)
-                if len(filename_list) > 3:
-                    self._progress_update(1)
 
             # ensure all trajs have same dim
             if not np.unique(ndims).size == 1:
@@ -156,6 +149,63 @@ class DataSource(Iterable, TrajectoryRandomAccessible):
             # propagate this until we finally have a a reader
             self.data_producer.filenames = filename_list
 
+    def _validate_file(self, f):
+        try:
+            stat = os.stat(f)
+        except EnvironmentError:
+            self.logger.exception('Error during access of file "%s"' % f)
+            raise ValueError('could not read file "%s"' % f)
+
+        if not os.path.isfile(f):  # can be true for symlinks to directories
+            raise ValueError('"%s" is not a valid file')
+
+        if stat.st_size == 0:
+            raise ValueError('file "%s" is empty' % f)
+
+    def _obtain_traj_infos(self, filename_list):
+        # avoid cyclic imports
+        from ..util.traj_info_cache import TrajectoryInfoCache
+        show_progress = len(filename_list) > 3
+        if show_progress:
+            self._progress_register(len(filename_list), 'Obtaining file info')
+        if config.use_trajectory_lengths_cache:
+            return TrajectoryInfoCache.instance().get_many(
+                filename_list, self, callback=(lambda: self._progress_update(1)) if show_progress else None)
+        infos = []
+        for filename in filename_list:
+            infos.append(self._get_traj_info(filename))
+            if show_progress:
+                self._progress_update(1)
+        return infos
+
+    def _resolve_traj_infos(self, itrajs=None):
+        """ obtains the infos of the given (default all) trajectories of a lazy reader, which are not known yet.
+        Does nothing for readers, which are not lazy. """
+        if self._lazy_infos is None:
+            return
+        if itrajs is None:
+            itrajs = range(self._ntraj)
+        missing = [itraj for itraj in itrajs if self._lazy_infos[itraj] is None]
+        if not missing:
+            return
+        filenames = [self._filenames[itraj] for itraj in missing]
+        for f in filenames:
+            self._validate_file(f)
+        for itraj, info in zip(missing, self._obtain_traj_infos(filenames)):
+            if self._n_resolved == 0:
+                self._ndim = info.ndim
+            elif info.ndim != self._ndim:
+                raise ValueError("Input data has different dimensions! File {f} has dimension {dim}, but other "
+                                 "files have dimension {ndim}".format(f=self._filenames[itraj], dim=info.ndim,
+                                                                      ndim=self._ndim))
+            self._lazy_infos[itraj] = info
+            self._n_resolved += 1
+
+    def dimension(self):
+        if self._lazy_infos is not None and self._n_resolved == 0:
+            self._resolve_traj_infos([0])
+        return super(DataSource, self).dimension()
+
     @property
     def is_reader(self):
         """
@@ -254,6 +304,38 @@ class DataSource(Iterable, TrajectoryRandomAccessible):
         return sum(self.trajectory_lengths(stride=stride, skip=skip))
 
 
+class _LazyTrajectoryInfos(object):
+    """ Sequence of one attribute (eg. the length) of the trajectory infos of a lazy reader.
+
+    Accessing an element obtains the info of its trajectory, iterating obtains the infos of all trajectories
+    at once.
+    """
+
+    def __init__(self, source, attr):
+        self._source = source
+        self._attr = attr
+
+    def __len__(self):
+        return self._source._ntraj
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            itrajs = list(range(*index.indices(len(self))))
+            self._source._resolve_traj_infos(itrajs)
+            return [getattr(self._source._lazy_infos[itraj], self._attr) for itraj in itrajs]
+        index = int(index)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("trajectory index %s out of range" % index)
+        self._source._resolve_traj_infos([index])
+        return getattr(self._source._lazy_infos[index], self._attr)
+
+    def __iter__(self):
+        self._source._resolve_traj_infos()
+        return iter([getattr(info, self._attr) for info in self._source._lazy_infos])
+
+
 class IteratorState(object):
     """
     State class holding all the relevant information of an iterator's state.
@@ -274,6 +356,8 @@ class IteratorState(object):
         self.trajectory_lengths = None
         self.ra_indices_for_traj_dict = {}
         self.cols = cols
+        # reusable chunk buffers (ChunkBuffers), shared by all stages of a pipeline
+        self.buffers = None
 
     def ra_indices_for_traj(self, traj):
         """
@@ -396,6 +480,15 @@ class DataSourceIterator(six.with_metaclass(ABCMeta)):
         self._t = 0
         self._itraj = 0
 
+    def _select_trajectory(self, itraj):
+        """
+        Continues the iteration at the beginning of the given trajectory (only for uniform strides).
+        :param itraj: the trajectory index
+        """
+        self._t = 0
+        self._itraj = itraj
+        self.state.pos_adv = 0
+
     @property
     def pos(self):
         """
@@ -627,6 +720,14 @@ class DataSourceIterator(six.with_metaclass(ABCMeta)):
             return X[:, self.use_cols]
         return X
 
+    def _next_chunk_cols(self):
+        """ next chunk restricted to use_cols.
+
+        Only invoked on the outermost iterator of a pipeline. Iterators, which are able to compute
+        a subset of the columns only, override this to avoid computing all of them first.
+        """
+        return self._use_cols(self._next_chunk())
+
     def _it_next(self):
         # first chunk at all, skip prepending trajectories that are not considered in random access
         if self._t == 0 and self._itraj == 0 and not self.uniform_stride:
@@ -636,8 +737,10 @@ class DataSourceIterator(six.with_metaclass(ABCMeta)):
         # we have to obtain the current index before invoking next_chunk (which increments itraj)
         self.state.current_itraj = self._itraj
         self.state.pos = self.state.pos_adv
+        if self.state.buffers is not None:
+            self.state.buffers.next_slot()
         try:
-            X = self._use_cols(self._next_chunk())
+            X = self._next_chunk_cols()
         except StopIteration:
             self._last_chunk_in_traj = True
             raise
@@ -674,3 +777,95 @@ class DataSourceIterator(six.with_metaclass(ABCMeta)):
         self.close()
         return False
 
+
+class _RandomAccessFileIteratorMixin(six.with_metaclass(ABCMeta)):
+    """ Iterator of a reader with random access to the frames of its trajectories (eg. files).
+
+    Implements _next_chunk in terms of :meth:`_open_trajectory` and :meth:`_read`, which only have to
+    read the given frames. The position, skip, stride and random access indices are handled here.
+    Has to precede DataSourceIterator in the bases, subclasses have to call super() in close and reset.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(_RandomAccessFileIteratorMixin, self).__init__(*args, **kwargs)
+        # trajectory opened by _open_trajectory
+        self._last_itraj = -1
+
+    def close(self):
+        self._last_itraj = -1
+
+    def reset(self):
+        super(_RandomAccessFileIteratorMixin, self).reset()
+        self._last_itraj = -1
+
+    @abstractmethod
+    def _open_trajectory(self, itraj):
+        """ prepares reading trajectory itraj with :meth:`_read`. Invoked by :meth:`_next_chunk`,
+        whenever the iteration reaches another trajectory. """
+        pass
+
+    @abstractmethod
+    def _read(self, frames, cols=None):
+        """ reads rows of the trajectory opened by :meth:`_open_trajectory`.
+
+        :param frames: slice with a positive step or sorted array of frame indices
+        :param cols: indices of the columns to read or None (all columns)
+        :return: array with a row for every frame
+        """
+        pass
+
+    def _next_chunk(self, cols=None):
+        if self._itraj >= self._data_source.ntraj:
+            self.close()
+            raise StopIteration()
+
+        if self._itraj != self._last_itraj:
+            self._open_trajectory(self._itraj)
+            self._last_itraj = self._itraj
+
+        # skip only if complete trajectory mode or first chunk
+        skip = self.skip if self.chunksize == 0 or self._t == 0 else 0
+
+        # if stride by dict, update traj length accordingly
+        if not self.uniform_stride:
+            traj_len = self.ra_trajectory_length(self._itraj)
+        else:
+            traj_len = self._data_source.trajectory_length(self._itraj)
+
+        # complete trajectory mode
+        if self.chunksize == 0:
+            if not self.uniform_stride:
+                X = self._read(self.ra_indices_for_traj(self._itraj), cols)
+                self._itraj += 1
+
+                # skip the trajs that are not in the stride dict
+                while self._itraj < self.number_of_trajectories() \
+                        and (self._itraj not in self.traj_keys):
+                    self._itraj += 1
+            else:
+                X = self._read(slice(skip, traj_len, self.stride), cols)
+                self._itraj += 1
+
+            return X
+
+        # chunked mode
+        if not self.uniform_stride:
+            upper_bound = min(self._t + self.chunksize, traj_len)
+            X = self._read(self.ra_indices_for_traj(self._itraj)[self._t:upper_bound], cols)
+        else:
+            upper_bound = min(skip + self._t + self.chunksize * self.stride, traj_len)
+            X = self._read(slice(skip + self._t, upper_bound, self.stride), cols)
+
+        # set new time position
+        self._t = upper_bound
+
+        if self._t >= traj_len:
+            self._itraj += 1
+            self._t = 0
+
+            # if we have a dictionary, skip trajectories that are not in the key set
+            while not self.uniform_stride and self._itraj < self.number_of_trajectories() \
+                    and (self._itraj not in self.traj_keys):
+                self._itraj += 1
+
+        return X
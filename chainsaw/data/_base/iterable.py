@@ -16,7 +16,15 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from abc import ABCMeta, abstractmethod
+from math import ceil
+import multiprocessing
+import os
+import threading
+import traceback
+import weakref
+
 import six
+from six.moves import queue, cPickle as pickle
 import numpy as np
 
 from chainsaw.base.loggable import Loggable
@@ -25,11 +33,14 @@ from chainsaw.base.reporter import ProgressReporter
 
 class Iterable(six.with_metaclass(ABCMeta, ProgressReporter, Loggable)):
 
+    # memory for one chunk if the chunksize is 'auto', but neither chunk_bytes nor config.memory_budget is set.
+    _DEFAULT_CHUNK_BYTES = 256 * 1024**2
+
     def __init__(self, chunksize=1000):
         super(Iterable, self).__init__()
+        Iterable._check_chunksize(chunksize)
         self._default_chunksize = chunksize
-        if self.default_chunksize < 0:
-            raise ValueError("Chunksize of %s was provided, but has to be >= 0" % self.default_chunksize)
+        self._chunk_bytes = None
         self._in_memory = False
         # should be set in subclass
         self._ndim = 0
@@ -41,19 +52,68 @@ class Iterable(six.with_metaclass(ABCMeta, ProgressReporter, Loggable)):
     def ndim(self):
         return self.dimension()
 
+    @staticmethod
+    def _check_chunksize(value):
+        if isinstance(value, six.string_types):
+            if value != 'auto':
+                raise ValueError("Chunksize of '%s' was provided, but only 'auto' is allowed as string" % value)
+        elif value < 0:
+            raise ValueError("Chunksize of %s was provided, but has to be >= 0" % value)
+
     @property
     def default_chunksize(self):
-        """ How much data will be processed at once, in case no chunksize has been provided."""
+        """ How much data will be processed at once, in case no chunksize has been provided.
+
+        If the chunksize has been set to 'auto', the number of frames is derived from the
+        memory budget (see :attr:`chunk_bytes`).
+        """
+        if self._chunksize_auto:
+            return self._auto_chunksize()
         return self._default_chunksize
 
     @property
     def chunksize(self):
-        return self._default_chunksize
+        return self.default_chunksize
 
     @chunksize.setter
     def chunksize(self, value):
+        Iterable._check_chunksize(value)
         self._default_chunksize = value
 
+    @property
+    def _chunksize_auto(self):
+        return isinstance(self._default_chunksize, six.string_types)
+
+    @property
+    def chunk_bytes(self):
+        """ Memory (in bytes) a chunk may use, if the chunksize is 'auto'.
+
+        If not set, config.memory_budget is used. Setting it switches the chunksize to 'auto'.
+        """
+        return self._chunk_bytes
+
+    @chunk_bytes.setter
+    def chunk_bytes(self, value):
+        self._chunk_bytes = value
+        if value is not None:
+            self.chunksize = 'auto'
+
+    def _memory_budget(self):
+        if self.chunk_bytes is not None:
+            return self.chunk_bytes
+        from chainsaw import config
+        if config.memory_budget > 0:
+            return config.memory_budget * 1024**2
+        return Iterable._DEFAULT_CHUNK_BYTES
+
+    def _bytes_per_frame(self):
+        """ memory needed to hold one frame of the output of this stage. """
+        return self.ndim * np.dtype(self.output_type()).itemsize
+
+    def _auto_chunksize(self):
+        """ number of frames per chunk, so that the memory budget is not exceeded. """
+        return max(1, int(self._memory_budget() // max(self._bytes_per_frame(), 1)))
+
     @property
     def in_memory(self):
         r"""are results stored in memory?"""
@@ -91,7 +151,8 @@ class Iterable(six.with_metaclass(ABCMeta, ProgressReporter, Loggable)):
         self._Y_source = DataInMemory(self._Y)
         self._mapping_to_mem_active = False
 
-    def iterator(self, stride=1, lag=0, chunk=None, return_trajindex=True, cols=None, skip=0):
+    def iterator(self, stride=1, lag=0, chunk=None, return_trajindex=True, cols=None, skip=0, prefetch=None,
+                 n_jobs=None, reuse_buffers=False):
         """ creates an iterator to stream over the (transformed) data.
 
         If your data is too large to fit into memory and you want to incrementally compute
@@ -105,15 +166,29 @@ class Iterable(six.with_metaclass(ABCMeta, ProgressReporter, Loggable)):
             Take only every stride'th frame.
         lag: int, default=0
             how many frame to omit for each file.
-        chunk: int, default=None
+        chunk: int or 'auto', default=None
             How many frames to process at once. If not given obtain the chunk size
-            from the source.
+            from the source. If 'auto', derive it from the memory budget.
         return_trajindex: boolean, default=True
             a chunk of data if return_trajindex is False, otherwise a tuple of (trajindex, data).
         cols: array like, default=None
             return only the given columns.
         skip: int, default=0
             skip 'n' first frames of each trajectory.
+        prefetch: int, default=None
+            read (and transform) up to n chunks ahead in a background thread, while the
+            current chunk is being processed. If not given, the value of
+            config.iterator_prefetch is used. Zero disables prefetching.
+        n_jobs: int, default=None
+            if greater than one, the trajectories are processed by this many worker
+            processes (longest trajectories first). Chunks of different trajectories
+            are returned interleaved, so only use this if the order of the trajectories
+            does not matter. Use current_trajindex and pos of the iterator to find out
+            where a chunk belongs to. Not supported for random access strides.
+        reuse_buffers: boolean, default=False
+            compute every chunk in memory, which has been allocated for previous chunks.
+            The returned chunks are then only valid until the next chunk is requested,
+            so copy them if you need to keep them. Ignored for parallel iteration.
 
         Returns
         -------
@@ -142,16 +217,46 @@ class Iterable(six.with_metaclass(ABCMeta, ProgressReporter, Loggable)):
                     lag=lag, chunk=chunk, stride=stride, return_trajindex=return_trajindex, skip=skip
             )
         chunk = chunk if chunk is not None else self.default_chunksize
+        if isinstance(chunk, six.string_types):
+            Iterable._check_chunksize(chunk)
+            chunk = self._auto_chunksize()
+        if n_jobs is not None and n_jobs > 1:
+            return ParallelIterator(self, n_jobs, skip=skip, chunk=chunk, stride=stride, lag=lag,
+                                    return_trajindex=return_trajindex, cols=cols)
+        if prefetch is None:
+            from chainsaw import config
+            prefetch = config.iterator_prefetch
         it = self._create_iterator(skip=skip, chunk=chunk, stride=stride,
                                    return_trajindex=return_trajindex, cols=cols)
+        if reuse_buffers:
+            self._reuse_buffers(it, prefetch)
         if lag > 0:
             it.return_traj_index = True
+            # if the lagged frames are part of the strided stream, we read every frame only once
+            # and take the time-lagged partner from a buffer.
+            if not isinstance(stride, np.ndarray) and lag % stride == 0:
+                return BufferedLaggedIterator(self._prefetched(it, prefetch), lag // stride, return_trajindex)
             it_lagged = self._create_iterator(skip=skip+lag, chunk=chunk, stride=stride,
                                               return_trajindex=True, cols=cols)
-            return LaggedIterator(it, it_lagged, return_trajindex)
+            if reuse_buffers:
+                self._reuse_buffers(it_lagged, prefetch)
+            return LaggedIterator(self._prefetched(it, prefetch), self._prefetched(it_lagged, prefetch),
+                                  return_trajindex)
+        return self._prefetched(it, prefetch)
+
+    @staticmethod
+    def _reuse_buffers(it, prefetch=0):
+        from chainsaw.util.buffers import ChunkBuffers
+        # the chunk in use, the ones waiting in the queue and the one being read ahead.
+        it.state.buffers = ChunkBuffers(n_slots=prefetch + 2 if prefetch > 0 else 1)
+
+    @staticmethod
+    def _prefetched(it, prefetch):
+        if prefetch > 0:
+            return PrefetchIterator(it, prefetch)
         return it
 
-    def get_output(self, dimensions=slice(0, None), stride=1, skip=0, chunk=None):
+    def get_output(self, dimensions=slice(0, None), stride=1, skip=0, chunk=None, n_jobs=None, out=None):
         """Maps all input data of this transformer and returns it as an array or list of arrays
 
         Parameters
@@ -162,16 +267,32 @@ class Iterable(six.with_metaclass(ABCMeta, ProgressReporter, Loggable)):
            only take every n'th frame.
         skip : int, default=0
             initially skip n frames of each file.
-        chunk: int, default=None
+        chunk: int or 'auto', default=None
             How many frames to process at once. If not given obtain the chunk size
-            from the source.
+            from the source. If 'auto', derive it from the memory budget.
+        n_jobs: int, default=None
+            if greater than one, map the trajectories in parallel with this many
+            worker processes.
+        out: str, default=None
+            stream the output to disk instead of keeping it in memory. Either the name
+            of an HDF5 file (extension .h5 or .hdf5), which gets one dataset per trajectory,
+            or a directory, in which one .npy file per trajectory is created. The names
+            are traj_<itraj> (zero padded). Existing files of the same name are overwritten.
+            In HDF5 files, the datasets of a previous output are replaced, other datasets
+            are kept, unless their names collide with the output (ValueError).
 
         Returns
         -------
         output : list of ndarray(T_i, d)
            the mapped data, where T is the number of time steps of the input data, or if stride > 1,
            floor(T_in / stride). d is the output dimension of this transformer.
-           If the input consists of a list of trajectories, Y will also be a corresponding list of trajectories
+           If the input consists of a list of trajectories, Y will also be a corresponding list of trajectories.
+           If out is given, these are read-only memory maps of the .npy files (or h5py datasets),
+           which are only read on access. The memory maps can be passed to :func:`chainsaw.source`
+           again, h5py datasets can not: pass the name of the HDF5 file instead, eg.
+           source(out, selection='/traj_*'). The list of h5py datasets keeps the file open for
+           reading until its close() method is called (it is also a context manager). Another
+           get_output to the same file closes it, because the datasets are overwritten.
 
         """
         if isinstance(dimensions, int):
@@ -186,25 +307,44 @@ class Iterable(six.with_metaclass(ABCMeta, ProgressReporter, Loggable)):
 
         assert ndim > 0, "ndim was zero in %s" % self.__class__.__name__
 
+        # the dimensions are passed down to the iterator, so that only these are computed.
+        cols = np.arange(self.ndim)[dimensions]
+        if len(cols) == self.ndim and np.all(cols == np.arange(self.ndim)):
+            cols = None
+
         if chunk is None:
             chunk = self.chunksize
+        elif isinstance(chunk, six.string_types):
+            Iterable._check_chunksize(chunk)
+            chunk = self._auto_chunksize()
 
         # create iterator
         if self.in_memory and not self._mapping_to_mem_active:
             from chainsaw.data.data_in_memory import DataInMemory
             assert self._Y is not None
-            it = DataInMemory(self._Y)._create_iterator(skip=skip, chunk=chunk,
-                                                        stride=stride, return_trajindex=True)
+            it = DataInMemory(self._Y)._create_iterator(skip=skip, chunk=chunk, stride=stride,
+                                                        return_trajindex=True, cols=cols)
+        elif n_jobs is not None and n_jobs > 1:
+            it = ParallelIterator(self, n_jobs, skip=skip, chunk=chunk, stride=stride, cols=cols)
         else:
-            it = self._create_iterator(skip=skip, chunk=chunk, stride=stride, return_trajindex=True)
+            it = self._create_iterator(skip=skip, chunk=chunk, stride=stride, return_trajindex=True,
+                                       cols=cols)
+            # chunks are copied to the output arrays, so their memory can be reused.
+            self._reuse_buffers(it)
 
+        target = _OutputTarget(out) if out is not None else None
         with it:
             # allocate memory
             try:
                 # TODO: avoid having a copy here, if Y is already filled
-                trajs = [np.empty((l, ndim), dtype=self.output_type())
-                         for l in it.trajectory_lengths()]
+                if target is not None:
+                    trajs = target.create(it.trajectory_lengths(), ndim, self.output_type())
+                else:
+                    trajs = [np.empty((l, ndim), dtype=self.output_type())
+                             for l in it.trajectory_lengths()]
             except MemoryError:
+                if target is not None:
+                    target.close()
                 self._logger.exception("Could not allocate enough memory to map all data."
                                        " Consider using a larger stride.")
                 return
@@ -218,14 +358,21 @@ class Iterable(six.with_metaclass(ABCMeta, ProgressReporter, Loggable)):
             self._progress_register(it._n_chunks,
                                     description='getting output of %s' % self.__class__.__name__,
                                     stage=1)
-            for itraj, chunk in it:
-                L = len(chunk)
-                if L > 0:
-                    trajs[itraj][it.pos:it.pos + L, :] = chunk[:, dimensions]
+            try:
+                for itraj, chunk in it:
+                    L = len(chunk)
+                    if L > 0:
+                        trajs[itraj][it.pos:it.pos + L, :] = chunk
 
-                # update progress
-                self._progress_update(1, stage=1)
+                    # update progress
+                    self._progress_update(1, stage=1)
+            except:
+                if target is not None:
+                    target.close()
+                raise
 
+        if target is not None:
+            return target.open()
         return trajs
 
     def write_to_csv(self, filename=None, extension='.dat', overwrite=False,
@@ -316,6 +463,65 @@ class Iterable(six.with_metaclass(ABCMeta, ProgressReporter, Loggable)):
             f.close()
         self._progress_force_finish(0)
 
+    def write_store(self, path, block_size=1000, compression='zlib', compression_level=None, shuffle=False,
+                    dtype=None, stride=1, chunksize=None, overwrite=False):
+        """ write all data to a compressed feature store directory, which can be read by
+        :class:`chainsaw.data.feature_store.FeatureStoreReader` or :func:`chainsaw.api.source`.
+
+        The trajectories are split into blocks of block_size frames, whose columns are compressed
+        separately. Reading frames or columns from the store only decompresses the blocks and columns
+        containing them.
+
+        Parameters
+        ----------
+        path : str
+            directory of the store
+        block_size : int, default=1000
+            number of frames per block, the unit of compression and random access
+        compression : str or None, default='zlib'
+            one of None, 'zlib', 'bz2' or 'lzma'
+        compression_level : int, optional
+            level of the compression, defaults to the default of the compression library
+        shuffle : bool, default=False
+            group the bytes of the values by their significance before compressing them, which usually
+            improves the compression of floating point data.
+        dtype : numpy dtype, optional
+            type of the stored data, defaults to the type of the output
+        stride : int
+            omit every n'th frame
+        chunksize: int, optional
+            how many frames to process at once, defaults to the chunksize of this instance
+        overwrite : bool, optional, default=False
+            shall an existing store be overwritten? If the store exists, this method will raise.
+
+        Returns
+        -------
+        reader : :class:`chainsaw.data.feature_store.FeatureStoreReader`
+            reader of the written store
+
+        Example
+        -------
+        >>> import numpy as np, chainsaw, os
+        >>> from chainsaw.util.files import TemporaryDirectory
+        >>> reader = chainsaw.source([np.random.random((10, 3))] * 3)
+        >>> with TemporaryDirectory() as td:
+        ...    store = reader.write_store(os.path.join(td, 'features'), block_size=4)
+        ...    print(store.trajectory_lengths(), store.get_output(stride=4)[0].shape)
+        [10 10 10] (3, 3)
+        """
+        from chainsaw.data.feature_store import FeatureStoreReader, FeatureStoreWriter
+        writer = FeatureStoreWriter(path, self.number_of_trajectories(), self.ndim, block_size=block_size,
+                                    compression=compression, compression_level=compression_level,
+                                    shuffle=shuffle, dtype=dtype, overwrite=overwrite)
+        with writer:
+            with self.iterator(stride, chunk=chunksize, return_trajindex=True) as it:
+                self._progress_register(it._n_chunks, "writing feature store")
+                for itraj, X in it:
+                    writer.write(itraj, X)
+                    self._progress_update(1, 0)
+        self._progress_force_finish(0)
+        return FeatureStoreReader(path, chunksize=self.chunksize)
+
     @abstractmethod
     def _create_iterator(self, skip=0, chunk=0, stride=1, return_trajindex=True, cols=None):
         """
@@ -336,6 +542,89 @@ class Iterable(six.with_metaclass(ABCMeta, ProgressReporter, Loggable)):
         return self.iterator()
 
 
+class _HDF5Output(list):
+    """ datasets of the output of get_output in an HDF5 file, which is closed by :meth:`close`. """
+
+    def __init__(self, datasets, file):
+        super(_HDF5Output, self).__init__(datasets)
+        self.file = file
+
+    def close(self):
+        """ closes the HDF5 file, the datasets can not be read afterwards. """
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+
+class _OutputTarget(object):
+    """ On-disk storage of the output of get_output: a directory of .npy files or an HDF5 file. """
+
+    HDF5_EXTENSIONS = ('.h5', '.hdf5')
+    # marks the datasets written by get_output, only these are replaced by a later output to the same file.
+    HDF5_MARKER = 'chainsaw_output'
+
+    # HDF5 files opened for reading the output of get_output by their absolute path.
+    _hdf5_readers = weakref.WeakValueDictionary()
+
+    def __init__(self, path):
+        self.path = path
+        self.hdf5 = os.path.splitext(path)[1].lower() in _OutputTarget.HDF5_EXTENSIONS
+        self._names = None
+        self._file = None
+
+    def create(self, lengths, ndim, dtype):
+        """ creates a writable array for every trajectory. """
+        width = len(str(max(len(lengths) - 1, 0)))
+        self._names = ['traj_%0*i' % (width, itraj) for itraj in range(len(lengths))]
+        if self.hdf5:
+            import h5py
+            # the datasets of a previous output are overwritten, so the file can not be read meanwhile.
+            reader = _OutputTarget._hdf5_readers.pop(os.path.abspath(self.path), None)
+            if reader is not None:
+                reader.close()
+            self._file = h5py.File(self.path, mode='a')
+            foreign = [n for n in self._names if n in self._file and
+                       not self._file[n].attrs.get(_OutputTarget.HDF5_MARKER, False)]
+            if foreign:
+                self.close()
+                raise ValueError('{} contains the datasets {}, which have not been written by get_output. '
+                                 'Refusing to overwrite them.'.format(self.path, foreign))
+            # remove all datasets of a previous output, also the ones of trajectories, which do not exist anymore.
+            for name in [n for n in self._file if self._file[n].attrs.get(_OutputTarget.HDF5_MARKER, False)]:
+                del self._file[name]
+            datasets = [self._file.create_dataset(name, shape=(l, ndim), dtype=dtype, chunks=True)
+                        for name, l in zip(self._names, lengths)]
+            for ds in datasets:
+                ds.attrs[_OutputTarget.HDF5_MARKER] = True
+            return datasets
+        from chainsaw.util.files import mkdir_p
+        mkdir_p(self.path)
+        return [np.lib.format.open_memmap(os.path.join(self.path, name + '.npy'), mode='w+',
+                                          dtype=dtype, shape=(l, ndim))
+                for name, l in zip(self._names, lengths)]
+
+    def close(self):
+        """ closes the HDF5 file, eg. if writing failed. """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def open(self):
+        """ flushes the written data and opens it again for reading. """
+        if self.hdf5:
+            import h5py
+            self.close()
+            f = h5py.File(self.path, mode='r')
+            _OutputTarget._hdf5_readers[os.path.abspath(self.path)] = f
+            return _HDF5Output([f[name] for name in self._names], f)
+        return [np.load(os.path.join(self.path, name + '.npy'), mmap_mode='r') for name in self._names]
+
+
 class LaggedIterator(object):
     def __init__(self, it, it_lagged, return_trajindex):
         self._it = it
@@ -349,7 +638,7 @@ class LaggedIterator(object):
         return min(n1, n2)
 
     def __len__(self):
-        return min(self._it.trajectory_lengths(), self._it_lagged.trajectory_lengths())
+        return int(sum(np.maximum(np.minimum(self._it.trajectory_lengths(), self._it_lagged.trajectory_lengths()), 0)))
 
     def __iter__(self):
         return self
@@ -382,3 +671,577 @@ class LaggedIterator(object):
     def __exit__(self, exc_type, exc_val, exc_tb):
         self._it.__exit__(exc_type, exc_val, exc_tb)
         self._it_lagged.__exit__(exc_type, exc_val, exc_tb)
+
+
+class BufferedLaggedIterator(object):
+    """ Time-lagged iterator, which reads every frame of the underlying iterator only once.
+
+    The last frames of each trajectory are kept in a buffer, so that the time-lagged partner
+    of a frame can be served without opening a second iterator on the data source. The chunks
+    returned are identical to the ones of :class:`LaggedIterator`.
+
+    Parameters
+    ----------
+    it : DataSourceIterator
+        iterator returning trajectory indices.
+    lag : int
+        lag time in units of the (uniform) stride of it.
+    return_trajindex : bool
+        return tuples of (itraj, X, Y) if True, otherwise (X, Y).
+    """
+    def __init__(self, it, lag, return_trajindex):
+        assert lag > 0
+        self._it = it
+        self._lag = lag
+        self._return_trajindex = return_trajindex
+        self._itraj = -1
+        self._buffer = None
+        self._pending = None
+        self._exhausted = False
+
+    def _lagged_lengths(self):
+        lengths = self._it._data_source.trajectory_lengths(stride=self._it.stride, skip=self._it.skip)
+        return np.maximum(lengths - self._lag, 0)
+
+    @property
+    def _n_chunks(self):
+        lengths = self._lagged_lengths()
+        chunksize = self._it.chunksize
+        if chunksize != 0:
+            return int(sum(ceil(l / float(chunksize)) for l in lengths))
+        return int(np.count_nonzero(lengths))
+
+    def __len__(self):
+        return int(sum(self._lagged_lengths()))
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.next()
+
+    def _flush(self):
+        # emit the remaining frames of the current trajectory
+        buf, self._buffer = self._buffer, None
+        if buf is not None and len(buf) > self._lag:
+            return buf[:-self._lag], buf[self._lag:]
+        return None
+
+    def next(self):
+        chunksize = self._it.chunksize
+        while True:
+            if chunksize > 0 and self._buffer is not None and len(self._buffer) >= self._lag + chunksize:
+                X = self._buffer[:chunksize]
+                Y = self._buffer[self._lag:self._lag + chunksize]
+                self._buffer = self._buffer[chunksize:]
+                return self._result(self._itraj, X, Y)
+
+            if self._pending is not None:
+                # copy, the memory of the chunk might be reused by the underlying iterator.
+                self._itraj, self._buffer = self._pending[0], np.array(self._pending[1])
+                self._pending = None
+                continue
+
+            if self._exhausted:
+                raise StopIteration()
+
+            try:
+                itraj, data = self._it.next()
+            except StopIteration:
+                self._exhausted = True
+                itraj, data = None, None
+
+            if itraj == self._itraj:
+                self._buffer = np.concatenate((self._buffer, data))
+                continue
+
+            # new trajectory (or end of data): serve the remaining pairs of the current one first.
+            if data is not None:
+                self._pending = (itraj, data)
+            last_itraj = self._itraj
+            res = self._flush()
+            if res is not None:
+                return self._result(last_itraj, *res)
+
+    def _result(self, itraj, X, Y):
+        if self._return_trajindex:
+            return itraj, X, Y
+        return X, Y
+
+    def __enter__(self):
+        self._it.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._it.__exit__(exc_type, exc_val, exc_tb)
+
+
+class PrefetchIterator(object):
+    """ Reads the chunks of a DataSourceIterator ahead in a background thread.
+
+    The properties describing the current chunk (pos, current_trajindex, last_chunk and
+    last_chunk_in_traj) refer to the chunk last returned by next, not to the position of the
+    background thread. All other attributes are taken from the wrapped iterator.
+
+    Changing the iteration parameters (eg. chunksize or stride) discards the prefetched
+    chunks, so this should only happen before the iteration or followed by a reset().
+
+    Parameters
+    ----------
+    it : DataSourceIterator
+        the iterator to read from.
+    prefetch : int
+        maximum number of chunks to read ahead.
+    """
+    _STOP = object()
+
+    def __init__(self, it, prefetch):
+        assert prefetch > 0
+        self._it = it
+        self._prefetch = prefetch
+        self._queue = None
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._current = None
+        self._exhausted = False
+
+    def __getattr__(self, item):
+        # only invoked, if the attribute is not found on this instance
+        if item == '_it':
+            raise AttributeError(item)
+        return getattr(self._it, item)
+
+    def _start(self):
+        self._queue = queue.Queue(maxsize=self._prefetch)
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._worker, name='chainsaw-prefetch')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _put(self, item):
+        while not self._stop_event.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _worker(self):
+        it = self._it
+        while not self._stop_event.is_set():
+            try:
+                X = it.next()
+            except StopIteration:
+                self._put((PrefetchIterator._STOP, None))
+                return
+            except BaseException as e:
+                self._put((e, None))
+                return
+            state = (it.pos, it.current_trajindex, it.last_chunk_in_traj, it.last_chunk)
+            if not self._put((X, state)):
+                return
+
+    def _stop(self):
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        # unblock the worker, if it is waiting for a free slot.
+        while self._thread.is_alive():
+            try:
+                self._queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        self._thread.join()
+        self._thread = None
+        self._queue = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.next()
+
+    def next(self):
+        if self._exhausted:
+            raise StopIteration()
+        if self._thread is None:
+            self._start()
+        X, state = self._queue.get()
+        if X is PrefetchIterator._STOP:
+            self._exhausted = True
+            self._stop()
+            raise StopIteration()
+        if isinstance(X, BaseException):
+            self._exhausted = True
+            self._stop()
+            raise X
+        self._current = state
+        return X
+
+    @property
+    def pos(self):
+        return self._current[0] if self._current is not None else self._it.pos
+
+    @property
+    def current_trajindex(self):
+        return self._current[1] if self._current is not None else self._it.current_trajindex
+
+    @property
+    def last_chunk_in_traj(self):
+        return self._current[2] if self._current is not None else self._it.last_chunk_in_traj
+
+    @property
+    def last_chunk(self):
+        return self._current[3] if self._current is not None else self._it.last_chunk
+
+    def _set_param(self, name, value):
+        self._stop()
+        setattr(self._it, name, value)
+
+    @property
+    def chunksize(self):
+        return self._it.chunksize
+
+    @chunksize.setter
+    def chunksize(self, value):
+        self._set_param('chunksize', value)
+
+    @property
+    def stride(self):
+        return self._it.stride
+
+    @stride.setter
+    def stride(self, value):
+        self._set_param('stride', value)
+
+    @property
+    def skip(self):
+        return self._it.skip
+
+    @skip.setter
+    def skip(self, value):
+        self._set_param('skip', value)
+
+    @property
+    def return_traj_index(self):
+        return self._it.return_traj_index
+
+    @return_traj_index.setter
+    def return_traj_index(self, value):
+        self._set_param('return_traj_index', value)
+
+    def reset(self):
+        self._stop()
+        self._it.reset()
+        self._current = None
+        self._exhausted = False
+
+    def close(self):
+        self._stop()
+        self._it.close()
+
+    def __enter__(self):
+        self._it.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._stop()
+        return self._it.__exit__(exc_type, exc_val, exc_tb)
+
+
+class _TrajectoryIterator(object):
+    """ Restricts a DataSourceIterator (returning trajectory indices) to a single trajectory. """
+
+    def __init__(self, it, itraj):
+        it._select_trajectory(itraj)
+        self._it = it
+        self._itraj = itraj
+        self._done = False
+
+    def __getattr__(self, item):
+        if item == '_it':
+            raise AttributeError(item)
+        return getattr(self._it, item)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.next()
+
+    def next(self):
+        if self._done:
+            raise StopIteration()
+        try:
+            itraj, X = self._it.next()
+        except StopIteration:
+            self._done = True
+            raise
+        if itraj != self._itraj:
+            self._done = True
+            raise StopIteration()
+        self._done = self._it.last_chunk_in_traj
+        return itraj, X
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+def _parallel_worker(data_source, tasks, results, skip, chunk, stride, lag, cols):
+    """ Processes the trajectory indices of the task queue until it receives None.
+
+    Puts ('chunk', itraj, pos, data, last_chunk_in_traj) tuples into the result queue, where data
+    is a tuple (X, ) or (X, Y) in the time-lagged case. A final ('done', ) message signals the end
+    of the worker, errors are reported as ('error', exception, traceback).
+    """
+    try:
+        it = data_source._create_iterator(skip=skip, chunk=chunk, stride=stride,
+                                          return_trajindex=True, cols=cols)
+        it_lagged = None
+        if lag > 0 and lag % stride != 0:
+            it_lagged = data_source._create_iterator(skip=skip + lag, chunk=chunk, stride=stride,
+                                                     return_trajindex=True, cols=cols)
+        while True:
+            itraj = tasks.get()
+            if itraj is None:
+                break
+            if lag == 0:
+                traj_it = _TrajectoryIterator(it, itraj)
+            elif it_lagged is None:
+                traj_it = BufferedLaggedIterator(_TrajectoryIterator(it, itraj), lag // stride, True)
+            else:
+                traj_it = LaggedIterator(_TrajectoryIterator(it, itraj),
+                                         _TrajectoryIterator(it_lagged, itraj), True)
+            # look ahead one chunk to know which one is the last of this trajectory.
+            pos = 0
+            previous = None
+            for res in traj_it:
+                if previous is not None:
+                    results.put(('chunk', itraj, pos, previous, False))
+                    pos += len(previous[0])
+                previous = res[1:]
+            if previous is not None:
+                results.put(('chunk', itraj, pos, previous, True))
+        it.close()
+        if it_lagged is not None:
+            it_lagged.close()
+    except Exception as e:
+        tb = traceback.format_exc()
+        try:
+            pickle.dumps(e)
+        except Exception:
+            e = RuntimeError(tb)
+        results.put(('error', e, tb))
+        return
+    results.put(('done', ))
+
+
+class ParallelIterator(object):
+    """ Iterates over the trajectories of a data source with a pool of worker processes.
+
+    Every worker creates its own iterator on the data source (eg. opens the trajectory files and
+    computes the features) and processes whole trajectories, longest ones first, so that a few long
+    trajectories do not finish last. Chunks of a trajectory arrive in order, but chunks of different
+    trajectories are interleaved, so this is only suitable for consumers which do not depend on the
+    order of the trajectories. Use pos and current_trajindex to find out where a chunk belongs to.
+
+    Parameters
+    ----------
+    data_source : Iterable
+        the data source to iterate over. It has to be picklable, if the platform does not
+        fork new processes.
+    n_jobs : int
+        number of worker processes.
+    skip : int, default=0
+        skip 'n' first frames of each trajectory.
+    chunk : int, default=0
+        How many frames to process at once.
+    stride : int, default=1
+        Take only every stride'th frame. Random access strides are not supported.
+    lag : int, default=0
+        return tuples of time-lagged chunks, if lag > 0.
+    return_trajindex : bool, default=True
+        return the trajectory index along with the data.
+    cols : array like, default=None
+        return only the given columns.
+    """
+
+    def __init__(self, data_source, n_jobs, skip=0, chunk=0, stride=1, lag=0, return_trajindex=True, cols=None):
+        if isinstance(stride, np.ndarray):
+            raise ValueError("parallel iteration does not support random access strides.")
+        if n_jobs < 1:
+            raise ValueError("n_jobs has to be a positive integer, but was %s" % n_jobs)
+        self._data_source = data_source
+        self._n_jobs = int(n_jobs)
+        self._skip = skip
+        self._chunk = chunk
+        self._stride = stride
+        self._lag = lag
+        self._return_trajindex = return_trajindex
+        self._cols = cols
+
+        lengths = data_source.trajectory_lengths(stride=stride, skip=skip)
+        if lag > 0:
+            lengths = np.minimum(lengths, data_source.trajectory_lengths(stride=stride, skip=skip + lag))
+        self._lengths = np.maximum(lengths, 0)
+        self._processes = None
+        self._results = None
+        self._tasks = None
+        self._n_running = 0
+        self._n_finished_trajs = 0
+        self._current = None
+        self._exhausted = False
+
+    def _schedule(self):
+        """ trajectory indices to process, longest trajectories first """
+        order = np.argsort(-self._lengths, kind='mergesort')
+        return [int(itraj) for itraj in order if self._lengths[itraj] > 0]
+
+    def _start(self):
+        schedule = self._schedule()
+        n_workers = min(self._n_jobs, len(schedule))
+        self._tasks = multiprocessing.Queue()
+        for itraj in schedule:
+            self._tasks.put(itraj)
+        for _ in range(n_workers):
+            self._tasks.put(None)
+        # bound the number of chunks waiting for the consumer.
+        self._results = multiprocessing.Queue(maxsize=2 * max(n_workers, 1))
+        self._processes = []
+        for i in range(n_workers):
+            p = multiprocessing.Process(target=_parallel_worker, name='chainsaw-worker-%i' % i,
+                                        args=(self._data_source, self._tasks, self._results, self._skip,
+                                              self._chunk, self._stride, self._lag, self._cols))
+            p.daemon = True
+            p.start()
+            self._processes.append(p)
+        self._n_running = n_workers
+
+    def _stop(self, terminate=False):
+        if self._processes is None:
+            return
+        for p in self._processes:
+            if terminate and p.is_alive():
+                p.terminate()
+            p.join()
+        # the task queue might still contain trajectories, do not wait for it to be flushed.
+        self._tasks.cancel_join_thread()
+        self._tasks.close()
+        self._results.close()
+        self._processes = None
+        self._tasks = None
+        self._results = None
+
+    def _check_workers(self):
+        for p in self._processes:
+            if p.exitcode is not None and p.exitcode != 0:
+                self._exhausted = True
+                self._stop(terminate=True)
+                raise RuntimeError("worker process %s died unexpectedly (exit code %s)" % (p.name, p.exitcode))
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.next()
+
+    def next(self):
+        if self._exhausted:
+            raise StopIteration()
+        if self._processes is None:
+            self._start()
+        while self._n_running > 0:
+            try:
+                msg = self._results.get(timeout=1)
+            except queue.Empty:
+                self._check_workers()
+                continue
+            if msg[0] == 'done':
+                self._n_running -= 1
+                continue
+            if msg[0] == 'error':
+                self._exhausted = True
+                self._stop(terminate=True)
+                raise msg[1]
+            _, itraj, pos, data, last_chunk_in_traj = msg
+            self._current = (itraj, pos, last_chunk_in_traj)
+            if last_chunk_in_traj:
+                self._n_finished_trajs += 1
+            if self._return_trajindex:
+                return (itraj, ) + tuple(data)
+            return data if self._lag > 0 else data[0]
+        self._exhausted = True
+        self._stop()
+        raise StopIteration()
+
+    @property
+    def pos(self):
+        """ position of the current chunk in its trajectory """
+        return self._current[1] if self._current is not None else 0
+
+    @property
+    def current_trajindex(self):
+        """ trajectory index of the current chunk """
+        return self._current[0] if self._current is not None else None
+
+    @property
+    def last_chunk_in_traj(self):
+        return self._current[2] if self._current is not None else False
+
+    @property
+    def last_chunk(self):
+        return self.last_chunk_in_traj and self._n_finished_trajs == np.count_nonzero(self._lengths)
+
+    @property
+    def chunksize(self):
+        return self._chunk
+
+    @property
+    def stride(self):
+        return self._stride
+
+    @property
+    def skip(self):
+        return self._skip
+
+    @property
+    def return_traj_index(self):
+        return self._return_trajindex
+
+    @property
+    def _n_chunks(self):
+        if self._chunk != 0:
+            return int(sum(ceil(l / float(self._chunk)) for l in self._lengths))
+        return int(np.count_nonzero(self._lengths))
+
+    def __len__(self):
+        return int(sum(self._lengths))
+
+    def number_of_trajectories(self):
+        return self._data_source.number_of_trajectories()
+
+    def trajectory_lengths(self):
+        return self._data_source.trajectory_lengths(stride=self._stride, skip=self._skip)
+
+    def n_frames_total(self):
+        return self._data_source.n_frames_total(stride=self._stride, skip=self._skip)
+
+    def reset(self):
+        self._stop(terminate=True)
+        self._current = None
+        self._n_finished_trajs = 0
+        self._exhausted = False
+
+    def close(self):
+        self._stop(terminate=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
@@ -1,23 +1,139 @@
+import copy
+import multiprocessing
 import os
-from collections import defaultdict
+import threading
+from collections import defaultdict, OrderedDict
+from glob import glob
 
 import h5py
 import numpy as np
+from six.moves import queue
 from chainsaw.base.loggable import Loggable
 from chainsaw.util.annotators import fix_docs
+from chainsaw.util.files import mkdir_p, FileLock
 from chainsaw.util.units import bytes_to_string
 from chainsaw.base.reporter import ProgressReporter
 from chainsaw import config
 
 from ._base.datasource import DataSource
+from ._base.iterable import _TrajectoryIterator
 from .data_in_memory import DataInMemoryIterator
+from .util.cache_manager import CacheManager
 from .util.traj_info_cache import TrajectoryInfoCache
 
-# TODO: remove dbg code
-_used_files=[]
+class _MemoryCache(object):
+    """ In-memory tier above the cache files: keeps the most recently used trajectories of all caches as
+    (read-only) arrays within config.cache_memory_size. """
+
+    def __init__(self):
+        self._arrays = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @property
+    def max_size(self):
+        return config.cache_memory_size * 1024 * 1024
+
+    @property
+    def size(self):
+        """ size in bytes of all arrays held. """
+        return self._size
+
+    def __len__(self):
+        return len(self._arrays)
+
+    def get(self, key):
+        if not self._arrays:
+            return None
+        with self._lock:
+            try:
+                arr = self._arrays.pop(key)
+            except KeyError:
+                return None
+            # most recently used ones are at the end
+            self._arrays[key] = arr
+            return arr
+
+    def put(self, key, table):
+        """ loads the given table into memory, if it fits into the budget. Returns the array or None. """
+        max_size = self.max_size
+        nbytes = table.size * table.dtype.itemsize
+        if nbytes > max_size:
+            if not max_size:
+                self.clear()
+            return None
+        arr = table[:]
+        arr.flags.writeable = False
+        with self._lock:
+            old = self._arrays.pop(key, None)
+            if old is not None:
+                self._size -= old.nbytes
+            while self._arrays and self._size + nbytes > max_size:
+                _, evicted = self._arrays.popitem(last=False)
+                self._size -= evicted.nbytes
+            self._arrays[key] = arr
+            self._size += nbytes
+        return arr
+
+    def clear(self):
+        with self._lock:
+            self._arrays.clear()
+            self._size = 0
+
+_memory_cache = _MemoryCache()
+
+# writers of this process by the path of their fill lock. The fill lock is an flock, which would also block
+# other _CacheFile instances (eg. of another Cache of the same pipeline) of this process.
+_process_writers = {}
+_process_writers_lock = threading.Lock()
+
+# estimation parameters, which do not affect the output of a stage.
+_RUNTIME_PARAMETERS = ('n_jobs', 'oom_strategy')
+
+
+class _DatasetWriter(object):
+    """ Writes the data of one trajectory to a private temporary file, which is atomically renamed to the
+    published dataset file, once it is complete. The fill lock of the dataset is held meanwhile. """
+
+    def __init__(self, cache_file, hash_value, lock, shape, options):
+        self.cache_file = cache_file
+        self.hash_value = hash_value
+        self.published = False
+        self._lock = lock
+        self._path = cache_file._dataset_file(hash_value)
+        self._tmp_path = "{path}.tmp.{pid}.{id}".format(path=self._path, pid=os.getpid(), id=id(self))
+        self._file = h5py.File(self._tmp_path, mode='w')
+        self.table = self._file.create_dataset('data', shape=shape, **options)
+
+    def publish(self):
+        self._file.close()
+        os.rename(self._tmp_path, self._path)
+        self.published = True
+        self._release()
+        self.cache_file._on_published(self.hash_value)
+
+    def abort(self):
+        self._file.close()
+        try:
+            os.unlink(self._tmp_path)
+        except OSError:
+            pass
+        self._release()
+
+    def _release(self):
+        with _process_writers_lock:
+            _process_writers.pop(self._lock.path, None)
+        self._lock.release()
 
 
 class _CacheFile(Loggable, ProgressReporter):
+    """ The cache of one pipeline: a directory containing one HDF5 file per trajectory.
+
+    Several processes may share the cache. A trajectory is filled by only one of them, while holding the
+    fill lock of the dataset, the others wait for it to be published. Datasets are written to temporary
+    files and atomically renamed once complete, so they never see partially written data.
+    """
+
     def __init__(self, cache, name):
         """
         Parameters
@@ -26,75 +142,84 @@ class _CacheFile(Loggable, ProgressReporter):
             the associated Cache instance to which this _CacheFile belongs to.
 
         name: str
-            file name of the underlying cache file.
+            name of the cache directory (inside config.cache_dir).
 
         """
 
         self.cache = cache
         self.data_source = cache.data_producer
         self.file_name = os.path.join(config.cache_dir, name)
-        try:
-            self.file_handle = self._cache_file = h5py.File(name=self.file_name, mode='a')
-        except:
-            raise
+        mkdir_p(self.file_name)
         self.misses = 0
         self.hits = defaultdict(int)
-        x = len(self._cache_file)
-        k= self._cache_file.keys()
-        it = self._cache_file.items()
-        if self.file_handle.items():
-            self.validate_cache()
+        # number of hits served by the in-memory tier
+        self.memory_hits = 0
+        # number of datasets evicted by the cache manager to stay within config.cache_max_size
+        self.evictions = 0
+        # read handles of published datasets by hash
+        self._handles = {}
+        self.manager = CacheManager.instance(config.cache_dir)
+        self.manager.register(self)
+
+    @property
+    def name(self):
+        """ name of the cache directory inside config.cache_dir. """
+        return os.path.basename(self.file_name)
 
     @property
     def description(self):
-        return self._cache_file.attrs
+        with open(os.path.join(self.file_name, 'description')) as fh:
+            return fh.read()
 
     @description.setter
     def description(self, value):
-        self._cache_file.attrs['description'] = value
-        fn, _ = os.path.splitext(self.file_name)
-        d = os.path.dirname(self.file_name)
-        with open(os.path.join(d, fn), 'w') as fh:
+        with open(os.path.join(self.file_name, 'description'), 'w') as fh:
             from chainsaw import version
             fh.write("# CacheFile description generated by PyEMMA-{version}\n# DO NOT EDIT!".format(version=version))
             fh.write(str(value))
 
-    def validate_cache(self):
-        # 0. we've ensured that different parameters or pipeline arrangement will use another cache file!
-        # 1. check shapes, remove those which do not match.
-        self.logger.debug("validate")
-        for i, item in enumerate(self.file_handle.items()):
-            desired = (self.data_source.trajectory_length(i), self.cache.ndim)
-            if item[1].shape != desired:
-                self.logger.debug("shape mismatch, removing: {} != {}".format(item[1].shape, desired))
-                del self.file_handle[item[0]]
-        self.file_handle.flush()
-
-    def _create_cache_itraj(self, itraj, traj_info):
-        length = self.cache.data_producer.trajectory_length(itraj) #traj_info.length
-        ndim = self.cache.data_producer.ndim # traj_info.ndim
-        try:
-            dataset = self.file_handle.create_dataset(name=traj_info.hash_value,
-                                                      shape=(length, ndim),
-                                                      dtype=self.cache.output_type(),
-                                                      chunks=True,
-                                                      )
-            self.file_handle.flush()
+    def _dataset_file(self, hash_value):
+        return os.path.join(self.file_name, hash_value + '.h5')
+
+    def datasets(self):
+        """ hashes of all published datasets. """
+        return [f[:-len('.h5')] for f in os.listdir(self.file_name) if f.endswith('.h5')]
+
+    def _expected_shape(self, itraj):
+        return self.data_source.trajectory_length(itraj), self.cache.ndim
+
+    def _published(self, itraj, hash_value):
+        """ returns the published dataset or None, if it does not exist (or has been evicted). """
+        path = self._dataset_file(hash_value)
+        handle = self._handles.get(hash_value, None)
+        if not os.path.exists(path):
+            # not closed explicitly, iterators might still read from it.
+            self._handles.pop(hash_value, None)
+            return None
+        if handle is None:
+            handle = h5py.File(path, mode='r')
+            self._handles[hash_value] = handle
+        table = handle['data']
+        if table.shape != self._expected_shape(itraj):
+            self.logger.debug("shape mismatch, refilling: {} != {}".format(table.shape, self._expected_shape(itraj)))
+            return None
+        return table
+
+    def _on_published(self, hash_value):
+        self.manager.add(self.name, hash_value, os.path.getsize(self._dataset_file(hash_value)))
 
-        except:
-            raise
-        return dataset
+    def _on_evicted(self, hash_value):
+        self.evictions += 1
+        self._handles.pop(hash_value, None)
 
     def fill_cache(self, table, itraj):
         t = 0
         #assert table.ndim == self.data_source.dimension()
-        with self.data_source.iterator(chunk=self.data_source.chunksize) as it:
-            it.state.itraj = itraj
+        it = self.data_source.iterator(chunk=self.data_source.chunksize)
+        with it, _TrajectoryIterator(it, itraj) as traj_it:
             n_chunks_for_itraj = it._n_chunks
             self._progress_register(n_chunks_for_itraj, description="fill cache for traj={}".format(itraj))
-            for itraj_iter, chunk in it:
-                if itraj_iter != itraj:
-                    break
+            for _, chunk in traj_it:
                 n = len(chunk)
                 table[t:t + n] = chunk[:]
                 t += n
@@ -103,17 +228,71 @@ class _CacheFile(Loggable, ProgressReporter):
         if self.data_source.chunksize:
             self._progress_force_finish()
 
-        self.file_handle.flush()
         return table
 
+    def is_complete(self, itraj):
+        """ whether the data of the given trajectory is completely contained in the cache. """
+        return os.path.exists(self._dataset_file(self._itraj_to_file_hash(itraj).hash_value))
+
+    def begin_write(self, itraj):
+        """ acquires the fill lock of the given trajectory and returns a _DatasetWriter, which is filled by
+        the caller chunk by chunk and published afterwards.
+
+        Waits, if another process is filling this trajectory. Returns None, if the data has been published
+        meanwhile or if it is already being written by this process (by any cache of the same pipeline).
+        """
+        hash_value = self._itraj_to_file_hash(itraj).hash_value
+        lock = FileLock(self._lock_file(hash_value))
+        with _process_writers_lock:
+            if lock.path in _process_writers:
+                return None
+            acquired = lock.acquire(blocking=False)
+        if not acquired:
+            self.logger.info("waiting for another process filling the cache for traj={}".format(itraj))
+            lock.acquire()
+        writer = None
+        try:
+            if self._published(itraj, hash_value) is None:
+                # remove leftovers of interrupted writers
+                for f in glob(self._dataset_file(hash_value) + '.tmp.*'):
+                    os.unlink(f)
+                shape = self._expected_shape(itraj)
+                writer = _DatasetWriter(self, hash_value, lock, shape, self.cache._dataset_options(shape))
+                self.misses += 1
+                with _process_writers_lock:
+                    _process_writers[lock.path] = writer
+        finally:
+            if writer is None:
+                lock.release()
+        return writer
+
+    def _lock_file(self, hash_value):
+        """ fill lock of the dataset with the given hash. """
+        return self._dataset_file(hash_value) + '.lock'
+
     def _itraj_to_file_hash(self, itraj):
         file = self.cache.filenames[itraj]
+        reader = self.cache._real_reader
+        # readers with several trajectories per file (eg. H5FileReader) tell them apart by their names.
+        name = reader._trajectory_name(itraj) if hasattr(reader, '_trajectory_name') else None
+        # remember the infos of unchanged files, so they are neither looked up again nor in worker processes.
+        st = os.stat(file)
+        key = (file, st.st_mtime, st.st_size, name)
+        try:
+            return self.cache._traj_infos[key]
+        except KeyError:
+            pass
         inst = TrajectoryInfoCache.instance()
         if config.use_trajectory_lengths_cache:
-            info = inst[file, self.cache._real_reader]
+            info = inst[file, reader]
         else:
-            info = self.cache._real_reader._get_traj_info(file)
+            info = reader._get_traj_info(file)
             info.hash_value = inst.hash_file(file)
+        if name is not None:
+            from hashlib import md5
+            info = copy.copy(info)
+            info.hash_value = md5((info.hash_value + name).encode()).hexdigest()
+        self.cache._traj_infos[key] = info
         return info
 
     def __getitem__(self, itraj):
@@ -129,47 +308,213 @@ class _CacheFile(Loggable, ProgressReporter):
         table
 
         """
-        traj_info = self._itraj_to_file_hash(itraj)
-        try:
-            res = self.file_handle[traj_info.hash_value]
+        hash_value = self._itraj_to_file_hash(itraj).hash_value
+        res = _memory_cache.get((self.file_name, hash_value))
+        if res is not None:
             self.hits[itraj] += 1
-            #self.logger.debug("HIT")
+            self.memory_hits += 1
+            self.manager.access(self.name, hash_value)
             return res
-        except KeyError:
-            #self.logger.debug("MISS")
-            self.misses += 1
-            # 1. create table
-            table = self._create_cache_itraj(itraj, traj_info)
-
-            # 2. fill cache
-            self.fill_cache(table, itraj)
-
-            return table
+        res = self._published(itraj, hash_value)
+        if res is not None:
+            self.hits[itraj] += 1
+            self.manager.access(self.name, hash_value)
+            return self._to_memory(hash_value, res)
+        writer = _process_writers.get(self._lock_file(hash_value), None)
+        if writer is None:
+            writer = self.begin_write(itraj)
+        # else another iterator of this process (possibly of another cache of the same pipeline) writes this
+        # trajectory, which we can not wait for.
+        if writer is not None:
+            try:
+                self.fill_cache(writer.table, itraj)
+            except:
+                writer.abort()
+                raise
+            writer.publish()
+        # published by us or another process
+        return self._to_memory(hash_value, self._published(itraj, hash_value))
+
+    def _to_memory(self, hash_value, table):
+        arr = _memory_cache.put((self.file_name, hash_value), table)
+        return arr if arr is not None else table
 
     def __repr__(self):
-        size = bytes_to_string(self.file_handle.id.get_filesize())
-        return "[CacheFile {fn}: items={n} size={size}]".format(fn=self.file_handle.filename,
-                                                                n=len(self.file_handle),
+        size = bytes_to_string(sum(os.path.getsize(self._dataset_file(h)) for h in self.datasets()))
+        return "[CacheFile {fn}: items={n} size={size}]".format(fn=self.file_name,
+                                                                n=len(self),
                                                                 size=size)
 
     def __len__(self):
-        return len(self.file_handle)
+        return len(self.datasets())
+
+
+class _CacheIterator(DataInMemoryIterator):
+    """ Iterates the cached data.
+
+    Trajectories, which are not yet contained in the cache, are streamed from the data producer and
+    written to the cache chunk by chunk while they are consumed (write-through), so the producer is not
+    iterated twice. This requires visiting all frames of a trajectory in order (stride=1, skip=0),
+    otherwise these trajectories are filled completely before being read.
+    """
+
+    def __init__(self, data_source, skip=0, chunk=0, stride=1, return_trajindex=False, cols=None):
+        super(_CacheIterator, self).__init__(data_source, skip, chunk, stride, return_trajindex, cols)
+        self._write_through = self.uniform_stride and self.stride == 1 and self.skip == 0
+        self._producer_it = None
+        self._writer = None
+        # the pipeline does not change during iteration, so look up the cache (file) only once.
+        self._cache_file = data_source.data
+        self._current = (None, None)
+
+    def _trajectory(self, itraj):
+        if self._current[0] != itraj:
+            self._current = (itraj, self._cache_file[itraj])
+        return self._current[1]
+
+    def _stop_write_through(self):
+        if self._producer_it is not None:
+            self._producer_it.close()
+        if self._writer is not None and not self._writer.published:
+            self._writer.abort()
+        self._producer_it = self._writer = None
+
+    def close(self):
+        self._stop_write_through()
+
+    def reset(self):
+        super(_CacheIterator, self).reset()
+        self._stop_write_through()
+        self._current = (None, None)
+
+    def _select_trajectory(self, itraj):
+        self._stop_write_through()
+        self._current = (None, None)
+        super(_CacheIterator, self)._select_trajectory(itraj)
+
+    def _next_chunk(self):
+        # the data might be stored with less precision
+        return self._next_stored_chunk().astype(self._data_source.output_type(), copy=False)
+
+    def _next_stored_chunk(self):
+        if self._writer is None:
+            if (not self._write_through or self._t > 0 or self._itraj >= self._data_source.ntraj
+                    or self._cache_file.is_complete(self._itraj)):
+                return super(_CacheIterator, self)._next_chunk()
+            # start writing this trajectory
+            self._writer = self._cache_file.begin_write(self._itraj)
+            if self._writer is None:
+                return super(_CacheIterator, self)._next_chunk()
+            if self._data_source.trajectory_length(self._itraj) == 0:
+                # the producer yields no chunk for an empty trajectory, so publish the empty table directly.
+                X = np.empty((0, self._data_source.ndim), dtype=self._writer.table.dtype)
+                self._writer.publish()
+                self._stop_write_through()
+                self._itraj += 1
+                return X
+            producer_it = self._data_source.data_producer._create_iterator(
+                chunk=self.chunksize, return_trajindex=True)
+            self._producer_it = _TrajectoryIterator(producer_it, self._itraj)
+        elif self._writer.published:
+            # completely filled meanwhile by another iterator of this process.
+            self._stop_write_through()
+            return super(_CacheIterator, self)._next_chunk()
+
+        _, X = next(self._producer_it)
+        table = self._writer.table
+        X = X.astype(table.dtype, copy=False)
+        table[self._t:self._t + len(X)] = X
+        self._t += len(X)
+        if self._producer_it._done:
+            self._writer.publish()
+            self._stop_write_through()
+            self._itraj += 1
+            self._t = 0
+        return X
+
+
+def _warm_worker(cache, tasks, results):
+    """ fills the trajectories of the task queue until it receives None, see Cache.warm.
+
+    Puts ('traj', itraj, filled) tuples into the result queue, a final ('done', ) message signals the end of
+    the worker, errors are reported as ('error', exception).
+    """
+    try:
+        config.show_progress_bars = False
+        # the sqlite connections and HDF5 handles of the parent process must not be used after fork.
+        CacheManager._instances = {}
+        _process_writers.clear()
+        cache._cache_files = {}
+        data = cache.data
+        while True:
+            itraj = tasks.get()
+            if itraj is None:
+                break
+            writer = data.begin_write(itraj)
+            if writer is not None:
+                try:
+                    data.fill_cache(writer.table, itraj)
+                except:
+                    writer.abort()
+                    raise
+                writer.publish()
+            results.put(('traj', itraj, writer is not None))
+        data.manager.close()
+        results.put(('done', ))
+    except Exception as e:
+        results.put(('error', e))
 
 
 @fix_docs
 class Cache(DataSource):
     """ This class caches the output of its data producer
 
-    TODO
-    ----
-    * how to ensure that we invalidate the cache in case of parameter changes
-    * invalidate or switch file/dataset?
-    *
+    Parameters
+    ----------
+    data_source : Iterable
+        the stage whose output is cached.
+    chunksize : int, default=1000
+        default number of frames per chunk of iterators.
+    fill_cache : bool, default=True
+        open the cache immediately.
+    compression : str, optional
+        compression filter of the HDF5 datasets, 'lzf' (fast) or 'gzip'.
+    compression_opts : int, optional
+        compression level for gzip (0-9).
+    shuffle : bool, default=False
+        apply the HDF5 shuffle filter before compression, which usually improves the compression ratio of
+        floating point data.
+    storage_dtype : numpy dtype, optional
+        store the data with another precision (eg. np.float16 for features tolerating it). It is converted
+        back to the output type when read. Defaults to the output type of the data source.
+    chunks : None, 'auto' or int, default=None
+        number of frames per HDF5 chunk. 'auto' aligns the chunks with the chunksize, so reading a chunk reads
+        exactly one HDF5 chunk. None lets h5py guess the chunk shape.
+
+    Notes
+    -----
+    The cache does not need to be invalidated. Every pipeline gets a cache directory of its own, named by the
+    parameters (and estimated models) of its stages, see :meth:`stage_key`. Changing a parameter switches to
+    another directory, while the old one is kept until it gets evicted. Within a directory the datasets are
+    named by the hashes of the input files, so modified files are cached anew.
     """
 
-    def __init__(self, data_source, chunksize=1000, fill_cache=True):
+    def __init__(self, data_source, chunksize=1000, fill_cache=True, compression=None, compression_opts=None,
+                 shuffle=False, storage_dtype=None, chunks=None):
         super(Cache, self).__init__(chunksize=chunksize)
 
+        if compression not in (None, 'lzf', 'gzip'):
+            raise ValueError("compression has to be one of None, 'lzf' or 'gzip', but was {}".format(compression))
+        if compression_opts is not None and compression != 'gzip':
+            raise ValueError("compression_opts are only supported for gzip")
+        if not (chunks is None or chunks == 'auto' or (isinstance(chunks, int) and chunks > 0)):
+            raise ValueError("chunks has to be None, 'auto' or a positive int, but was {}".format(chunks))
+        self.compression = compression
+        self.compression_opts = compression_opts
+        self.shuffle = shuffle
+        self.storage_dtype = np.dtype(storage_dtype) if storage_dtype is not None else None
+        self.chunks = chunks
+
         self.data_producer = data_source
         reader = self.data_producer
         while not reader.is_reader:
@@ -183,11 +528,13 @@ class Cache(DataSource):
         # provide the data list
         #self._cache_files = {self.current_cache_file_name: first_cache_file}
         self._cache_files = {}
+        self._traj_infos = {}
         if fill_cache:
             self.data
 
         self._ndim = self.data_producer.ndim
-        self._ntraj = self.data_producer.ntraj
+        # transformers do not set ntraj
+        self._ntraj = self.data_producer.number_of_trajectories()
         self._lengths = self.data_producer.trajectory_lengths()
 
     @property
@@ -211,69 +558,192 @@ class Cache(DataSource):
         # self.data.invalidate()
         self._data_producer = val
 
+    @staticmethod
+    def _stage_description(stage):
+        """ describes the output of the given stage itself (without its input). """
+        if stage.is_reader:
+            from chainsaw.data import FeatureReader
+            if isinstance(stage, FeatureReader):
+                return [stage.__class__.__name__, stage.featurizer.describe()]
+            # only use input dimension, the data of the files is identified by their hashes.
+            return [stage.__class__.__name__, stage.ndim]
+        estimator = hasattr(stage, '_estimated')  # duck-type chainsaw.base.estimator.Estimator
+        if estimator and not stage._estimated:
+            raise ValueError("The output of {} depends on its model, so it has to be estimated before its "
+                             "output can be identified.".format(stage.__class__.__name__))
+        description = [stage.__class__.__name__, stage.ndim]
+        if estimator:
+            # only parameters affecting the output, runtime options like n_jobs do not change it.
+            description.extend(sorted((name, value) for name, value in stage.get_params(deep=False).items()
+                                      if name not in _RUNTIME_PARAMETERS))
+            # estimations need not be deterministic (eg. k-means without fixed seed), so the estimation
+            # parameters alone do not identify the output.
+            state = Cache._fitted_state(stage)
+            if state is not None:
+                description.append(state)
+        return description
+
+    @staticmethod
+    def _fitted_state(stage):
+        """ hash of the estimated model of the given stage, which determines its output together with the
+        estimation parameters, or None for stages without a known model. """
+        from hashlib import sha256
+        from chainsaw.clustering.interface import AbstractClustering
+        if isinstance(stage, AbstractClustering):
+            arrays = [stage.clustercenters]
+        else:
+            model = getattr(stage, '_model', None)
+            if not (hasattr(model, 'mean') and hasattr(model, 'eigenvectors')):  # TICA and PCA
+                return None
+            arrays = [model.mean, model.eigenvectors]
+        hasher = sha256()
+        for a in arrays:
+            a = np.ascontiguousarray(a)
+            hasher.update(str((a.dtype.str, a.shape)).encode())
+            hasher.update(a.data)
+        return hasher.hexdigest()
+
+    @staticmethod
+    def stage_key(stage):
+        """ key identifying the output of the given pipeline stage.
+
+        It is built from the description (parameters) of the stage and the key of its input, so a stage can
+        be cached on its own and its cache is reused by every pipeline containing the same upstream stages.
+        The description of an estimated stage contains a hash of its model (cluster centers of clusterings,
+        mean and eigenvectors of TICA and PCA), so every new estimation gets a key of its own. Stages, which
+        have not been estimated yet, have no key (ValueError). Parameters, which do not change the output
+        (eg. n_jobs), are not part of the key. Caches are transparent, eg. the key of Cache(tica)
+        equals the one of tica.
+        """
+        from hashlib import sha256
+        while isinstance(stage, Cache):
+            stage = stage.data_producer
+        hasher = sha256()
+        hasher.update(str(Cache._stage_description(stage)).encode())
+        if not stage.is_reader:
+            hasher.update(Cache.stage_key(stage.data_producer).encode())
+        return hasher.hexdigest()
+
     @property
     def input_description(self):
+        """ descriptions of all stages from the data producer up to the reader. """
         descriptions = []
-
-        from chainsaw.data import FeatureReader
-        if isinstance(self._real_reader, FeatureReader):
-            self.logger.debug("using describe() of FeatureReader")
-            descriptions.append(self._real_reader.featurizer.describe())
-        else:
-            # only use input dimension
-            descriptions.append(self._real_reader.__class__.__name__)
-            descriptions.append((self._real_reader.ndim))
-
-        # get params of estimators
-        from chainsaw.base.estimator import Estimator
-        from chainsaw.transform.transformer import StreamingTransformer
-
         dp = self.data_producer
-        while dp is not dp.data_producer:
-            # add output dimension
-            descriptions.append(dp.ndim)
-            if hasattr(dp, '_estimated'):  # duck-type chainsaw.base.estimator.Estimator
-                descriptions.append(repr(dp))
-                # this is too fine-grained...
-                #if dp._estimated:
-                #    descriptions.append(repr(dp.model.get_model_params(deep=False)))
-
-            if isinstance(dp, StreamingTransformer):
-                pass
+        while True:
+            if not isinstance(dp, Cache):
+                descriptions.append(self._stage_description(dp))
+            if dp.is_reader:
+                break
             dp = dp.data_producer
-
-        # TODO: we maybe do not have a pipeline, but just a reader without descriptions, but we do not want to include the filenames, right?
-
-
-        import pprint
-        self.logger.error("descriptions:\n{}".format(pprint.pformat(descriptions)))
-
         return descriptions
 
     @property
     def current_cache_file_name(self):
-        """ file name of the cache.
+        """ name of the cache (directory).
 
         it is unique depending on the pipeline structure and the estimation parameters of each
-        element in the pipeline
+        element in the pipeline, see :meth:`stage_key`.
 
         """
-        # hash description list to build file name
-        from hashlib import sha256
-        hasher = sha256()
-        inp = str(self.input_description).encode()
-        hasher.update(inp)
-        res = hasher.hexdigest()
-        res = "{prefix}_{hash}.{suffix}".format(prefix=self._data_producer.__class__.__name__,
-                                                 hash=res, suffix="hdf5")
+        stage = self._data_producer
+        while isinstance(stage, Cache):
+            stage = stage.data_producer
+        res = "{prefix}_{hash}".format(prefix=stage.__class__.__name__, hash=self.stage_key(stage))
+        if self.storage_dtype is not None and self.storage_dtype != self.output_type():
+            # the data differs from the one stored with full precision
+            res += "_" + self.storage_dtype.name
         self.logger.debug("current file name: {}".format(res))
-        _used_files.append(res)
         return res
 
+    def warm(self, n_jobs=None):
+        """ fills the cache for all missing trajectories with a pool of worker processes.
+
+        Every worker fills whole trajectories (longest ones first), which are published to the cache one by
+        one, so it does not matter if another process fills the same cache meanwhile. The cache (and its
+        pipeline) has to be picklable, if the platform does not fork new processes.
+
+        Parameters
+        ----------
+        n_jobs : int, default=None
+            number of worker processes, defaults to the number of CPUs.
+
+        Returns
+        -------
+        n_filled : int
+            number of trajectories filled by the workers.
+        """
+        if n_jobs is None:
+            n_jobs = multiprocessing.cpu_count()
+        if n_jobs < 1:
+            raise ValueError("n_jobs has to be a positive integer, but was %s" % n_jobs)
+        data = self.data
+        lengths = self.trajectory_lengths()
+        missing = [itraj for itraj in np.argsort(-lengths, kind='mergesort')
+                   if lengths[itraj] > 0 and not data.is_complete(itraj)]
+        if not missing:
+            return 0
+        n_workers = min(n_jobs, len(missing))
+        tasks = multiprocessing.Queue()
+        for itraj in missing:
+            tasks.put(int(itraj))
+        for _ in range(n_workers):
+            tasks.put(None)
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=_warm_worker, name='chainsaw-cache-worker-%i' % i,
+                                             args=(self, tasks, results))
+                     for i in range(n_workers)]
+        for p in processes:
+            p.daemon = True
+            p.start()
+
+        self._progress_register(len(missing), description='filling cache', stage=0)
+        n_filled = 0
+        n_running = n_workers
+        try:
+            while n_running > 0:
+                try:
+                    msg = results.get(timeout=1)
+                except queue.Empty:
+                    died = [p for p in processes if p.exitcode not in (None, 0)]
+                    if died:
+                        raise RuntimeError("worker process %s died unexpectedly (exit code %s)"
+                                           % (died[0].name, died[0].exitcode))
+                    continue
+                if msg[0] == 'done':
+                    n_running -= 1
+                elif msg[0] == 'error':
+                    raise msg[1]
+                else:
+                    n_filled += msg[2]
+                    self._progress_update(1, stage=0)
+        finally:
+            for p in processes:
+                if n_running > 0 and p.is_alive():
+                    p.terminate()
+                p.join()
+            tasks.cancel_join_thread()
+            self._progress_force_finish(stage=0)
+        data.misses += n_filled
+        return n_filled
+
+    def _dataset_options(self, shape):
+        """ arguments for h5py.Group.create_dataset of a trajectory with the given shape. """
+        dtype = self.storage_dtype if self.storage_dtype is not None else np.dtype(self.output_type())
+        options = dict(dtype=dtype, chunks=True, compression=self.compression,
+                       compression_opts=self.compression_opts, shuffle=self.shuffle)
+        if self.chunks is not None and shape[0] > 0:
+            frames = self.chunks if self.chunks != 'auto' else (self.chunksize or shape[0])
+            # HDF5 chunks are limited to 4GB
+            max_frames = max(1, (2**32 - 1) // (max(shape[1], 1) * dtype.itemsize))
+            options['chunks'] = (int(min(frames, shape[0], max_frames)), shape[1])
+        return options
+
     def _create_iterator(self, skip=0, chunk=0, stride=1, return_trajindex=True, cols=None):
-        return DataInMemoryIterator(self, skip, chunk, stride, return_trajindex, cols)
+        return _CacheIterator(self, skip, chunk, stride, return_trajindex, cols)
 
-    def get_output(self, dimensions=slice(0, None), stride=1, skip=0, chunk=None):
+    def get_output(self, dimensions=slice(0, None), stride=1, skip=0, chunk=None, n_jobs=None, out=None):
+        if out is not None or (n_jobs is not None and n_jobs > 1):
+            return super(Cache, self).get_output(dimensions, stride, skip, chunk, n_jobs, out)
         if isinstance(dimensions, int):
             ndim = 1
             dimensions = slice(dimensions, dimensions + 1)
@@ -287,8 +757,8 @@ class Cache(DataSource):
         dim_inds = dimensions.indices(1)
         self.logger.debug("dim slice: {}; dim inds: {}".format(dimensions, dim_inds))
 
-        res = [traj[skip::stride, dimensions] for traj in self.data]
-        assert all(isinstance(o, np.ndarray) for o in res)
+        # copy, since trajectories held in memory are read-only and might be stored with less precision.
+        res = [np.array(traj[skip::stride, dimensions], dtype=self.output_type()) for traj in self.data]
         return res
 
     def __len__(self):
@@ -239,12 +239,16 @@ class DataInMemoryIterator(DataSourceIterator):
         super(DataInMemoryIterator, self).__init__(data_source, skip, chunk,
                                                    stride, return_trajindex, cols)
 
+    def _trajectory(self, itraj):
+        """ returns the (array like) data of the given trajectory. """
+        return self._data_source.data[itraj]
+
     def _next_chunk(self):
         if self._itraj >= self._data_source.ntraj:
             raise StopIteration()
 
         traj_len = self._data_source._lengths[self._itraj]
-        traj = self._data_source.data[self._itraj]
+        traj = self._trajectory(self._itraj)
 
         # only apply _skip at the beginning of each trajectory
         skip = self.skip if self._t == 0 else 0
@@ -252,7 +256,7 @@ class DataInMemoryIterator(DataSourceIterator):
         # complete trajectory mode
         if self.chunksize == 0:
             if not self.uniform_stride:
-                chunk = self._data_source.data[self._itraj][self.ra_indices_for_traj(self._itraj)]
+                chunk = traj[self.ra_indices_for_traj(self._itraj)]
                 self._itraj += 1
                 # skip trajs which are not included in stride
                 while self._itraj not in self.traj_keys and self._itraj < self.number_of_trajectories():
@@ -265,7 +269,7 @@ class DataInMemoryIterator(DataSourceIterator):
         # chunked mode
         else:
             if not self.uniform_stride:
-                random_access_chunk = self._data_source.data[self._itraj][
+                random_access_chunk = traj[
                     self.ra_indices_for_traj(self._itraj)[self._t:min(
                             self._t + self.chunksize, self.ra_trajectory_length(self._itraj)
                     )]
@@ -0,0 +1,433 @@
+# This file is part of PyEMMA.
+#
+# Copyright (c) 2016 Computational Molecular Biology Group, Freie Universitaet Berlin (GER)
+#
+# PyEMMA is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Directory based store of features, which is compressed and gives fast random access.
+
+Layout of a store directory::
+
+    index.json          format version, dimension, dtype, block size, compression, shuffle and trajectory lengths
+    <name>.blocks       the blocks of a trajectory, each holding block_size frames (the last one may hold
+                        less). The columns of a block are stored one after another, each compressed on its own
+                        (optionally after grouping the bytes of the values by their significance, like the HDF5
+                        shuffle filter).
+    <name>.index.npz    'offsets': byte offsets of the columns of every block, shape (n_blocks, ndim + 1),
+                        'min', 'max': minimum and maximum of every column of every block, shape (n_blocks, ndim)
+
+Reading frames only decompresses the requested columns of the blocks containing them.
+Stores are written by :meth:`chainsaw.data._base.iterable.Iterable.write_store` and read by
+:class:`FeatureStoreReader`, which is also returned by :func:`chainsaw.api.source` for a store directory.
+"""
+
+from __future__ import absolute_import
+
+import errno
+import json
+import numbers
+import os
+
+import numpy as np
+
+from chainsaw.data._base.datasource import DataSourceIterator, DataSource, _RandomAccessFileIteratorMixin
+from chainsaw.data.md.feature_reader import (FeatureReaderCuboidRandomAccessStrategy,
+                                             FeatureReaderJaggedRandomAccessStrategy,
+                                             FeatureReaderLinearItrajRandomAccessStrategy,
+                                             FeatureReaderLinearRandomAccessStrategy)
+from chainsaw.data.util.traj_info_cache import TrajInfo
+from chainsaw.util.annotators import fix_docs
+from chainsaw.util.files import mkdir_p
+
+__all__ = ['FeatureStoreReader', 'FeatureStoreWriter']
+
+STORE_INDEX = 'index.json'
+STORE_FORMAT = 'chainsaw-feature-store'
+STORE_VERSION = 1
+
+COMPRESSIONS = (None, 'zlib', 'bz2', 'lzma')
+
+
+def _compress(data, compression, level):
+    if compression is None:
+        return data
+    if compression == 'zlib':
+        import zlib
+        return zlib.compress(data, level if level is not None else 6)
+    if compression == 'bz2':
+        import bz2
+        return bz2.compress(data, level if level is not None else 9)
+    import lzma
+    return lzma.compress(data, preset=level)
+
+
+def _decompress(data, compression):
+    if compression is None:
+        return data
+    if compression == 'zlib':
+        import zlib
+        return zlib.decompress(data)
+    if compression == 'bz2':
+        import bz2
+        return bz2.decompress(data)
+    import lzma
+    return lzma.decompress(data)
+
+
+class FeatureStoreWriter(object):
+    r""" writes trajectories to a feature store directory.
+
+    Rows are appended per trajectory with :meth:`write`, the store is complete once :meth:`close` has
+    written its index.
+
+    Parameters
+    ----------
+    path : str
+        directory of the store
+    ntraj : int
+        number of trajectories
+    ndim : int
+        number of columns
+    block_size : int, default=1000
+        number of frames per block, the unit of compression and random access
+    compression : str or None, default='zlib'
+        one of None, 'zlib', 'bz2' or 'lzma'
+    compression_level : int, optional
+        level of the compression, defaults to the default of the compression library
+    shuffle : bool, default=False
+        group the bytes of the values by their significance before compressing them, which usually
+        improves the compression of floating point data.
+    dtype : numpy dtype, optional
+        type of the stored data, defaults to the type of the first written rows
+    overwrite : bool, default=False
+        replace an existing store, otherwise an existing path raises.
+    """
+
+    def __init__(self, path, ntraj, ndim, block_size=1000, compression='zlib', compression_level=None,
+                 shuffle=False, dtype=None, overwrite=False):
+        if compression not in COMPRESSIONS:
+            raise ValueError("compression has to be one of {}, but was {}".format(COMPRESSIONS, compression))
+        if not (isinstance(block_size, numbers.Integral) and block_size > 0):
+            raise ValueError("block_size has to be a positive int, but was {}".format(block_size))
+        if os.path.exists(path) and (not os.path.isdir(path) or os.listdir(path)):
+            if not FeatureStoreReader.is_store(path):
+                raise ValueError('refusing to write to "{}", which is no feature store'.format(path))
+            if not overwrite:
+                raise OSError(errno.EEXIST, "feature store already exists", path)
+            # the index first, so the store is not found, if it is left incomplete.
+            os.unlink(os.path.join(path, STORE_INDEX))
+            # only remove the files of the store, everything else in the directory is kept.
+            for f in os.listdir(path):
+                f = os.path.join(path, f)
+                if os.path.isfile(f) and f.endswith(('.blocks', '.index.npz', STORE_INDEX + '.tmp')):
+                    os.unlink(f)
+        mkdir_p(path)
+
+        self.path = path
+        self.ndim = ndim
+        self.block_size = int(block_size)
+        self.compression = compression
+        self.compression_level = compression_level
+        self.shuffle = shuffle
+        self.dtype = np.dtype(dtype) if dtype is not None else None
+        width = len(str(max(ntraj - 1, 0)))
+        self._names = ['traj_%0*i' % (width, itraj) for itraj in range(ntraj)]
+        self._lengths = [0] * ntraj
+        self._written = [False] * ntraj
+
+        self._itraj = None
+        self._file = None
+        self._pending = []
+        self._n_pending = 0
+        self._offsets = []
+        self._min = []
+        self._max = []
+
+    def write(self, itraj, X):
+        """ appends the rows X to trajectory itraj. Trajectories have to be written one after another. """
+        if itraj != self._itraj:
+            if self._written[itraj]:
+                raise ValueError("trajectory {} has already been written".format(itraj))
+            self._end_trajectory()
+            self._begin_trajectory(itraj)
+        if self.dtype is None:
+            self.dtype = np.asarray(X).dtype
+        X = np.asarray(X, dtype=self.dtype).reshape(-1, self.ndim)
+        self._pending.append(X)
+        self._n_pending += len(X)
+        self._lengths[itraj] += len(X)
+        if self._n_pending >= self.block_size:
+            rows = np.concatenate(self._pending)
+            n_blocks = len(rows) // self.block_size
+            for b in range(n_blocks):
+                self._write_block(rows[b * self.block_size:(b + 1) * self.block_size])
+            rest = rows[n_blocks * self.block_size:]
+            self._pending, self._n_pending = [rest], len(rest)
+
+    def close(self):
+        """ writes the remaining rows and the index of the store. """
+        self._end_trajectory()
+        # trajectories without any rows
+        for itraj in range(len(self._names)):
+            if not self._written[itraj]:
+                self._begin_trajectory(itraj)
+                self._end_trajectory()
+        index = {'format': STORE_FORMAT,
+                 'version': STORE_VERSION,
+                 'ndim': int(self.ndim),
+                 'dtype': (self.dtype if self.dtype is not None else np.dtype(np.float32)).str,
+                 'block_size': self.block_size,
+                 'compression': self.compression,
+                 'shuffle': bool(self.shuffle),
+                 'trajectories': [{'name': name, 'length': int(length)}
+                                  for name, length in zip(self._names, self._lengths)]}
+        # the index is written last, so incomplete stores are not found.
+        tmp = os.path.join(self.path, STORE_INDEX + '.tmp')
+        with open(tmp, 'w') as fh:
+            json.dump(index, fh, indent=1)
+        os.rename(tmp, os.path.join(self.path, STORE_INDEX))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        elif self._file is not None:
+            self._file.close()
+        return False
+
+    def _begin_trajectory(self, itraj):
+        self._itraj = itraj
+        self._written[itraj] = True
+        self._file = open(os.path.join(self.path, self._names[itraj] + '.blocks'), 'wb')
+        self._pos = 0
+        self._pending, self._n_pending = [], 0
+        self._offsets, self._min, self._max = [], [], []
+
+    def _end_trajectory(self):
+        if self._file is None:
+            return
+        if self._n_pending:
+            self._write_block(np.concatenate(self._pending))
+        self._file.close()
+        self._file = None
+        dtype = self.dtype if self.dtype is not None else np.float32
+        np.savez(os.path.join(self.path, self._names[self._itraj] + '.index.npz'),
+                 offsets=np.array(self._offsets, dtype=np.int64).reshape(-1, self.ndim + 1),
+                 min=np.array(self._min, dtype=dtype).reshape(-1, self.ndim),
+                 max=np.array(self._max, dtype=dtype).reshape(-1, self.ndim))
+
+    def _write_block(self, rows):
+        offsets = [self._pos]
+        for j in range(self.ndim):
+            data = np.ascontiguousarray(rows[:, j])
+            if self.shuffle:
+                data = np.ascontiguousarray(data.view(np.uint8).reshape(-1, data.itemsize).T)
+            data = _compress(data.tobytes(), self.compression, self.compression_level)
+            self._file.write(data)
+            self._pos += len(data)
+            offsets.append(self._pos)
+        self._offsets.append(offsets)
+        self._min.append(rows.min(axis=0))
+        self._max.append(rows.max(axis=0))
+
+
+@fix_docs
+class FeatureStoreReader(DataSource):
+    r""" reads a feature store directory written by :meth:`write_store`.
+
+    Only the blocks containing the requested frames are read, and of those only the requested columns
+    are decompressed.
+
+    Parameters
+    ----------
+    path : str
+        directory of the store
+
+    chunksize : int
+        how many rows are read at once
+    """
+
+    def __init__(self, path, chunksize=1000, **kw):
+        super(FeatureStoreReader, self).__init__(chunksize=chunksize)
+        self._is_reader = True
+        self.path = path
+        try:
+            with open(os.path.join(path, STORE_INDEX)) as fh:
+                index = json.load(fh)
+        except (EnvironmentError, ValueError):
+            raise ValueError('"{}" is no (complete) feature store'.format(path))
+        if index.get('format') != STORE_FORMAT or index.get('version', 0) > STORE_VERSION:
+            raise ValueError('"{}" has an unsupported feature store format: {} version {}'
+                             .format(path, index.get('format'), index.get('version')))
+
+        self.dtype = np.dtype(index['dtype'])
+        self.block_size = index['block_size']
+        self.compression = index['compression']
+        self.shuffle = index.get('shuffle', False)
+        self._trajectories = index['trajectories']
+        self._block_index = {}
+
+        self._filenames = [os.path.join(path, t['name'] + '.blocks') for t in self._trajectories]
+        self._ntraj = len(self._trajectories)
+        self._ndim = index['ndim']
+        self._lengths = [t['length'] for t in self._trajectories]
+        self._offsets = [[] for _ in self._trajectories]
+
+        self._is_random_accessible = True
+        self._ra_cuboid = FeatureReaderCuboidRandomAccessStrategy(self, 3)
+        self._ra_jagged = FeatureReaderJaggedRandomAccessStrategy(self, 3)
+        self._ra_linear_strategy = FeatureReaderLinearRandomAccessStrategy(self, 2)
+        self._ra_linear_itraj_strategy = FeatureReaderLinearItrajRandomAccessStrategy(self, 3)
+
+    @staticmethod
+    def is_store(path):
+        """ whether path is the directory of a (complete) feature store """
+        return os.path.isdir(path) and os.path.isfile(os.path.join(path, STORE_INDEX))
+
+    def _index(self, itraj):
+        """ offsets, minima and maxima of the blocks of the given trajectory """
+        try:
+            return self._block_index[itraj]
+        except KeyError:
+            name = os.path.join(self.path, self._trajectories[itraj]['name'] + '.index.npz')
+            with np.load(name) as f:
+                index = self._block_index[itraj] = f['offsets'], f['min'], f['max']
+            return index
+
+    def block_ranges(self, itraj):
+        """ minimum and maximum of every column of every block of the given trajectory.
+
+        Returns
+        -------
+        (min, max) : tuple of ndarrays with shape (n_blocks, ndim)
+        """
+        _, mins, maxs = self._index(itraj)
+        return mins, maxs
+
+    def column_ranges(self):
+        """ minimum and maximum of every column over all trajectories.
+
+        Returns
+        -------
+        (min, max) : tuple of ndarrays with shape (ndim, )
+        """
+        ranges = [self.block_ranges(itraj) for itraj in range(self.ntraj)]
+        mins = np.concatenate([r[0] for r in ranges])
+        maxs = np.concatenate([r[1] for r in ranges])
+        return mins.min(axis=0), maxs.max(axis=0)
+
+    def _get_traj_info(self, filename):
+        itraj = self._filenames.index(filename)
+        return TrajInfo(self.ndim, self._lengths[itraj])
+
+    def output_type(self):
+        return self.dtype
+
+    def _create_iterator(self, skip=0, chunk=0, stride=1, return_trajindex=False, cols=None):
+        return FeatureStoreIterator(self, skip=skip, chunk=chunk, stride=stride,
+                                    return_trajindex=return_trajindex, cols=cols)
+
+    def describe(self):
+        return "[FeatureStoreReader {path} with {n} trajectories, compression={c}]".format(
+            path=self.path, n=self.ntraj, c=self.compression)
+
+
+class FeatureStoreIterator(_RandomAccessFileIteratorMixin, DataSourceIterator):
+
+    def __init__(self, data_source, skip=0, chunk=0, stride=1, return_trajindex=False, cols=None):
+        super(FeatureStoreIterator, self).__init__(data_source=data_source, skip=skip,
+                                                   chunk=chunk, stride=stride,
+                                                   return_trajindex=return_trajindex,
+                                                   cols=cols)
+        self._file = None
+        # decompressed columns of the last block, which has been read
+        self._block = -1
+        self._block_columns = {}
+
+    def reset(self):
+        super(FeatureStoreIterator, self).reset()
+        self.close()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+        self._file = None
+        self._block = -1
+        self._block_columns = {}
+        super(FeatureStoreIterator, self).close()
+
+    def _open_trajectory(self, itraj):
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self._data_source.filenames[itraj], 'rb')
+        self._block = -1
+        self._block_columns = {}
+
+    def _read_columns(self, block, columns):
+        """ decompressed columns of the given block. The columns of the last block are kept, so chunks
+        smaller than a block do not decompress it again. """
+        if block != self._block:
+            self._block = block
+            self._block_columns = {}
+        missing = np.array([j for j in columns if j not in self._block_columns], dtype=int)
+        if len(missing):
+            offsets = self._data_source._index(self._itraj)[0][block]
+            compression, dtype = self._data_source.compression, self._data_source.dtype
+            # neighbouring columns are read at once
+            for run in np.split(missing, np.flatnonzero(np.diff(missing) != 1) + 1):
+                first, last = offsets[run[0]], offsets[run[-1] + 1]
+                self._file.seek(first)
+                buf = self._file.read(last - first)
+                for j in run:
+                    data = np.frombuffer(_decompress(buf[offsets[j] - first:offsets[j + 1] - first], compression),
+                                         dtype=np.uint8)
+                    if self._data_source.shuffle:
+                        data = np.ascontiguousarray(data.reshape(dtype.itemsize, -1).T)
+                    self._block_columns[j] = data.view(dtype).reshape(-1)
+        return [self._block_columns[j] for j in columns]
+
+    def _read(self, frames, cols=None):
+        """ rows of the given sorted frames and columns of the current trajectory """
+        if isinstance(frames, slice):
+            frames = np.arange(frames.start, frames.stop, frames.step)
+        if cols is None:
+            cols = np.arange(self._data_source.ndim)
+        X = np.empty((len(frames), len(cols)), dtype=self._data_source.dtype)
+        if len(frames) == 0:
+            return X
+        columns, inverse = np.unique(cols, return_inverse=True)
+        # position of every distinct column in X, if the columns are neither reordered nor repeated
+        direct = len(columns) == len(cols) and np.all(columns == cols)
+        block_size = self._data_source.block_size
+        blocks = frames // block_size
+        bounds = np.flatnonzero(np.diff(blocks)) + 1
+        for start, stop in zip(np.concatenate(([0], bounds)), np.concatenate((bounds, [len(frames)]))):
+            block = blocks[start]
+            rows = frames[start:stop] - block * block_size
+            if rows[-1] - rows[0] == stop - start - 1 and np.all(np.diff(rows) == 1):
+                rows = slice(rows[0], rows[-1] + 1)
+            for k, column in enumerate(self._read_columns(block, columns.tolist())):
+                if direct:
+                    X[start:stop, k] = column[rows]
+                else:
+                    X[start:stop, inverse == k] = column[rows, np.newaxis]
+        return X
+
+    def _next_chunk_cols(self):
+        if self.use_cols is None:
+            return super(FeatureStoreIterator, self)._next_chunk_cols()
+        # decompress the requested columns only
+        return self._next_chunk(cols=np.arange(self._data_source.ndim)[self.use_cols].reshape(-1))
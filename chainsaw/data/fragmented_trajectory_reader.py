@@ -78,10 +78,12 @@ class _FragmentedTrajectoryIterator(object):
                 if self.ra_indices is not None:
                     self._fragment_indices = self.__get_ra_index_indices()
                     self._reader_it = self._readers[self._reader_at].iterator(
-                        self.__get_ifrag_ra_indices(self._fragment_indices, 0), return_trajindex=False
+                        self.__get_ifrag_ra_indices(self._fragment_indices, 0), return_trajindex=False, prefetch=0
                     )
                 else:
-                    self._reader_it = self._readers[self._reader_at].iterator(self._stride, return_trajindex=False)
+                    # skip and chunksize of the reader iterator are changed on the fly, so do not prefetch.
+                    self._reader_it = self._readers[self._reader_at].iterator(self._stride, return_trajindex=False,
+                                                                              prefetch=0)
             if self.ra_indices is None:
                 self._reader_it.skip = self._reader_overlap
             # set original chunksize
@@ -117,10 +119,12 @@ class _FragmentedTrajectoryIterator(object):
                         if self.ra_indices is not None:
                             self._reader_it = self._readers[self._reader_at].iterator(
                                 self.__get_ifrag_ra_indices(self._fragment_indices, self._reader_at),
-                                return_trajindex=False
+                                return_trajindex=False, prefetch=0
                             )
                         else:
-                            self._reader_it = self._readers[self._reader_at].iterator(self._stride, return_trajindex=False)
+                            self._reader_it = self._readers[self._reader_at].iterator(self._stride,
+                                                                                      return_trajindex=False,
+                                                                                      prefetch=0)
                             self._reader_it.skip = skip
                             self._reader_overlap = self._calculate_new_overlap(self._stride,
                                                                                self._reader_lengths[self._reader_at - 1],
@@ -139,9 +143,10 @@ class _FragmentedTrajectoryIterator(object):
                 self._skip if self._reader_at == 0 else 0
             )
         else:
+            # the frames of subsequent fragments are offset by the overlap of the stride.
             reader_trajlen = self._readers[self._reader_at].trajectory_length(
                 0, self._stride,
-                self._skip if self._reader_at == 0 else 0
+                self._skip if self._reader_at == 0 else self._reader_overlap
             )
         return reader_trajlen
 
@@ -297,6 +302,11 @@ class FragmentIterator(DataSourceIterator):
             self._itraj += 1
         return X
 
+    def _select_trajectory(self, itraj):
+        self.close()
+        self._it = None
+        super(FragmentIterator, self)._select_trajectory(itraj)
+
     def close(self):
         if self._it is not None:
             self._it.close()
@@ -0,0 +1,246 @@
+# This file is part of PyEMMA.
+#
+# Copyright (c) 2016 Computational Molecular Biology Group, Freie Universitaet Berlin (GER)
+#
+# PyEMMA is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Reader for HDF5 files containing precomputed features as plain datasets.
+"""
+
+from __future__ import absolute_import
+
+import functools
+import os
+import re
+
+import h5py
+import numpy as np
+from six import string_types
+
+from chainsaw.data._base.datasource import DataSourceIterator, DataSource, _RandomAccessFileIteratorMixin
+from chainsaw.data.md.feature_reader import (FeatureReaderCuboidRandomAccessStrategy,
+                                             FeatureReaderJaggedRandomAccessStrategy,
+                                             FeatureReaderLinearItrajRandomAccessStrategy,
+                                             FeatureReaderLinearRandomAccessStrategy)
+from chainsaw.data.util.fileformat_registry import FileFormatRegistry
+from chainsaw.data.util.traj_info_cache import TrajInfo
+from chainsaw.util.annotators import fix_docs
+
+
+def _selection_to_regex(selection):
+    """ converts a dataset selection pattern to a regular expression. '*' and '?' do not match across groups,
+    while '**' matches any number of groups. """
+    pattern = re.escape(selection)
+    pattern = pattern.replace(r'\*\*', '.*').replace(r'\*', '[^/]*').replace(r'\?', '[^/]')
+    return re.compile(pattern + '$')
+
+
+@fix_docs
+@FileFormatRegistry.register('.hdf')
+class H5FileReader(DataSource):
+    r""" reads datasets of precomputed features from HDF5 files in chunks.
+
+    Every dataset matching the selection is one trajectory, its first axis being the time axis.
+    Datasets with more than two dimensions are flattened. Files ending with '.h5' or '.hdf5' are
+    read by this reader, if neither a topology nor a featurizer is given to :func:`chainsaw.api.source`.
+
+    Parameters
+    ----------
+    filenames : str or list of strings
+
+    selection : str, default='/*'
+        pattern for the paths of the datasets within the files, which are read. '*' and '?' match
+        within a group, '**' matches any number of groups, eg. '/features/run_*' or '/**'.
+
+    chunksize : int
+        how many rows are read at once
+
+    lazy : bool, default=False
+        ignored, the lengths are given by the shapes of the datasets, which are cheap to obtain.
+    """
+    # extensions of mdtraj HDF5 trajectories, which are read by this reader, if there is no topology.
+    SHARED_EXTENSIONS = ('.h5', '.hdf5')
+
+    def __init__(self, filenames, selection='/*', chunksize=5000, lazy=False, **kw):
+        super(H5FileReader, self).__init__(chunksize=chunksize)
+        self._is_reader = True
+        self.selection = selection
+
+        if not isinstance(filenames, (list, tuple)):
+            filenames = [filenames]
+        self.filenames = filenames
+
+        self._is_random_accessible = True
+        self._ra_cuboid = FeatureReaderCuboidRandomAccessStrategy(self, 3)
+        self._ra_jagged = FeatureReaderJaggedRandomAccessStrategy(self, 3)
+        self._ra_linear_strategy = FeatureReaderLinearRandomAccessStrategy(self, 2)
+        self._ra_linear_itraj_strategy = FeatureReaderLinearItrajRandomAccessStrategy(self, 3)
+
+    @DataSource.filenames.setter
+    def filenames(self, filename_list):
+        if isinstance(filename_list, string_types):
+            filename_list = [filename_list]
+        if len(filename_list) == 0:
+            raise ValueError("empty file list")
+        if len(set(filename_list)) != len(filename_list):
+            self.logger.warning("duplicate files detected")
+            filename_list = list(set(filename_list))
+
+        for f in filename_list:
+            self._validate_file(f)
+            _, ext = os.path.splitext(f)
+            if ext not in self.SUPPORTED_EXTENSIONS + self.SHARED_EXTENSIONS:
+                raise ValueError("{ext} not supported by reader {name}. Supported extensions are {exts}"
+                                 .format(ext=ext, name=self.__class__.__name__, exts=self.SUPPORTED_EXTENSIONS + self.SHARED_EXTENSIONS))
+
+        # one trajectory per (file, dataset)
+        datasets = []
+        for f in filename_list:
+            datasets.extend((f, name, shape) for name, shape in self._selected_datasets(f))
+        if not datasets:
+            raise ValueError("no datasets matching selection '{sel}' found in files {files}"
+                             .format(sel=self.selection, files=filename_list))
+
+        ndims = {self._flat_dimension(shape) for _, _, shape in datasets}
+        if len(ndims) != 1:
+            raise ValueError("Input data has different dimensions ({dims})! Datasets: {datasets}"
+                             .format(dims=sorted(ndims),
+                                     datasets=[(f, name, shape) for f, name, shape in datasets]))
+
+        self._itraj_dataset_mapping = [(f, name) for f, name, _ in datasets]
+        # file of every trajectory, so files are repeated, if they contain several datasets.
+        self._filenames = [f for f, _, _ in datasets]
+        self._ntraj = len(datasets)
+        self._ndim = ndims.pop()
+        self._lengths = [shape[0] for _, _, shape in datasets]
+        self._offsets = [[] for _ in datasets]
+
+    @staticmethod
+    def _flat_dimension(shape):
+        return functools.reduce(lambda x, y: x * y, shape[1:], 1)
+
+    def _selected_datasets(self, filename):
+        """ names and shapes of the datasets of the given file, which match the selection (sorted by name). """
+        regex = _selection_to_regex(self.selection)
+        result = []
+
+        def visit(name, obj):
+            name = '/' + name
+            if isinstance(obj, h5py.Dataset) and obj.ndim > 0 and regex.match(name):
+                result.append((name, obj.shape))
+
+        with h5py.File(filename, mode='r') as f:
+            f.visititems(visit)
+        return sorted(result)
+
+    def _trajectory_name(self, itraj):
+        """ path of the dataset of the given trajectory within its file. """
+        return self._itraj_dataset_mapping[itraj][1]
+
+    def _get_traj_info(self, filename):
+        shapes = [shape for _, shape in self._selected_datasets(filename)]
+        ndim = self._flat_dimension(shapes[0]) if shapes else 0
+        return TrajInfo(ndim, sum(shape[0] for shape in shapes))
+
+    def _create_iterator(self, skip=0, chunk=0, stride=1, return_trajindex=False, cols=None):
+        return H5FileIterator(self, skip=skip, chunk=chunk, stride=stride,
+                              return_trajindex=return_trajindex, cols=cols)
+
+    def describe(self):
+        return "[H5FileReader datasets: %s]" % ['%s:%s' % (f, name) for f, name in self._itraj_dataset_mapping]
+
+
+class H5FileIterator(_RandomAccessFileIteratorMixin, DataSourceIterator):
+
+    def __init__(self, data_source, skip=0, chunk=0, stride=1, return_trajindex=False, cols=None):
+        super(H5FileIterator, self).__init__(data_source=data_source, skip=skip,
+                                             chunk=chunk, stride=stride,
+                                             return_trajindex=return_trajindex,
+                                             cols=cols)
+        self._file = None
+        self._dataset = None
+        self._clear_buffer()
+
+    def reset(self):
+        super(H5FileIterator, self).reset()
+        self.close()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+        self._file = None
+        self._dataset = None
+        self._clear_buffer()
+        super(H5FileIterator, self).close()
+
+    def _clear_buffer(self):
+        # consecutive rows [_buf_start, _buf_start + len(_buffer)) of the current dataset
+        self._buffer = None
+        self._buf_start = 0
+
+    def _open_trajectory(self, itraj):
+        filename, name = self._data_source._itraj_dataset_mapping[itraj]
+        if self._file is None or self._file.filename != filename:
+            if self._file is not None:
+                self._file.close()
+            self._file = h5py.File(filename, mode='r')
+        self._dataset = self._file[name]
+        # only chunks passed through filters (eg. compression) have to be read as a whole.
+        filtered = self._dataset.chunks is not None and self._dataset.id.get_create_plist().get_nfilters() > 0
+        self._rows_per_chunk = self._dataset.chunks[0] if filtered else 0
+        self._clear_buffer()
+
+    def _flat(self, X):
+        return X.reshape(len(X), -1)
+
+    def _read(self, frames, cols=None):
+        # the columns are selected by _next_chunk_cols
+        if isinstance(frames, slice):
+            return self._read_rows(frames.start, frames.stop, frames.step)
+        return self._read_indices(frames)
+
+    def _read_rows(self, start, stop, stride):
+        """ rows start:stop:stride of the current dataset.
+
+        Whole HDF5 chunks are read, so no chunk is decompressed twice. Rows of the last chunk, which
+        are behind stop, are kept for the next call.
+        """
+        ds = self._dataset
+        stop = min(stop, len(ds))
+        if stop <= start:
+            return np.empty((0, self._data_source.ndim), dtype=ds.dtype)
+        rows_per_chunk = self._rows_per_chunk
+        if rows_per_chunk == 0 or stride >= rows_per_chunk:
+            # rows are read directly, if they need no decompression or every chunk contains at most one of them.
+            return self._flat(ds[start:stop:stride])
+
+        buf_stop = self._buf_start + (len(self._buffer) if self._buffer is not None else 0)
+        if not (self._buf_start <= start and stop <= buf_stop):
+            end = min(-(-stop // rows_per_chunk) * rows_per_chunk, len(ds))
+            if self._buf_start <= start < buf_stop:
+                # the beginning has been read along with the previous rows.
+                rows = np.concatenate((self._buffer[start - self._buf_start:], self._flat(ds[buf_stop:end])))
+                begin = start
+            else:
+                begin = start // rows_per_chunk * rows_per_chunk
+                rows = self._flat(ds[begin:end])
+            self._buffer, self._buf_start = rows, begin
+        return self._buffer[start - self._buf_start:stop - self._buf_start:stride]
+
+    def _read_indices(self, indices):
+        """ rows of the given sorted (possibly repeated) indices of the current dataset. """
+        if len(indices) == 0:
+            return np.empty((0, self._data_source.ndim), dtype=self._dataset.dtype)
+        unique, inverse = np.unique(indices, return_inverse=True)
+        return self._flat(self._dataset[unique])[inverse]
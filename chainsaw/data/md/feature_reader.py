@@ -78,6 +78,9 @@ class FeatureReader(DataSource):
     featurizer: MDFeaturizer
         a preconstructed featurizer
 
+    lazy: bool, default=False
+        determine the length of every trajectory only once it is first accessed.
+
     Examples
     --------
     >>> from chainsaw.tests.util import get_bpti_test_data
@@ -105,11 +108,11 @@ class FeatureReader(DataSource):
     """
     SUPPORTED_RANDOM_ACCESS_FORMATS = (".h5", ".dcd", ".binpos", ".nc", ".xtc", ".trr")
 
-    def __init__(self, trajectories, topologyfile=None, chunksize=1000, featurizer=None, **kw):
+    def __init__(self, trajectories, topologyfile=None, chunksize=1000, featurizer=None, lazy=False, **kw):
         assert (topologyfile is not None) or (featurizer is not None), \
             "Needs either a topology file or a featurizer for instantiation"
 
-        super(FeatureReader, self).__init__(chunksize=chunksize)
+        super(FeatureReader, self).__init__(chunksize=chunksize, lazy=lazy)
         self._is_reader = True
         self.topfile = topologyfile
         self.filenames = trajectories
@@ -141,7 +144,10 @@ class FeatureReader(DataSource):
             self.topfile = featurizer.topologyfile
 
         # Check that the topology and the files in the filelist can actually work together
-        self._assert_toptraj_consistency()
+        # (lazy readers check this once they are iterated).
+        self._toptraj_consistent = False
+        if not lazy:
+            self._assert_toptraj_consistency()
 
     def _get_traj_info(self, filename):
         with mdtraj.open(filename, mode='r') as fh:
@@ -153,6 +159,8 @@ class FeatureReader(DataSource):
         return TrajInfo(ndim, length, offsets)
 
     def _create_iterator(self, skip=0, chunk=0, stride=1, return_trajindex=True, cols=None):
+        if not self._toptraj_consistent:
+            self._assert_toptraj_consistency()
         return FeatureReaderIterator(self, skip=skip, chunk=chunk, stride=stride,
                                      return_trajindex=return_trajindex, cols=cols)
 
@@ -177,6 +185,15 @@ class FeatureReader(DataSource):
             # general case
             return self.featurizer.dimension()
 
+    def _bytes_per_frame(self):
+        # the coordinates (float32) of a chunk are held in memory alongside the features.
+        if len(self.featurizer.active_features) == 0:
+            return self.featurizer.topology.n_atoms * 3 * 4
+        atoms = self.featurizer.required_atoms()
+        n_atoms = self.featurizer.topology.n_atoms if atoms is None else len(atoms)
+        coordinates = n_atoms * 3 * 4
+        return coordinates + super(FeatureReader, self)._bytes_per_frame()
+
     def _assert_toptraj_consistency(self):
         r""" Check if the topology and the filenames of the reader have the same n_atoms"""
         traj = mdtraj.load_frame(self.filenames[0], index=0, top=self.topfile)
@@ -184,6 +201,7 @@ class FeatureReader(DataSource):
         assert traj.xyz.shape[1] == desired_n_atoms, "Mismatch in the number of atoms between the topology" \
                                                      " and the first trajectory file, %u vs %u" % \
                                                      (desired_n_atoms, traj.xyz.shape[1])
+        self._toptraj_consistent = True
 
 
 class FeatureReaderCuboidRandomAccessStrategy(RandomAccessStrategy):
@@ -315,13 +333,15 @@ class FeatureReaderLinearRandomAccessStrategy(RandomAccessStrategy):
 
 class FeatureReaderIterator(DataSourceIterator):
     def __init__(self, data_source, skip=0, chunk=0, stride=1, return_trajindex=False, cols=None):
-        # TODO: optimize cols access (eg. omit features, before calculating em
         super(FeatureReaderIterator, self).__init__(
                 data_source, skip=skip, chunk=chunk, stride=stride,
                 return_trajindex=return_trajindex,
                 cols=cols
         )
-        #self._cols = cols
+        # only read the atoms needed by the active features
+        self._atom_indices = None
+        if not data_source._return_traj_obj:
+            self._atom_indices = data_source.featurizer.required_atoms()
         self._create_mditer()
 
     @property
@@ -355,11 +375,18 @@ class FeatureReaderIterator(DataSourceIterator):
         self._itraj += 1
         self._create_mditer()
 
-    def _next_chunk(self):
+    def _next_chunk_cols(self):
+        if self._data_source._return_traj_obj or self.use_cols is None:
+            return super(FeatureReaderIterator, self)._next_chunk_cols()
+        # let the featurizer compute the requested columns only
+        return self._next_chunk(cols=self.use_cols)
+
+    def _next_chunk(self, cols=None):
         """
         gets the next chunk. If lag > 0, we open another iterator with same chunk
         size and advance it by one, as soon as this method is called with a lag > 0.
 
+        :param cols: if given, only these columns of the features are computed.
         :return: a feature mapped vector X, or (X, Y) if lag > 0
         """
         try:
@@ -400,8 +427,17 @@ class FeatureReaderIterator(DataSourceIterator):
             if len(self._data_source.featurizer.active_features) == 0:
                 shape_2d = (shape[0], shape[1] * shape[2])
                 res = chunk.xyz.reshape(shape_2d)
+                if cols is not None:
+                    res = res[:, cols]
             else:
-                res = self._data_source.featurizer.transform(chunk)
+                featurizer = self._data_source.featurizer
+                if cols is not None:
+                    cols = np.atleast_1d(np.arange(featurizer.dimension())[cols])
+                out = None
+                if self.state.buffers is not None:
+                    dim = featurizer.dimension() if cols is None else len(cols)
+                    out = self.state.buffers.empty(self, 'features', (shape[0], dim), np.float32)
+                res = featurizer.transform(chunk, out=out, cols=cols)
         return res
 
     def _create_mditer(self):
@@ -418,9 +454,14 @@ class FeatureReaderIterator(DataSourceIterator):
             )
         self._closed = False
 
-    def _create_patched_iter(self, filename, skip=0, stride=1, atom_indices=None):
+    def _create_patched_iter(self, filename, skip=0, stride=1):
         return patches.iterload(filename, chunk=self.chunksize, top=self._data_source.topfile,
-                                skip=skip, stride=stride, atom_indices=atom_indices)
+                                skip=skip, stride=stride, atom_indices=self._atom_indices)
+
+    def _select_trajectory(self, itraj):
+        self.close()
+        super(FeatureReaderIterator, self)._select_trajectory(itraj)
+        self._create_mditer()
 
     def reset(self):
         super(FeatureReaderIterator, self).reset()
@@ -37,5 +37,29 @@ class Feature(object):
     def map(self, traj):
         return self.transform(traj)
 
+    def _transform_subset(self, traj, cols):
+        """ computes only the given (sorted) output columns of this feature.
+
+        Features, which are able to compute a part of their output cheaper than all of it,
+        override this (eg. by only computing the distances of the requested pairs).
+        """
+        return self.transform(traj)[:, cols]
+
+    def _required_atoms(self):
+        """ indices of the atoms this feature is computed from, or None if it needs all of them. """
+        return None
+
+    def _on_atom_subset(self, mapping):
+        """ returns a copy of this feature, which computes the same output on a trajectory
+        containing only a subset of the atoms (those returned by _required_atoms).
+
+        Parameters
+        ----------
+        mapping : ndarray(n_atoms, dtype=int)
+            maps the atom indices of the full topology onto the ones of the subset.
+        """
+        raise NotImplementedError("feature %s can not be computed on a subset of atoms"
+                                  % self.__class__.__name__)
+
     def __eq__(self, other):
         return self.__hash__() == other.__hash__()
@@ -19,6 +19,7 @@ Created on 15.02.2016
 
 @author: marscher
 '''
+import copy
 import functools
 import itertools
 
@@ -75,6 +76,25 @@ class AngleFeature(Feature):
         else:
             return rad
 
+    def _transform_subset(self, traj, cols):
+        # only compute the angles needed for the requested columns (cos and sin of an angle are
+        # stored next to each other).
+        cols = np.asarray(cols)
+        per_angle = 2 if self.cossin else 1
+        angles, inverse = np.unique(cols // per_angle, return_inverse=True)
+        subset = copy.copy(self)
+        subset.angle_indexes = self.angle_indexes[angles]
+        subset._dim = len(angles) * per_angle
+        return subset.transform(traj)[:, inverse * per_angle + cols % per_angle]
+
+    def _required_atoms(self):
+        return np.unique(self.angle_indexes)
+
+    def _on_atom_subset(self, mapping):
+        subset = copy.copy(self)
+        subset.angle_indexes = mapping[self.angle_indexes]
+        return subset
+
     def __hash__(self):
         hash_value = _hash_numpy_array(self.angle_indexes)
         hash_value ^= hash_top(self.top)
@@ -19,6 +19,8 @@ Created on 15.02.2016
 
 @author: marscher
 '''
+import copy
+
 import mdtraj
 import numpy as np
 
@@ -49,6 +51,21 @@ class DistanceFeature(Feature):
     def transform(self, traj):
         return mdtraj.compute_distances(traj, self.distance_indexes, periodic=self.periodic)
 
+    def _transform_subset(self, traj, cols):
+        # only compute the requested pairs
+        subset = copy.copy(self)
+        subset.distance_indexes = self.distance_indexes[cols]
+        subset._dim = len(subset.distance_indexes)
+        return subset.transform(traj)
+
+    def _required_atoms(self):
+        return np.unique(self.distance_indexes)
+
+    def _on_atom_subset(self, mapping):
+        subset = copy.copy(self)
+        subset.distance_indexes = mapping[self.distance_indexes]
+        return subset
+
     def __hash__(self):
         hash_value = _hash_numpy_array(self.distance_indexes)
         hash_value ^= hash_top(self.top)
@@ -110,6 +127,13 @@ class ResidueMinDistanceFeature(DistanceFeature):
             res = D
         return res
 
+    def _transform_subset(self, traj, cols):
+        return Feature._transform_subset(self, traj, cols)
+
+    def _required_atoms(self):
+        # contacts are computed on residues of the full topology
+        return Feature._required_atoms(self)
+
 
 class GroupMinDistanceFeature(DistanceFeature):
 
@@ -152,6 +176,9 @@ class GroupMinDistanceFeature(DistanceFeature):
 
         return res
 
+    def _transform_subset(self, traj, cols):
+        return Feature._transform_subset(self, traj, cols)
+
 
 class ContactFeature(DistanceFeature):
 
@@ -182,6 +209,11 @@ class ContactFeature(DistanceFeature):
         else:
             return res
 
+    def _transform_subset(self, traj, cols):
+        if self.count_contacts:
+            return Feature._transform_subset(self, traj, cols)
+        return super(ContactFeature, self)._transform_subset(traj, cols)
+
     def __hash__(self):
         hash_value = super(ContactFeature, self).__hash__()
         hash_value ^= hash(self.threshold)
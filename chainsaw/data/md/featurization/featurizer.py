@@ -62,6 +62,7 @@ class MDFeaturizer(Loggable):
         self.active_features = []
         self._dim = 0
         self._showed_warning_empty_feature_list = False
+        self._atom_subset = None
 
     def __add_feature(self, f):
         # perform sanity checks
@@ -696,7 +697,52 @@ class MDFeaturizer(Loggable):
         dim = sum(f.dimension for f in self.active_features)
         return dim
 
-    def transform(self, traj):
+    def required_atoms(self):
+        """ atoms needed to compute the selected features
+
+        Trajectories only containing these atoms (eg. loaded with
+        atom_indices=required_atoms()) can be passed to :py:meth:`transform`.
+
+        Returns
+        -------
+        atoms : ndarray(dtype=int) or None
+            sorted indices of the needed atoms, or None if all atoms are needed
+            (eg. by a custom feature).
+
+        """
+        if len(self.active_features) == 0:
+            return None
+        atoms = []
+        for f in self.active_features:
+            a = f._required_atoms()
+            if a is None:
+                return None
+            atoms.append(np.asarray(a, dtype=int).ravel())
+        atoms = np.unique(np.concatenate(atoms))
+        if len(atoms) == self.topology.n_atoms:
+            return None
+        return atoms
+
+    def _active_features_on_atom_subset(self, n_atoms):
+        # features with indices remapped onto the required atoms (or None, if a trajectory with
+        # n_atoms does not contain just those), cached as long as the active features do not change.
+        # The key holds the features themselves, so their ids can not be reused by new ones meanwhile.
+        key = tuple(self.active_features)
+        cached = getattr(self, '_atom_subset', None)
+        if cached is None or len(cached[0]) != len(key) or any(a is not b for a, b in zip(cached[0], key)):
+            atoms = self.required_atoms()
+            features = None
+            if atoms is not None:
+                mapping = np.full(self.topology.n_atoms, -1, dtype=int)
+                mapping[atoms] = np.arange(len(atoms))
+                features = [f._on_atom_subset(mapping) for f in self.active_features]
+            self._atom_subset = (key, atoms, features)
+        _, atoms, features = self._atom_subset
+        if atoms is None or len(atoms) != n_atoms:
+            return None
+        return features
+
+    def transform(self, traj, out=None, cols=None):
         """
         Maps an mdtraj Trajectory object to the selected output features
 
@@ -704,12 +750,26 @@ class MDFeaturizer(Loggable):
         ----------
         traj : mdtraj Trajectory
             Trajectory object used as an input
+        out : ndarray((T, n), dtype=float32), optional
+            if given, the features are written to this array (instead of
+            concatenating them in a newly allocated one).
+        cols : array like, optional
+            if given, only these output columns are computed. The columns are
+            mapped back to the active features (and eg. the atom pairs within a
+            distance feature) producing them, so features which do not
+            contribute to the requested columns are not evaluated at all.
+
+        Notes
+        -----
+        The trajectory may either contain all atoms of the topology or only
+        those returned by :py:meth:`required_atoms`.
 
         Returns
         -------
         out : ndarray((T, n), dtype=float32)
             Output features: For each of T time steps in the given trajectory, 
-            a vector with all n output features selected.
+            a vector with all n output features selected (or the requested
+            columns only).
 
         """
         # if there are no features selected, return given trajectory
@@ -720,47 +780,115 @@ class MDFeaturizer(Loggable):
                 self._showed_warning_empty_feature_list = True
             s = traj.xyz.shape
             new_shape = (s[0], s[1] * s[2])
-            return traj.xyz.reshape(new_shape)
+            res = traj.xyz.reshape(new_shape)
+            return res if cols is None else res[:, cols]
+
+        if cols is not None:
+            cols = np.atleast_1d(np.arange(self.dimension())[cols])
+            dim = len(cols)
+        else:
+            dim = self.dimension()
 
         # handle empty chunks (which might occur due to time lagged access
         if traj.xyz.shape[0] == 0:
-            return np.empty((0, self.dimension()))
+            return np.empty((0, dim))
+
+        if out is not None and out.shape != (traj.xyz.shape[0], dim):
+            raise ValueError('out has wrong shape %s, expected %s'
+                             % (str(out.shape), str((traj.xyz.shape[0], dim))))
+
+        active_features = self.active_features
+        if traj.n_atoms != self.topology.n_atoms:
+            active_features = self._active_features_on_atom_subset(traj.n_atoms) or active_features
+
+        if cols is not None:
+            return self._transform_cols(traj, out, cols, active_features)
 
         # otherwise build feature vector.
         feature_vec = []
+        offset = 0
 
         # TODO: consider parallel evaluation computation here, this effort is
         # only worth it, if computation time dominates memory transfers
-        for f in self.active_features:
+        for f in active_features:
             # perform sanity checks for custom feature input
             if isinstance(f, CustomFeature):
-                # NOTE: casting=safe raises in numpy>=1.9
-                vec = f.transform(traj).astype(np.float32, casting='safe')
-                if vec.shape[0] == 0:
-                    vec = np.empty((0, f.dimension))
-
-                if not isinstance(vec, np.ndarray):
-                    raise ValueError('Your custom feature %s did not return'
-                                     ' a numpy.ndarray!' % str(f.describe()))
-                if not vec.ndim == 2:
-                    raise ValueError('Your custom feature %s did not return'
-                                     ' a 2d array. Shape was %s'
-                                     % (str(f.describe()),
-                                        str(vec.shape)))
-                if not vec.shape[0] == traj.xyz.shape[0]:
-                    raise ValueError('Your custom feature %s did not return'
-                                     ' as many frames as it received!'
-                                     'Input was %i, output was %i'
-                                     % (str(f.describe()),
-                                        traj.xyz.shape[0],
-                                        vec.shape[0]))
+                vec = self._transform_custom(f, traj)
+            elif out is not None:
+                # the assignment below converts to float32
+                vec = f.transform(traj)
             else:
                 vec = f.transform(traj).astype(np.float32)
-            feature_vec.append(vec)
 
+            if out is not None:
+                out[:, offset:offset + vec.shape[1]] = vec
+                offset += vec.shape[1]
+            else:
+                feature_vec.append(vec)
+
+        if out is not None:
+            return out
         if len(feature_vec) > 1:
             res = np.hstack(feature_vec)
         else:
             res = feature_vec[0]
 
         return res
+
+    def _transform_cols(self, traj, out, cols, active_features):
+        # evaluate every requested column once and in ascending order, the order of cols is
+        # restored afterwards.
+        unique_cols, inverse = np.unique(cols, return_inverse=True)
+        in_order = len(unique_cols) == len(cols) and np.all(unique_cols == cols)
+        if out is None or not in_order:
+            res = np.empty((traj.xyz.shape[0], len(unique_cols)), dtype=np.float32)
+        else:
+            res = out
+
+        offset = 0
+        pos = 0
+        for f in active_features:
+            dim = f.dimension
+            lo, hi = np.searchsorted(unique_cols, (offset, offset + dim))
+            if hi > lo:
+                local_cols = unique_cols[lo:hi] - offset
+                if isinstance(f, CustomFeature):
+                    vec = self._transform_custom(f, traj)[:, local_cols]
+                elif hi - lo == dim:
+                    vec = f.transform(traj)
+                else:
+                    vec = f._transform_subset(traj, local_cols)
+                res[:, pos:pos + vec.shape[1]] = vec
+                pos += vec.shape[1]
+            offset += dim
+
+        if in_order:
+            return res
+        if out is None:
+            return res[:, inverse]
+        np.take(res, inverse, axis=1, out=out)
+        return out
+
+    @staticmethod
+    def _transform_custom(f, traj):
+        # NOTE: casting=safe raises in numpy>=1.9
+        vec = f.transform(traj).astype(np.float32, casting='safe')
+        if vec.shape[0] == 0:
+            vec = np.empty((0, f.dimension))
+
+        if not isinstance(vec, np.ndarray):
+            raise ValueError('Your custom feature %s did not return'
+                             ' a numpy.ndarray!' % str(f.describe()))
+        if not vec.ndim == 2:
+            raise ValueError('Your custom feature %s did not return'
+                             ' a 2d array. Shape was %s'
+                             % (str(f.describe()),
+                                str(vec.shape)))
+        if not vec.shape[0] == traj.xyz.shape[0]:
+            raise ValueError('Your custom feature %s did not return'
+                             ' as many frames as it received!'
+                             'Input was %i, output was %i'
+                             % (str(f.describe()),
+                                traj.xyz.shape[0],
+                                vec.shape[0]))
+        return vec
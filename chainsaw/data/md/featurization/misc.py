@@ -19,6 +19,8 @@ Created on 15.02.2016
 
 @author: marscher
 '''
+import copy
+
 import six
 import mdtraj
 import numpy as np
@@ -133,6 +135,21 @@ class SelectionFeature(Feature):
         newshape = (traj.xyz.shape[0], 3 * self.indexes.shape[0])
         return np.reshape(traj.xyz[:, self.indexes, :], newshape)
 
+    def _transform_subset(self, traj, cols):
+        # only copy the coordinates of the atoms needed for the requested columns
+        cols = np.asarray(cols)
+        atoms, inverse = np.unique(cols // 3, return_inverse=True)
+        xyz = traj.xyz[:, self.indexes[atoms], :].reshape(traj.xyz.shape[0], 3 * len(atoms))
+        return xyz[:, inverse * 3 + cols % 3]
+
+    def _required_atoms(self):
+        return np.unique(self.indexes)
+
+    def _on_atom_subset(self, mapping):
+        subset = copy.copy(self)
+        subset.indexes = mapping[self.indexes]
+        return subset
+
     def __hash__(self):
         hash_value = hash(self.prefix_label)
         hash_value ^= hash_top(self.top)
@@ -170,6 +187,7 @@ class MinRmsdFeature(Feature):
         self.ref = ref
         self.ref_frame = ref_frame
         self.atom_indices = atom_indices
+        self.ref_atom_indices = atom_indices
         self.precentered = precentered
 
     def describe(self):
@@ -185,7 +203,18 @@ class MinRmsdFeature(Feature):
         return 1
 
     def transform(self, traj):
-        return np.array(mdtraj.rmsd(traj, self.ref, atom_indices=self.atom_indices), ndmin=2).T
+        return np.array(mdtraj.rmsd(traj, self.ref, atom_indices=self.atom_indices,
+                                    ref_atom_indices=self.ref_atom_indices), ndmin=2).T
+
+    def _required_atoms(self):
+        if self.atom_indices is None:
+            return None
+        return np.unique(self.atom_indices)
+
+    def _on_atom_subset(self, mapping):
+        subset = copy.copy(self)
+        subset.atom_indices = mapping[np.asarray(self.atom_indices)]
+        return subset
 
     def __hash__(self):
         hash_value = hash(self.__hashed_input__)
@@ -23,16 +23,68 @@ Created on 07.04.2015
 from __future__ import absolute_import
 
 import functools
+import threading
+from collections import OrderedDict
 
 import numpy as np
 
-from chainsaw.data._base.datasource import DataSourceIterator, DataSource
+from chainsaw.data._base.datasource import DataSourceIterator, DataSource, _RandomAccessFileIteratorMixin
 from chainsaw.data.util.traj_info_cache import TrajInfo
 from chainsaw.util.annotators import fix_docs
 
 from chainsaw.data.util.fileformat_registry import FileFormatRegistry
 
 
+class _ArrayPool(object):
+    """ least recently used arrays of a reader, which are shared by all of its iterators.
+
+    Only read-only arrays are pooled, so sharing them can not change what an iterator sees. Besides the
+    number of arrays, the bytes of arrays loaded into memory are limited (memory maps do not count).
+    The pool is emptied on pickling, eg. when the reader is sent to worker processes.
+    """
+
+    def __init__(self, max_size, max_bytes):
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self._arrays = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._arrays)
+
+    @staticmethod
+    def _nbytes(arr):
+        return 0 if isinstance(arr, np.memmap) else arr.nbytes
+
+    def get(self, key, load):
+        """ returns the array stored for key, or stores and returns load() """
+        with self._lock:
+            try:
+                arr = self._arrays.pop(key)
+                self._bytes -= self._nbytes(arr)
+            except KeyError:
+                arr = load()
+                arr.flags.writeable = False
+            # most recently used ones are at the end
+            self._arrays[key] = arr
+            self._bytes += self._nbytes(arr)
+            while self._arrays and (len(self._arrays) > max(self.max_size, 1) or self._bytes > self.max_bytes):
+                self._bytes -= self._nbytes(self._arrays.popitem(last=False)[1])
+            return arr
+
+    def clear(self):
+        with self._lock:
+            self._arrays.clear()
+            self._bytes = 0
+
+    def __getstate__(self):
+        return {'max_size': self.max_size, 'max_bytes': self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(state['max_size'], state['max_bytes'])
+
+
 @fix_docs
 @FileFormatRegistry.register('.npy')
 class NumPyFileReader(DataSource):
@@ -47,19 +99,42 @@ class NumPyFileReader(DataSource):
         how many rows are read at once
 
     mmap_mode : str (optional), default='r'
-        binary NumPy arrays are being memory mapped using this flag.
+        binary NumPy arrays are being memory mapped using this flag. None loads the files into memory.
+        With 'r' and None, the (read-only) arrays are shared by all iterators of this reader. Writable
+        modes (eg. 'c' for copy-on-write) give every iterator a private array, which is opened on its
+        own and not kept after the iteration.
+
+    lazy : bool, default=False
+        obtain the shape of every file only once it is first accessed.
+
+    max_open_files : int, default=16
+        how many of the most recently used files are kept open (memory mapped or loaded) and shared
+        by all iterators of this reader. Only applies to mmap_mode='r' and None.
+
+    max_loaded_bytes : int, default=512 MB
+        how many bytes of the files loaded into memory (mmap_mode=None) are kept at most. Files,
+        which are larger, are loaded again by every iterator.
     """
 
-    def __init__(self, filenames, chunksize=1000, mmap_mode='r', **kw):
-        super(NumPyFileReader, self).__init__(chunksize=chunksize)
+    def __init__(self, filenames, chunksize=1000, mmap_mode='r', lazy=False, max_open_files=16,
+                 max_loaded_bytes=512 * 1024**2, **kw):
+        super(NumPyFileReader, self).__init__(chunksize=chunksize, lazy=lazy)
         self._is_reader = True
 
         if not isinstance(filenames, (list, tuple)):
             filenames = [filenames]
 
         self.mmap_mode = mmap_mode
+        # writable arrays are private to each iterator.
+        self._pool = _ArrayPool(max_open_files, max_loaded_bytes) if mmap_mode in ('r', None) else None
         self.filenames = filenames
 
+    @DataSource.filenames.setter
+    def filenames(self, filename_list):
+        if self._pool is not None:
+            self._pool.clear()
+        DataSource.filenames.fset(self, filename_list)
+
     def _create_iterator(self, skip=0, chunk=0, stride=1, return_trajindex=False, cols=None):
         return NPYIterator(self, skip=skip, chunk=chunk, stride=stride,
                            return_trajindex=return_trajindex, cols=cols)
@@ -95,15 +170,25 @@ class NumPyFileReader(DataSource):
         arr = self._reshape(x)
         return arr
 
+    def _get_array(self, itraj):
+        """ the array of trajectory itraj, taken from the pool of open files if possible """
+        if self._pool is None:
+            return self._load_file(itraj)
+        return self._pool.get(itraj, lambda: self._load_file(itraj))
+
     def _get_traj_info(self, filename):
         idx = self.filenames.index(filename)
-        array = self._load_file(idx)
+        if self.mmap_mode == 'r':
+            array = self._get_array(idx)
+        else:
+            # only the shape is needed, so do not load (or copy) the file.
+            array = self._reshape(np.load(filename, mmap_mode='r'))
         length, ndim = np.shape(array)
 
         return TrajInfo(ndim, length)
 
 
-class NPYIterator(DataSourceIterator):
+class NPYIterator(_RandomAccessFileIteratorMixin, DataSourceIterator):
 
     def __init__(self, data_source, skip=0, chunk=0, stride=1, return_trajindex=False, cols=False):
         super(NPYIterator, self).__init__(data_source=data_source, skip=skip,
@@ -111,14 +196,9 @@ class NPYIterator(DataSourceIterator):
                                           return_trajindex=return_trajindex,
                                           cols=cols)
 
-        self._last_itraj = -1
-
-    def reset(self):
-        DataSourceIterator.reset(self)
-        self._last_itraj = -1
-
     def close(self):
         self._close_filehandle()
+        super(NPYIterator, self).close()
 
     def _close_filehandle(self):
         if not hasattr(self, '_array') or self._array is None:
@@ -126,69 +206,22 @@ class NPYIterator(DataSourceIterator):
         del self._array
         self._array = None
 
-    def _open_filehandle(self):
-        self._array = self._data_source._load_file(self._itraj)
-
-    def _next_chunk(self):
-        if self._itraj >= self._data_source.ntraj:
-            self.close()
-            raise StopIteration()
-
-        if self._itraj != self._last_itraj:
-            self._close_filehandle()
-            self._open_filehandle()
-
-        traj_len = len(self._array)
-        traj = self._array
-
-        # skip only if complete trajectory mode or first chunk
-        skip = self.skip if self.chunksize == 0 or self._t == 0 else 0
-
-        # if stride by dict, update traj length accordingly
-        if not self.uniform_stride:
-            traj_len = self.ra_trajectory_length(self._itraj)
-
-        # complete trajectory mode
-        if self.chunksize == 0:
-            if not self.uniform_stride:
-                X = traj[self.ra_indices_for_traj(self._itraj)]
-                self._itraj += 1
-
-                # skip the trajs that are not in the stride dict
-                while self._itraj < self.number_of_trajectories() \
-                        and (self._itraj not in self.traj_keys):
-                    self._itraj += 1
-
-            else:
-                X = traj[skip::self.stride]
-                self._itraj += 1
-
-            return X
-
-        # chunked mode
-        else:
-            if not self.uniform_stride:
-                X = traj[self.ra_indices_for_traj(self._itraj)[self._t:min(self._t + self.chunksize, traj_len)]]
-                upper_bound = min(self._t + self.chunksize, traj_len)
-            else:
-                upper_bound = min(skip + self._t + self.chunksize * self.stride, traj_len)
-                slice_x = slice(skip + self._t, upper_bound, self.stride)
-                X = traj[slice_x]
-
-            # set new time position
-            self._t = upper_bound
-
-            if self._t >= traj_len:
-                self._itraj += 1
-                self._t = 0
-
-                # if we have a dictionary, skip trajectories that are not in the key set
-                while not self.uniform_stride and self._itraj < self.number_of_trajectories() \
-                        and (self._itraj not in self.traj_keys):
-                    self._itraj += 1
-
-                # if time index scope ran out of len of current trajectory, open next file.
-                if self._itraj <= self.number_of_trajectories() - 1:
-                    self._array = self._data_source._load_file(self._itraj)
-
-            return X
+    def _open_trajectory(self, itraj):
+        self._close_filehandle()
+        self._array = self._data_source._get_array(itraj)
+
+    def _use_cols(self, X):
+        # columns with a constant step are selected by a slice, so the chunk remains a view.
+        cols = self.use_cols
+        if cols is not None and not isinstance(cols, slice):
+            cols = np.asarray(cols)
+            if cols.dtype == bool:
+                cols = np.flatnonzero(cols)
+            steps = (np.unique(np.diff(cols)) if len(cols) > 1 else [1]) if cols.ndim == 1 and len(cols) else ()
+            if len(steps) == 1 and steps[0] > 0 and cols[0] >= 0:
+                return X[:, slice(cols[0], cols[-1] + 1, steps[0])]
+        return super(NPYIterator, self)._use_cols(X)
+
+    def _read(self, frames, cols=None):
+        # uniform strides are slices, so the chunks are views of the array.
+        return self._array[frames]
@@ -30,6 +30,10 @@ import numpy as np
 import six
 from six.moves import range
 
+from chainsaw.data.md.feature_reader import (FeatureReaderCuboidRandomAccessStrategy,
+                                             FeatureReaderJaggedRandomAccessStrategy,
+                                             FeatureReaderLinearItrajRandomAccessStrategy,
+                                             FeatureReaderLinearRandomAccessStrategy)
 from chainsaw.data.util.fileformat_registry import FileFormatRegistry
 from ._base.datasource import DataSourceIterator, DataSource
 from .util.traj_info_cache import TrajInfo
@@ -39,6 +43,11 @@ from chainsaw.util.annotators import fix_docs
 
 @fix_docs
 class PyCSVIterator(DataSourceIterator):
+    # convert the lines of a chunk at once and only parse them row by row to report invalid entries.
+    block_parsing = True
+    # number of bytes read from the file at once
+    _BLOCK_SIZE = 4 * 1024 ** 2
+
     def __init__(self, data_source, skip=0, chunk=0, stride=1, return_trajindex=False, cols=None):
         # do not pass cols, because we want to handle in this impl, not in DataSourceIterator
         super(PyCSVIterator, self).__init__(data_source, skip=skip, chunk=chunk,
@@ -46,13 +55,7 @@ class PyCSVIterator(DataSourceIterator):
                                             return_trajindex=return_trajindex)
         self._custom_cols = cols
         self._open_file()
-        if isinstance(self._skip_rows, int):
-            self._skip_rows = np.arange(self._skip_rows)
-        self._skip_rows = (np.empty(0) if self._skip_rows is None
-                           else np.unique(self._skip_rows))
-        self.line = 0
-        self._reader = csv.reader(self._file_handle,
-                                  dialect=self._data_source._get_dialect(self._itraj))
+        self._dialect = self._data_source._get_dialect(self._itraj)
 
     def close(self):
         if self._file_handle is not None:
@@ -63,38 +66,96 @@ class PyCSVIterator(DataSourceIterator):
         self._itraj = -1
         self._next_traj()
 
+    def _select_trajectory(self, itraj):
+        super(PyCSVIterator, self)._select_trajectory(itraj)
+        self._itraj = itraj - 1
+        self._next_traj()
+
     def _next_chunk(self):
         if not self._file_handle or self._itraj >= self.number_of_trajectories():
             self.close()
             raise StopIteration()
 
         traj_len = self.trajectory_length()
-        lines = []
-        for row in self._reader:
-            if self.line in self._skip_rows:
-                self.line += 1
-                continue
-
-            self.line += 1
-            if not self.uniform_stride:
-                for _ in range(0, self.ra_indices_for_traj(self._itraj).tolist().count(self.line - 1)):
-                    lines.append(row)
-            else:
-                lines.append(row)
-            if self.chunksize != 0 and len(lines) % self.chunksize == 0:
-                result = self._convert_to_np_chunk(lines)
-                del lines[:]  # free some space
-                if self._t >= traj_len:
-                    self._next_traj()
-                return result
+        lines = self._read_lines()
+        if self.chunksize != 0 and len(lines) >= self.chunksize:
+            result = self._convert_to_np_chunk(lines)
+            if self._t >= traj_len:
+                self._next_traj()
+            return result
 
+        # last chunk, convert it before the time counter is reset for the next trajectory.
+        result = self._convert_to_np_chunk(lines) if len(lines) > 0 else None
         self._next_traj()
-        # last chunk
-        if len(lines) > 0:
-            result = self._convert_to_np_chunk(lines)
+        if result is not None:
             return result
+        if self._itraj < self.number_of_trajectories():
+            # all frames of the trajectory were skipped, continue with the next one.
+            result = np.empty((0, self._data_source.ndim))
+            return result[:, self._custom_cols] if self._custom_cols is not None else result
 
         self.close()
+        raise StopIteration()
+
+    def _read_lines(self):
+        """ returns the selected (not skipped and strided) lines of the next chunk, which are less than chunksize
+        only at the end of the file. Lines selected several times (random access) are repeated. """
+        if self._frames is not None:
+            n = self.chunksize if self.chunksize != 0 else len(self._frames)
+            frames = self._frames[self._frames_pos:self._frames_pos + n]
+            self._frames_pos += len(frames)
+            return self._read_frames(frames) if len(frames) else []
+
+        lines = []
+        n = self.chunksize
+        while n == 0 or len(lines) < n:
+            if self._selected_pos >= len(self._selected):
+                # the current block is processed, read the next one
+                self.line += len(self._block)
+                block = self._file_handle.readlines(self._BLOCK_SIZE)
+                if not block:
+                    break
+                # only count non-empty lines, like the trajectory length and the byte offsets do.
+                self._block = [line for line in block if line.strip()]
+                self._selected = self._select_lines(self.line, len(self._block))
+                self._selected_pos = 0
+            stop = len(self._selected) if n == 0 else min(len(self._selected), self._selected_pos + n - len(lines))
+            block = self._block
+            lines.extend([block[i] for i in self._selected[self._selected_pos:stop].tolist()])
+            self._selected_pos = stop
+        return lines
+
+    def _read_frames(self, frames):
+        """ reads the lines of the given (sorted) frames by seeking to their byte offsets. """
+        rows = frames + self._data_source._skip[self._itraj]
+        offsets = self._data_source._offsets[self._itraj]
+        # a line reaches to the begin of the next valid line, so it may contain empty lines.
+        starts, ends = offsets[rows], offsets[rows + 1]
+        fh = self._file_handle
+        first, last = int(starts[0]), int(ends[-1])
+        if last - first <= 4 * int((ends - starts).sum()):
+            # the lines are close to each other, read them at once.
+            fh.seek(first)
+            buf = fh.read(last - first)
+            lines = [buf[s:e] for s, e in zip((starts - first).tolist(), (ends - first).tolist())]
+        else:
+            lines = []
+            for s, e in zip(starts.tolist(), ends.tolist()):
+                fh.seek(s)
+                lines.append(fh.read(e - s))
+        return [line.decode('utf-8').strip('\r\n') for line in lines]
+
+    def _select_lines(self, first, n):
+        """ indices of the non-empty lines [first, first + n) of the file, which are part of the output. """
+        if not self.uniform_stride:
+            # indices may be repeated
+            indices = self.ra_indices_for_traj(self._itraj)
+            lo, hi = np.searchsorted(indices, (first, first + n))
+            return indices[lo:hi].astype(np.int64) - first
+        lo, hi = np.searchsorted(self._skip_rows, (first, first + n))
+        mask = np.ones(n, dtype=bool)
+        mask[self._skip_rows[lo:hi] - first] = False
+        return np.flatnonzero(mask)
 
     def _next_traj(self):
         self._itraj += 1
@@ -104,28 +165,47 @@ class PyCSVIterator(DataSourceIterator):
         if self._itraj < self.number_of_trajectories():
             # close current file handle
             self._file_handle.close()
-            # open next one
-            self._open_file()
-            # reset line counter
-            self.line = 0
-            # reset time counter
+            # reset time counter (before opening, so that skip is applied)
             self._t = 0
-            # get new reader
-            self._reader = csv.reader(self._file_handle,
-                                      dialect=self._data_source._get_dialect(self._itraj))
-
-    def _convert_to_np_chunk(self, list_of_strings):
-        # filter empty strings
-        list_of_strings = list(filter(bool, list_of_strings))
-        stack_of_strings = np.vstack(list_of_strings)
-        if self._custom_cols:
-            stack_of_strings = stack_of_strings[:, self._custom_cols]
+            # open next one (also resets the line counter)
+            self._open_file()
+            self._dialect = self._data_source._get_dialect(self._itraj)
+
+    def _convert_to_np_chunk(self, lines):
+        # filter empty lines
+        lines = [line for line in lines if line.strip()]
+        result = None
+        if self.block_parsing:
+            result = self._convert_block(lines)
+        if result is None:
+            result = self._convert_rows(lines)
+        if self._custom_cols is not None:
+            result = result[:, self._custom_cols]
+        self._t += len(lines)
+        return result
+
+    def _convert_block(self, lines):
+        # parses all lines in one vectorized call, returns None if this fails (eg. for quoted values or
+        # invalid entries), so the lines get parsed row by row.
+        delimiter = self._dialect.delimiter
+        if self._dialect.quotechar and any(self._dialect.quotechar in line for line in lines):
+            return None
         try:
-            result = stack_of_strings.astype(float)
+            result = np.loadtxt(lines, dtype=float, delimiter=delimiter, comments=None, ndmin=2)
+        except ValueError:
+            return None
+        if len(result) != len(lines):
+            return None
+        return result
+
+    def _convert_rows(self, lines):
+        rows = list(csv.reader(lines, dialect=self._dialect))
+        try:
+            return np.vstack(rows).astype(float)
         except ValueError:
             fn = self._file_handle.name
-            dialect_str = _dialect_to_str(self._reader.dialect)
-            for idx, line in enumerate(list_of_strings):
+            dialect_str = _dialect_to_str(self._dialect)
+            for idx, line in enumerate(rows):
                 for value in line:
                     try:
                         float(value)
@@ -135,20 +215,35 @@ class PyCSVIterator(DataSourceIterator):
                                                                             error=repr(ve),
                                                                             dialect=dialect_str)
                         raise ValueError(s)
-        self._t += len(list_of_strings)
-        return result
+            raise
 
     def _open_file(self):
+        # strided and random access reads seek to the byte offsets of the wanted lines.
+        self._frames = None
+        self._frames_pos = 0
+        length = self._data_source._lengths[self._itraj]
+        if (not self.uniform_stride or self.stride > 1) and \
+                len(self._data_source._offsets[self._itraj]) == self._data_source._skip[self._itraj] + length + 1:
+            if not self.uniform_stride:
+                self._frames = self.ra_indices_for_traj(self._itraj).astype(np.int64)
+            else:
+                self._frames = np.arange(self.skip if self._t == 0 else 0, length, self.stride, dtype=np.int64)
+            try:
+                self._file_handle = open(self._data_source.filenames[self._itraj], mode='rb')
+            except EnvironmentError:
+                self._logger.exception()
+                raise
+            return
+
         # only apply _skip property at the beginning of the trajectory
         skip = self._data_source._skip[self._itraj] + self.skip if self._t == 0 else 0
-        nt = self._data_source._skip[self._itraj] + self._data_source._lengths[self._itraj]
+        nt = self._data_source._skip[self._itraj] + length
 
         # calculate an index set, which rows to skip (includes stride)
         skip_rows = np.empty(0)
 
         if skip > 0:
-            skip_rows = np.zeros(nt)
-            skip_rows[:skip] = np.arange(skip)
+            skip_rows = np.arange(skip)
 
         if not self.uniform_stride:
             all_frames = np.arange(nt)
@@ -162,7 +257,12 @@ class PyCSVIterator(DataSourceIterator):
             skip_rows = np.setdiff1d(
                 all_frames, wanted_frames, assume_unique=True)
 
-        self._skip_rows = skip_rows
+        self._skip_rows = np.unique(skip_rows).astype(np.int64)
+        # non-empty lines of the file read so far, the last read block and the lines selected from it
+        self.line = 0
+        self._block = []
+        self._selected = np.empty(0, dtype=np.int64)
+        self._selected_pos = 0
         try:
             fh = open(self._data_source.filenames[self._itraj],
                       mode=self._data_source.DEFAULT_OPEN_MODE)
@@ -220,6 +320,9 @@ class PyCSVReader(DataSource):
         provide a default value for missing data:
         ``converters = {3: lambda s: float(s.strip() or 0)}``.
 
+    lazy : bool, default=False
+        determine the length of every file only once it is first accessed.
+
     Notes
     -----
     For reading files with only one column, one needs to specify a delimter...
@@ -227,8 +330,8 @@ class PyCSVReader(DataSource):
     DEFAULT_OPEN_MODE = 'r'  # read in text-mode
 
     def __init__(self, filenames, chunksize=1000, delimiters=None, comments='#',
-                 converters=None, **kwargs):
-        super(PyCSVReader, self).__init__(chunksize=chunksize)
+                 converters=None, lazy=False, **kwargs):
+        super(PyCSVReader, self).__init__(chunksize=chunksize, lazy=lazy)
         self._is_reader = True
 
         if isinstance(filenames, (tuple, list)):
@@ -249,6 +352,13 @@ class PyCSVReader(DataSource):
         # invoke filename setter
         self.filenames = filenames
 
+        # the lines of every frame are found by their byte offsets
+        self._is_random_accessible = True
+        self._ra_cuboid = FeatureReaderCuboidRandomAccessStrategy(self, 3)
+        self._ra_jagged = FeatureReaderJaggedRandomAccessStrategy(self, 3)
+        self._ra_linear_strategy = FeatureReaderLinearRandomAccessStrategy(self, 2)
+        self._ra_linear_itraj_strategy = FeatureReaderLinearItrajRandomAccessStrategy(self, 3)
+
     @staticmethod
     def __parse_args(arg, default, n):
         if arg is None:
@@ -263,6 +373,8 @@ class PyCSVReader(DataSource):
                              return_trajindex=return_trajindex, cols=cols)
 
     def _get_dialect(self, itraj):
+        # the dialect is determined alongside the trajectory info.
+        self._resolve_traj_infos([itraj])
         fn_idx = self.filenames.index(self.filenames[itraj])
         return self._dialects[fn_idx]
 
@@ -365,24 +477,27 @@ class PyCSVReader(DataSource):
         fh.readline()  # skip first line, because it may contain a much shorter header, which will give a bad estimate
         size = new_size(os.stat(filename).st_size / len(fh.readline()))
         offsets = np.empty(size, dtype=np.int64)
+        # whether the line ending at the offset is not empty
+        valid = np.empty(size, dtype=bool)
         offsets[0] = 0
+        valid[0] = True
         i = 1
-        # re-open in binary mode to circumvent a bug in Py3.5 win, where the first offset reported by tell
-        # overflows int64.
+        pos = 0
+        # re-open in binary mode to obtain byte offsets (also circumvents a bug in Py3.5 win, where the first
+        # offset reported by tell overflows int64).
         with open(filename, 'rb') as fh:
-            while fh.readline():
-                offsets[i] = fh.tell()
+            for line in fh:
+                pos += len(line)
+                offsets[i] = pos
+                valid[i] = bool(line.strip())
                 i += 1
                 if i >= len(offsets):
                     offsets = np.resize(offsets, new_size(len(offsets)))
-        offsets = offsets[:i]
-
-        # filter empty lines (offset between two lines is only 1 or 2 chars)
-        # insert an diff of 2 at the beginning to match the amount of indices
-        diff = np.diff(offsets)
-        mask = diff > 2
-        mask = np.insert(mask, 0, True)
-        offsets = offsets[mask]
+                    valid = np.resize(valid, len(offsets))
+
+        # filter empty lines, so that the valid line k spans offsets[k] to offsets[k + 1] (possibly preceded by
+        # empty lines).
+        offsets = offsets[:i][valid[:i]]
         length = len(offsets) - 1
 
         return length, offsets
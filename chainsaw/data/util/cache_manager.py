@@ -0,0 +1,217 @@
+# This file is part of PyEMMA.
+#
+# Copyright (c) 2016 Computational Molecular Biology Group, Freie Universitaet Berlin (GER)
+#
+# PyEMMA is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import
+
+import atexit
+import os
+import sqlite3
+import time
+import weakref
+from logging import getLogger
+
+from chainsaw import config
+from chainsaw.util.files import FileLock
+
+logger = getLogger(__name__)
+
+__all__ = ('CacheManager', )
+
+
+class CacheManager(object):
+    """ Keeps the caches of a directory within the size budget given by config.cache_max_size.
+
+    Every cache (one per pipeline) is a sub directory containing one file per cached trajectory (dataset).
+    The size and time of last access of every dataset is stored in a small sqlite index next to the
+    caches. Once the budget is exceeded, the least recently used datasets are evicted. The index may be
+    shared by several processes.
+
+    Only datasets registered by a cache are ever removed, so the cache directory may be shared with other
+    files (eg. the default temporary directory).
+    """
+
+    INDEX_FILE_NAME = 'chainsaw_cache_index.sqlite'
+    # flush deferred access times at most every n seconds
+    flush_interval = 5
+
+    _instances = {}
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.evictions = 0
+        self._open_files = weakref.WeakValueDictionary()
+        self._pending_accesses = {}
+        self._last_flush = time.time()
+        self._database = sqlite3.connect(os.path.join(directory, CacheManager.INDEX_FILE_NAME),
+                                         timeout=1000, isolation_level=None)
+        # switching the journal mode of a new database does not wait for other processes doing the same.
+        for attempt in range(100):
+            try:
+                self._database.execute("PRAGMA journal_mode=WAL")
+                self._database.execute("CREATE TABLE IF NOT EXISTS entries "
+                                       "(file TEXT, dataset TEXT, size INTEGER, last_access FLOAT, "
+                                       "PRIMARY KEY (file, dataset))")
+                break
+            except sqlite3.OperationalError as e:
+                if 'locked' not in str(e) or attempt == 99:
+                    raise
+                time.sleep(0.05)
+
+    @staticmethod
+    def instance(directory=None):
+        """ returns the manager of the given cache directory (defaults to config.cache_dir). """
+        if directory is None:
+            directory = config.cache_dir
+        directory = os.path.abspath(directory)
+        try:
+            return CacheManager._instances[directory]
+        except KeyError:
+            inst = CacheManager(directory)
+            CacheManager._instances[directory] = inst
+            atexit.register(inst.close)
+            return inst
+
+    @property
+    def max_size(self):
+        """ budget in bytes, zero means no limit. """
+        return config.cache_max_size * 1024 * 1024
+
+    def register(self, cache_file):
+        """ registers an opened cache (a _CacheFile), which gets informed about evictions of its datasets.
+        Datasets unknown to the index are added. """
+        name = cache_file.name
+        self._open_files[name] = cache_file
+        known = self._datasets(name)
+        for dataset in cache_file.datasets():
+            if dataset not in known:
+                self.add(name, dataset, os.path.getsize(cache_file._dataset_file(dataset)), evict=False)
+
+    def _datasets(self, file):
+        return set(r[0] for r in self._database.execute("SELECT dataset FROM entries WHERE file=?", (file, )))
+
+    def add(self, file, dataset, size, evict=True):
+        """ records a new (complete) dataset and evicts other entries, if the budget is exceeded. """
+        self._database.execute("INSERT OR REPLACE INTO entries (file, dataset, size, last_access) VALUES (?, ?, ?, ?)",
+                               (file, dataset, int(size), time.time()))
+        if evict:
+            self.evict(keep=(file, dataset))
+
+    def access(self, file, dataset):
+        """ marks the dataset as used, the time stamp is written deferred. """
+        now = time.time()
+        self._pending_accesses[(file, dataset)] = now
+        if now - self._last_flush > self.flush_interval:
+            self.sync()
+
+    def remove(self, file, dataset=None):
+        """ removes the dataset (or all datasets of the file, if None) from the index. """
+        if dataset is None:
+            self._database.execute("DELETE FROM entries WHERE file=?", (file, ))
+        else:
+            self._database.execute("DELETE FROM entries WHERE file=? AND dataset=?", (file, dataset))
+        for key in list(self._pending_accesses.keys()):
+            if key[0] == file and (dataset is None or key[1] == dataset):
+                del self._pending_accesses[key]
+
+    def sync(self):
+        if self._pending_accesses:
+            self._database.execute("BEGIN IMMEDIATE")
+            self._database.executemany("UPDATE entries SET last_access=? WHERE file=? AND dataset=?",
+                                       [(t, f, d) for (f, d), t in self._pending_accesses.items()])
+            self._database.execute("COMMIT")
+            self._pending_accesses.clear()
+        self._last_flush = time.time()
+
+    def close(self):
+        try:
+            self.sync()
+            self._database.close()
+        except sqlite3.ProgrammingError:
+            # already closed
+            pass
+
+    @staticmethod
+    def _remove_files(path):
+        """ removes the dataset file and its fill lock. The lock file is only removed while holding it, otherwise
+        it is in use by a process filling the dataset again. """
+        lock = FileLock(path + '.lock')
+        locked = lock.acquire(blocking=False)
+        try:
+            for f in (path, lock.path) if locked else (path, ):
+                try:
+                    os.unlink(f)
+                except OSError as e:
+                    # removed by somebody else (or never created), just forget it.
+                    logger.debug("could not remove %s: %s", f, e)
+        finally:
+            lock.release()
+
+    @property
+    def size(self):
+        """ size in bytes of all cached datasets. """
+        return self._database.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def files(self):
+        """ returns a list of (file, size, last_access) tuples of all caches in the index. """
+        return self._database.execute("SELECT file, SUM(size), MAX(last_access) FROM entries "
+                                      "GROUP BY file ORDER BY MAX(last_access)").fetchall()
+
+    def entries(self, file=None):
+        """ returns a list of (file, dataset, size, last_access) tuples in least recently used order. """
+        if file is None:
+            return self._database.execute("SELECT file, dataset, size, last_access FROM entries "
+                                          "ORDER BY last_access").fetchall()
+        return self._database.execute("SELECT file, dataset, size, last_access FROM entries WHERE file=? "
+                                      "ORDER BY last_access", (file, )).fetchall()
+
+    def evict(self, keep=None):
+        """ evicts least recently used entries until the budget is met.
+
+        Parameters
+        ----------
+        keep : tuple (file, dataset), optional
+            entry which is not evicted (eg. the one just written).
+
+        Returns
+        -------
+        evicted : list of tuples (file, dataset)
+            evicted entries.
+        """
+        max_size = self.max_size
+        evicted = []
+        if max_size == 0:
+            return evicted
+        self.sync()
+        size = self.size
+        if size <= max_size:
+            return evicted
+
+        for file, dataset, entry_size, _ in self.entries():
+            if size <= max_size:
+                break
+            if (file, dataset) == keep:
+                continue
+            cache_file = self._open_files.get(file, None)
+            if cache_file is not None:
+                cache_file._on_evicted(dataset)
+            self._remove_files(os.path.join(self.directory, file, dataset + '.h5'))
+            self.remove(file, dataset)
+            size -= entry_size
+            evicted.append((file, dataset))
+            self.evictions += 1
+            logger.debug("evicted dataset %s of cache %s", dataset, file)
+        return evicted
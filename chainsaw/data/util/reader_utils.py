@@ -25,8 +25,10 @@ import os
 
 from six import string_types
 
+from chainsaw.data.util.topology_cache import load_topology_cached
 
-def create_file_reader(input_files, topology, featurizer, chunk_size=1000, **kw):
+
+def create_file_reader(input_files, topology, featurizer, chunk_size=1000, lazy=False, **kw):
     r"""
     Creates a (possibly featured) file reader by a number of input files and either a topology file or a featurizer.
     Parameters
@@ -39,6 +41,8 @@ def create_file_reader(input_files, topology, featurizer, chunk_size=1000, **kw)
         A featurizer. If given, the topology file can be None.
     :param chunk_size:
         The chunk size with which the corresponding reader gets initialized.
+    :param lazy:
+        If True, the readers check the files and obtain their lengths once they are first accessed.
     :return: Returns the reader.
     """
     # fragmented trajectories
@@ -65,6 +69,10 @@ def create_file_reader(input_files, topology, featurizer, chunk_size=1000, **kw)
                 raise ValueError("The passed list did not exclusively contain strings or was a list of lists "
                                  "(fragmented trajectory).")
 
+        from chainsaw.data.feature_store import FeatureStoreReader
+        if len(input_list) == 1 and FeatureStoreReader.is_store(input_list[0]):
+            return FeatureStoreReader(input_list[0], chunksize=chunk_size)
+
         _, suffix = os.path.splitext(input_list[0])
 
         # check: do all files have the same file type? If not: raise ValueError.
@@ -73,7 +81,8 @@ def create_file_reader(input_files, topology, featurizer, chunk_size=1000, **kw)
             # do all the files exist? If not: Raise value error
             all_exist = True
             err_msg = ""
-            for item in input_list:
+            # lazy readers check the files on first access
+            for item in (input_list if not lazy else ()):
                 if not os.path.isfile(item):
                     err_msg += "\n" if len(err_msg) > 0 else ""
                     err_msg += "File %s did not exist or was no file" % item
@@ -87,7 +96,11 @@ def create_file_reader(input_files, topology, featurizer, chunk_size=1000, **kw)
                 # check all registered suffixes.
                 if suffix in FileFormatRegistry.supported_extensions():
                     clazz = FileFormatRegistry[suffix]
-                    if FileFormatRegistry.is_md_format(suffix):
+                    from chainsaw.data.h5_reader import H5FileReader
+                    if suffix in H5FileReader.SHARED_EXTENSIONS and not featurizer and not topology:
+                        # without a topology, these are datasets of precomputed features.
+                        clazz = H5FileReader
+                    elif FileFormatRegistry.is_md_format(suffix):
                         # check: do we either have a featurizer or a topology file name? If not: raise ValueError.
                         # create a MD reader with file names and topology
                         if not featurizer and not topology:
@@ -95,6 +108,8 @@ def create_file_reader(input_files, topology, featurizer, chunk_size=1000, **kw)
                                              "featurizer or a topology file.")
                         kw['featurizer'] = featurizer
                         kw['topologyfile'] = topology
+                    if lazy:
+                        kw['lazy'] = True
                     reader = clazz(input_list, chunksize=chunk_size, **kw)
                 else:
                     import pprint
@@ -163,7 +178,7 @@ def preallocate_empty_trajectory(top, n_frames=1):
 
 def enforce_top(top):
     if isinstance(top, string_types):
-        top = md.load(top).top
+        top = load_topology_cached(top)
     elif isinstance(top, md.Trajectory):
         top = top.top
     elif isinstance(top, md.Topology):
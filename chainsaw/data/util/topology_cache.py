@@ -0,0 +1,177 @@
+# This file is part of PyEMMA.
+#
+# Copyright (c) 2016 Computational Molecular Biology Group, Freie Universitaet Berlin (GER)
+#
+# PyEMMA is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Persistent cache of parsed topologies.
+
+Parsing large topology files (eg. a PDB with hundreds of thousands of atoms) with mdtraj takes seconds, which
+every process would pay again. Parsed topologies are therefore stored as plain arrays in
+config.cache_dir/topologies, keyed by the (cheap) file hash of the trajectory info cache, from which they are
+rebuilt several times faster than parsed.
+"""
+
+from __future__ import absolute_import
+
+import os
+import threading
+import time
+from logging import getLogger
+
+import mdtraj as md
+import numpy as np
+
+from chainsaw import config
+
+logger = getLogger(__name__)
+
+__all__ = ('load_topology_cached', 'dump_topology', 'load_topology')
+
+# increase, if the stored arrays change.
+FORMAT_VERSION = 1
+
+# topologies loaded by this process by file hash
+_topologies = {}
+_lock = threading.Lock()
+
+
+def dump_topology(top, filename):
+    """ stores the given mdtraj.Topology as arrays in a npz file. """
+    residues = list(top.residues)
+    atoms = list(top.atoms)
+    bonds = list(top.bonds)
+    serials = [a.serial for a in atoms]
+    charges = [getattr(a, 'formal_charge', None) for a in atoms]
+    bond_types = [getattr(b, 'type', None) for b in bonds]
+    bond_orders = [getattr(b, 'order', None) for b in bonds]
+    arrays = dict(
+        chain_ids=np.array([c.chain_id if getattr(c, 'chain_id', None) is not None else '' for c in top.chains],
+                           dtype=np.str_),
+        residue_chains=np.array([r.chain.index for r in residues], dtype=np.int64),
+        residue_names=np.array([r.name for r in residues], dtype=np.str_),
+        residue_seqs=np.array([r.resSeq for r in residues], dtype=np.int64),
+        residue_segments=np.array([r.segment_id for r in residues], dtype=np.str_),
+        atom_residues=np.array([a.residue.index for a in atoms], dtype=np.int64),
+        atom_names=np.array([a.name for a in atoms], dtype=np.str_),
+        atom_elements=np.array([a.element.symbol if a.element is not None else '' for a in atoms], dtype=np.str_),
+        atom_serials=np.array([s if s is not None else -1 for s in serials], dtype=np.int64),
+        atom_has_serial=np.array([s is not None for s in serials], dtype=bool),
+        atom_charges=np.array([c if c is not None else 0 for c in charges], dtype=np.int64),
+        atom_has_charge=np.array([c is not None for c in charges], dtype=bool),
+        bonds=np.array([(b[0].index, b[1].index) for b in bonds], dtype=np.int64).reshape(-1, 2),
+        bond_types=np.array([str(t) if t is not None else '' for t in bond_types], dtype=np.str_),
+        bond_orders=np.array([o if o is not None else 0 for o in bond_orders], dtype=np.int64),
+    )
+    # np.savez appends '.npz' to names without that extension.
+    with open(filename, 'wb') as fh:
+        np.savez(fh, **arrays)
+
+
+def load_topology(filename):
+    """ rebuilds a mdtraj.Topology stored by dump_topology. """
+    from mdtraj.core import topology as md_topology
+    with np.load(filename, allow_pickle=False) as f:
+        arrays = {k: f[k] for k in f.files}
+
+    top = md.Topology()
+    chains = [top.add_chain(chain_id=c or None) for c in arrays['chain_ids'].tolist()]
+    residues = [top.add_residue(name, chains[c], resSeq=seq, segment_id=segment)
+                for name, c, seq, segment in zip(arrays['residue_names'].tolist(),
+                                                 arrays['residue_chains'].tolist(),
+                                                 arrays['residue_seqs'].tolist(),
+                                                 arrays['residue_segments'].tolist())]
+    elements = {'': None}
+    for symbol in set(arrays['atom_elements'].tolist()) - {''}:
+        elements[symbol] = md.element.get_by_symbol(symbol)
+    serials = [s if has else None for s, has in zip(arrays['atom_serials'].tolist(),
+                                                    arrays['atom_has_serial'].tolist())]
+    atom_args = zip(arrays['atom_names'].tolist(), arrays['atom_elements'].tolist(),
+                    arrays['atom_residues'].tolist(), serials)
+    if arrays['atom_has_charge'].any():
+        charges = [c if has else None for c, has in zip(arrays['atom_charges'].tolist(),
+                                                        arrays['atom_has_charge'].tolist())]
+        atoms = [top.add_atom(name, elements[e], residues[r], serial=s, formal_charge=c)
+                 for (name, e, r, s), c in zip(atom_args, charges)]
+    else:
+        atoms = [top.add_atom(name, elements[e], residues[r], serial=s)
+                 for name, e, r, s in atom_args]
+
+    bond_types = {t: getattr(md_topology, t, None) for t in set(arrays['bond_types'].tolist()) - {''}}
+    bond_types[''] = None
+    for (i, j), t, order in zip(arrays['bonds'].tolist(), arrays['bond_types'].tolist(),
+                                arrays['bond_orders'].tolist()):
+        if bond_types[t] is None and not order:
+            top.add_bond(atoms[i], atoms[j])
+        else:
+            top.add_bond(atoms[i], atoms[j], type=bond_types[t], order=order or None)
+    return top
+
+
+def _cache_file(file_hash):
+    return os.path.join(config.cache_dir, 'topologies', '{}.v{}.npz'.format(file_hash, FORMAT_VERSION))
+
+
+def _store(top, file_name):
+    directory = os.path.dirname(file_name)
+    if not os.path.exists(directory):
+        try:
+            os.makedirs(directory)
+        except OSError:
+            # created by another process meanwhile
+            pass
+    # write to a temporary file first, so other processes never see incomplete files.
+    tmp = '{}.tmp.{}.{}'.format(file_name, os.getpid(), threading.current_thread().ident)
+    try:
+        dump_topology(top, tmp)
+        os.rename(tmp, file_name)
+    except Exception as e:
+        logger.debug("could not store topology in cache file %s: %s", file_name, e)
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+
+
+def load_topology_cached(top_file):
+    """ loads the topology of the given file, which is reused by this and all other processes.
+
+    Topologies are kept in memory of the process and, unless config.cache_topologies is False, stored in
+    config.cache_dir. Topology objects given are returned unchanged.
+    """
+    if isinstance(top_file, md.Topology):
+        return top_file
+    from chainsaw.data.util.traj_info_cache import TrajectoryInfoCache
+    file_hash = TrajectoryInfoCache.instance().hash_file(top_file)
+    with _lock:
+        top = _topologies.get(file_hash, None)
+    if top is not None:
+        return top
+
+    t0 = time.time()
+    cache_file = _cache_file(file_hash)
+    top = None
+    if config.cache_topologies and os.path.exists(cache_file):
+        try:
+            top = load_topology(cache_file)
+            logger.debug("loaded topology of %s from cache in %.3f s", top_file, time.time() - t0)
+        except Exception as e:
+            logger.debug("could not load cached topology %s: %s", cache_file, e)
+    if top is None:
+        top = md.load_topology(top_file)
+        logger.debug("parsed topology %s in %.3f s", top_file, time.time() - t0)
+        if config.cache_topologies:
+            _store(top, cache_file)
+    with _lock:
+        # another thread may have loaded it meanwhile, keep returning the same object.
+        top = _topologies.setdefault(file_hash, top)
+    return top
@@ -43,6 +43,11 @@ class AbstractDB(object):
         # value: TrajInfo
         pass
 
+    def set_many(self, values):
+        # values: list of TrajInfo
+        for value in values:
+            self.set(value)
+
     def update(self, value):
         pass
 
@@ -56,6 +61,16 @@ class AbstractDB(object):
         # should raise KeyError in case of non existent key
         pass
 
+    def get_many(self, keys):
+        # returns a dict containing the existing keys only
+        result = {}
+        for key in keys:
+            try:
+                result[key] = self.get(key)
+            except KeyError:
+                pass
+        return result
+
     @property
     def db_version(self):
         pass
@@ -93,12 +108,19 @@ class DictDB(AbstractDB):
 
 
 class SqliteDB(AbstractDB):
+    # maximum number of host parameters in a single sqlite statement
+    _MAX_VARIABLES = 900
+
     def __init__(self, filename=None, clean_n_entries=30):
         """
         :param filename: path to database file
         :param clean_n_entries: during cleaning delete n % entries.
+
+        Access timestamps are collected in memory and only written to the usage databases
+        on sync() and close(), so lookups do not write to the disk.
         """
         self.clean_n_entries = clean_n_entries
+        self._pending_time_stamps = {}
         import sqlite3
 
         # register numpy array conversion functions
@@ -127,6 +149,10 @@ class SqliteDB(AbstractDB):
         self.filename = filename
 
         try:
+            if filename is not None:
+                # readers do not block writers (and vice versa) in write-ahead-log mode,
+                # so several processes can share the database.
+                self._database.execute("PRAGMA journal_mode=WAL")
             cursor = self._database.execute("select num from version")
             row = cursor.fetchone()
             if not row:
@@ -151,8 +177,9 @@ class SqliteDB(AbstractDB):
 
     def _create_new_db(self):
         # assumes self.database is a sqlite3.Connection
-        create_version_table = "CREATE TABLE version (num INTEGER PRIMARY KEY);"
-        create_info_table = """CREATE TABLE traj_info(
+        # other processes might create the database at the same time.
+        create_version_table = "CREATE TABLE IF NOT EXISTS version (num INTEGER PRIMARY KEY);"
+        create_info_table = """CREATE TABLE IF NOT EXISTS traj_info(
             hash VARCHAR(64) PRIMARY KEY,
             length INTEGER,
             ndim INTEGER,
@@ -167,8 +194,12 @@ class SqliteDB(AbstractDB):
         self._database.commit()
 
     def close(self):
+        self._flush_time_stamps()
         self._database.close()
 
+    def sync(self):
+        self._flush_time_stamps()
+
     @property
     def db_version(self):
         cursor = self._database.execute("select num from version")
@@ -179,7 +210,7 @@ class SqliteDB(AbstractDB):
 
     @db_version.setter
     def db_version(self, val):
-        self._database.execute("insert into version VALUES (?)", [val])
+        self._database.execute("insert or ignore into version VALUES (?)", [val])
         self._database.commit()
 
     @property
@@ -189,16 +220,18 @@ class SqliteDB(AbstractDB):
         c = self._database.execute("SELECT COUNT(hash) from traj_info;").fetchone()
         return int(c[0])
 
-    def set(self, traj_info):
-        import sqlite3
-        values = (
+    def _values(self, traj_info):
+        return (
             traj_info.hash_value, traj_info.length, traj_info.ndim,
             np.array(traj_info.offsets), traj_info.abs_path, TrajectoryInfoCache.DB_VERSION,
             # lru db
             self._database_from_key(traj_info.hash_value)
         )
+
+    def set(self, traj_info):
+        import sqlite3
         statement = ("INSERT INTO traj_info (hash, length, ndim, offsets, abs_path, version, lru_db)"
-                     "VALUES (?, ?, ?, ?, ?, ?, ?)", values)
+                     "VALUES (?, ?, ?, ?, ?, ?, ?)", self._values(traj_info))
         try:
              self._database.execute(*statement)
         except sqlite3.IntegrityError as ie:
@@ -207,7 +240,28 @@ class SqliteDB(AbstractDB):
         self._database.commit()
 
         self._update_time_stamp(hash_value=traj_info.hash_value)
-
+        self._clean_if_needed()
+
+    def set_many(self, traj_infos):
+        """ inserts all given infos in a single transaction. Entries already present (eg. inserted by
+        another process in the meantime) are replaced. """
+        values = [self._values(traj_info) for traj_info in traj_infos]
+        # obtain the write lock right away, upgrading a read lock can fail with concurrent writers.
+        self._database.execute("BEGIN IMMEDIATE")
+        try:
+            self._database.executemany("INSERT OR REPLACE INTO traj_info "
+                                       "(hash, length, ndim, offsets, abs_path, version, lru_db)"
+                                       "VALUES (?, ?, ?, ?, ?, ?, ?)", values)
+        except:
+            self._database.execute("ROLLBACK")
+            raise
+        self._database.execute("COMMIT")
+
+        for traj_info in traj_infos:
+            self._update_time_stamp(hash_value=traj_info.hash_value)
+        self._clean_if_needed()
+
+    def _clean_if_needed(self):
         if self.filename is not None:
             current_size = os.stat(self.filename).st_size
             if (self.num_entries >= config.traj_info_max_entries or
@@ -217,7 +271,9 @@ class SqliteDB(AbstractDB):
                             "Entries: %s. Size: %.2fMB. Configured max_entires: %s. Max_size: %sMB"
                             % (self.num_entries, (current_size*1.0 / 1024**2),
                                config.traj_info_max_entries, config.traj_info_max_size))
-                self._clean(n=self.clean_n_entries)
+                # many entries might have been inserted at once, so delete at least the excess.
+                self._clean(n=self.clean_n_entries,
+                            min_delete=self.num_entries - config.traj_info_max_entries + 1)
 
     def get(self, key):
         cursor = self._database.execute("SELECT * FROM traj_info WHERE hash=?", (key,))
@@ -228,6 +284,27 @@ class SqliteDB(AbstractDB):
         self._update_time_stamp(key)
         return info
 
+    def get_many(self, keys):
+        """ looks up all given keys at once.
+
+        :param keys: hash values
+        :return: dict mapping the found keys to TrajInfo objects.
+        """
+        keys = list(set(keys))
+        result = {}
+        for i in range(0, len(keys), self._MAX_VARIABLES):
+            batch = keys[i:i + self._MAX_VARIABLES]
+            cursor = self._database.execute("SELECT * FROM traj_info WHERE hash IN (%s)"
+                                            % ", ".join("?" * len(batch)), batch)
+            for row in cursor.fetchall():
+                try:
+                    info = self._create_traj_info(row)
+                except UnknownDBFormatException:
+                    continue
+                result[info.hash_value] = info
+                self._update_time_stamp(info.hash_value)
+        return result
+
     def _database_from_key(self, key):
         """
         gets the database name for the given key. Should ensure a uniform spread
@@ -255,25 +332,38 @@ class SqliteDB(AbstractDB):
 
     def _update_time_stamp(self, hash_value):
         """ timestamps are being stored distributed over several lru databases.
-        The timestamp is a time.time() snapshot (float), which are seconds since epoch."""
-        db_name = self._database_from_key(hash_value)
-        if not db_name:
-            db_name=':memory:'
+        The timestamp is a time.time() snapshot (float), which are seconds since epoch.
 
-        import sqlite3
+        The timestamp is only remembered here and written by _flush_time_stamps."""
+        self._pending_time_stamps[hash_value] = time.time()
 
-        with sqlite3.connect(db_name) as conn:
-            """ last_read is a result of time.time()"""
-            conn.execute('CREATE TABLE IF NOT EXISTS usage '
-                         '(hash VARCHAR(32), last_read FLOAT)')
-            conn.commit()
-            cur = conn.execute('select * from usage where hash=?', (hash_value,))
-            row = cur.fetchone()
-            if not row:
-                conn.execute("insert into usage(hash, last_read) values(?, ?)", (hash_value, time.time()))
-            else:
-                conn.execute("update usage set last_read=? where hash=?", (time.time(), hash_value))
-            conn.commit()
+    def _flush_time_stamps(self):
+        """ writes all pending timestamps with one transaction per lru database. """
+        if not self._pending_time_stamps:
+            return
+        pending, self._pending_time_stamps = self._pending_time_stamps, {}
+        if not self.filename:
+            # without a database file there are no lru databases.
+            return
+
+        import sqlite3
+        by_db = {}
+        for hash_value, last_read in pending.items():
+            by_db.setdefault(self._database_from_key(hash_value), []).append((hash_value, last_read))
+
+        for db_name, values in by_db.items():
+            conn = sqlite3.connect(db_name, timeout=1000*1000, isolation_level=None)
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                """ last_read is a result of time.time()"""
+                conn.execute('CREATE TABLE IF NOT EXISTS usage '
+                             '(hash VARCHAR(32), last_read FLOAT)')
+                conn.execute("BEGIN IMMEDIATE")
+                conn.executemany("DELETE FROM usage WHERE hash=?", [(v[0],) for v in values])
+                conn.executemany("INSERT INTO usage(hash, last_read) VALUES (?, ?)", values)
+                conn.execute("COMMIT")
+            finally:
+                conn.close()
 
     @staticmethod
     def _create_traj_info(row):
@@ -307,16 +397,18 @@ class SqliteDB(AbstractDB):
         value = tuple(str(v) for v in value)
         return repr(value)[1:-2 if len(value) == 1 else -1]
 
-    def _clean(self, n):
+    def _clean(self, n, min_delete=0):
         """
         obtain n% oldest entries by looking into the usage databases. Then these entries
         are deleted first from the traj_info db and afterwards from the associated LRU dbs.
 
         :param n: delete n% entries in traj_info db [and associated LRU (usage) dbs].
+        :param min_delete: delete at least this many entries.
         """
         # delete the n % oldest entries in the database
         import sqlite3
-        num_delete = int(self.num_entries / 100.0 * n)
+        self._flush_time_stamps()
+        num_delete = max(int(self.num_entries / 100.0 * n), min_delete)
         logger.debug("removing %i entries from db" % num_delete)
         lru_dbs = self._database.execute("select hash, lru_db from traj_info").fetchall()
         lru_dbs.sort(key=itemgetter(1))
@@ -22,12 +22,16 @@ Created on 30.04.2015
 
 from __future__ import absolute_import
 
+import atexit
+import copy
 import hashlib
 import os
 import sys
+import time
 import warnings
 from io import BytesIO
 from logging import getLogger
+from multiprocessing.pool import ThreadPool
 
 import numpy as np
 
@@ -148,6 +152,8 @@ class TrajectoryInfoCache(object):
             else:
                 filename = os.path.join(config.cfg_dir, "traj_info.sqlite3")
             TrajectoryInfoCache._instance = TrajectoryInfoCache(filename)
+            # single lookups defer writing their access times.
+            atexit.register(TrajectoryInfoCache._instance.sync)
 
         return TrajectoryInfoCache._instance
 
@@ -186,32 +192,125 @@ class TrajectoryInfoCache(object):
 
     def __getitem__(self, filename_reader_tuple):
         filename, reader = filename_reader_tuple
+        # the access time stays queued, until the next call of get_many or sync writes it.
+        return self._get_many([filename], reader, n_jobs=1, callback=None)[0]
+
+    def _lookup(self, filename, reader, info):
+        # returns the given stored info or None on a cache miss.
         abs_path = os.path.abspath(filename)
-        key = self.hash_file(filename)
-        try:
-            info = self._database.get(key)
-            if not isinstance(info, TrajInfo):
-                raise KeyError()
-            self._handle_csv(reader, filename, info.length)
-            # if path has changed, update it
-            if not info.abs_path == abs_path:
-                info.abs_path = abs_path
-                self._database.update(info)
         # handle cache misses and not interpretable results by re-computation.
-        # Note: this also handles UnknownDBFormatExceptions!
-        except KeyError:
-            info = reader._get_traj_info(filename)
-            info.hash_value = key
+        if not isinstance(info, TrajInfo):
+            return None
+        self._handle_csv(reader, filename, info.length)
+        # if path has changed, update it
+        if not info.abs_path == abs_path:
             info.abs_path = abs_path
-            # store info in db
-            self.__setitem__(info)
-
-            # save forcefully now
-            if hasattr(self._database, 'sync'):
-                self._database.sync()
-
+            self._database.update(info)
         return info
 
+    def get_many(self, filenames, reader, n_jobs=None, callback=None):
+        """ obtains the TrajInfo objects of several files at once.
+
+        The files are hashed and, in case of cache misses, scanned by the given
+        reader concurrently in a pool of threads. The database is queried once
+        for all files and all new entries are stored in it at once.
+
+        Parameters
+        ----------
+        filenames : list of str
+            the files to look up.
+        reader : DataSource
+            the reader computing the info of files not contained in the cache.
+        n_jobs : int, optional
+            number of threads, defaults to config.traj_info_n_jobs.
+        callback : callable, optional
+            called (in the calling thread) once for every processed file, eg.
+            to update a progress bar.
+
+        Returns
+        -------
+        infos : list of TrajInfo
+            the info objects in the order of the given filenames.
+        """
+        infos = self._get_many(filenames, reader, n_jobs, callback)
+        # save forcefully now (including the access times of the cache hits and of previous single lookups)
+        self.sync()
+        return infos
+
+    def _get_many(self, filenames, reader, n_jobs, callback):
+        if n_jobs is None:
+            n_jobs = config.traj_info_n_jobs
+        n_jobs = max(1, min(n_jobs, len(filenames)))
+
+        def compute(filename):
+            return reader._get_traj_info(filename)
+
+        # the database is only accessed by this thread.
+        pool = ThreadPool(n_jobs) if n_jobs > 1 else None
+        imap = pool.imap if pool is not None else map
+        try:
+            t0 = time.time()
+            keys = list(imap(self.hash_file, filenames))
+            logger.debug("hashed %i files in %.3f s (policy=%s, n_jobs=%i)",
+                         len(filenames), time.time() - t0, config.traj_info_hash_policy, n_jobs)
+            stored = self._database.get_many(keys)
+            adopted = []
+            if config.traj_info_hash_policy == 'stat':
+                adopted = self._adopt_content_hashed(filenames, keys, stored, imap)
+            infos = [None] * len(filenames)
+            missing = []
+            for i, key in enumerate(keys):
+                infos[i] = self._lookup(filenames[i], reader, stored.get(key, None))
+                if infos[i] is None:
+                    missing.append(i)
+                elif callback is not None:
+                    callback()
+
+            new_infos = []
+            for i, info in zip(missing, imap(compute, [filenames[i] for i in missing])):
+                info.hash_value = keys[i]
+                info.abs_path = os.path.abspath(filenames[i])
+                infos[i] = info
+                new_infos.append(info)
+                if callback is not None:
+                    callback()
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+
+        if new_infos or adopted:
+            # store infos in db
+            self._database.set_many(new_infos + adopted)
+
+        return infos
+
+    def sync(self):
+        """ writes the queued access times of looked up entries to the database. """
+        if hasattr(self._database, 'sync'):
+            self._database.sync()
+
+    def _adopt_content_hashed(self, filenames, keys, stored, imap):
+        # the stat hash of a file is not in the database (eg. it was stored with the content policy): sample the
+        # content of these files only and re-store found entries under their stat hash.
+        unknown = [i for i, key in enumerate(keys) if key not in stored]
+        if not unknown:
+            return []
+        t0 = time.time()
+        content_keys = list(imap(self._get_file_hash_v2, [filenames[i] for i in unknown]))
+        logger.debug("sampled content of %i files with unknown stat hash in %.3f s",
+                     len(unknown), time.time() - t0)
+        by_content = self._database.get_many(content_keys)
+        adopted = []
+        for i, content_key in zip(unknown, content_keys):
+            info = by_content.get(content_key, None)
+            if isinstance(info, TrajInfo):
+                info = copy.copy(info)
+                info.hash_value = keys[i]
+                stored[keys[i]] = info
+                adopted.append(info)
+        return adopted
+
     def _get_file_hash(self, filename):
         statinfo = os.stat(filename)
 
@@ -241,7 +340,20 @@ class TrajectoryInfoCache(object):
         hasher.update(data)
         return hasher.hexdigest()
 
+    def _get_file_hash_stat(self, filename):
+        # only stats the file, the inode replaces the sampled content to tell equally named files apart.
+        statinfo = os.stat(filename)
+        hasher = hashlib.md5()
+        hasher.update(os.path.basename(filename).encode('utf-8'))
+        hasher.update(str(statinfo.st_ino).encode('ascii'))
+        hasher.update(str(statinfo.st_mtime).encode('ascii'))
+        hasher.update(str(statinfo.st_size).encode('ascii'))
+        return hasher.hexdigest()
+
     def hash_file(self, filename):
+        """ identifies the file according to config.traj_info_hash_policy. """
+        if config.traj_info_hash_policy == 'stat':
+            return self._get_file_hash_stat(filename)
         return self._get_file_hash_v2(filename)
 
     def __setitem__(self, traj_info):
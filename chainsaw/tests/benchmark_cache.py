@@ -0,0 +1,82 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from chainsaw import config
+from chainsaw.data.cache import Cache
+from chainsaw.util.contexts import settings
+
+# name, keyword arguments of Cache
+MODES = [('default', {}),
+         ('aligned chunks', dict(chunks='auto')),
+         ('lzf', dict(chunks='auto', compression='lzf')),
+         ('lzf+shuffle', dict(chunks='auto', compression='lzf', shuffle=True)),
+         ('gzip(4)+shuffle', dict(chunks='auto', compression='gzip', compression_opts=4, shuffle=True)),
+         ('float16', dict(chunks='auto', storage_dtype=np.float16)),
+         ('float16+lzf+shuffle', dict(chunks='auto', storage_dtype=np.float16, compression='lzf', shuffle=True)),
+         ]
+
+
+def genX(L, N, ntraj):
+    """ smooth (compressible) random walk data, similar to features of MD trajectories """
+    return [np.cumsum(np.random.normal(scale=0.01, size=(L, N)), axis=0) for _ in range(ntraj)]
+
+
+def cache_size(cache):
+    d = cache.data
+    return sum(os.path.getsize(d._dataset_file(h)) for h in d.datasets())
+
+
+def time_read(cache, chunksize, nrep=3):
+    """ mean time of iterating all data of the cache """
+    t1 = time.time()
+    for r in range(nrep):
+        for X in cache.iterator(chunk=chunksize, return_trajindex=False):
+            pass
+    t2 = time.time()
+    return (t2 - t1) / float(nrep)
+
+
+def benchmark_cache(L=100000, N=100, ntraj=5, chunksize=5000, nrep=3):
+    import chainsaw
+    tmp = tempfile.mkdtemp()
+    try:
+        files = []
+        for i, X in enumerate(genX(L, N, ntraj)):
+            f = os.path.join(tmp, '{}.npy'.format(i))
+            np.save(f, X)
+            files.append(f)
+        src = chainsaw.source(files, chunk_size=chunksize)
+        nbytes = float(src.n_frames_total() * N * np.dtype(src.output_type()).itemsize)
+
+        print('Cache read throughput\tL = {}\tN = {}\tntraj = {}\tchunksize = {}'.format(L, N, ntraj, chunksize))
+        print('mode\t\t\tsize [MB]\tratio\ttime [s]\tthroughput [MB/s]')
+        for name, kw in MODES:
+            config.cache_dir = tempfile.mkdtemp(dir=tmp)
+            # measure the cache files, not the memory tier.
+            with settings(cache_memory_size=0):
+                cache = Cache(src, chunksize=chunksize, **kw)
+                cache.get_output()
+                size = cache_size(cache)
+                t = time_read(cache, chunksize, nrep=nrep)
+            print('{:<20}\t{:.1f}\t\t{:.2f}\t{:.3f}\t\t{:.1f}'.format(name, size / 1024. ** 2, nbytes / size,
+                                                                 t, nbytes / 1024. ** 2 / t))
+        print()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main():
+    config.show_progress_bars = False
+    for L, N in [(100000, 100), (10000, 1000)]:
+        benchmark_cache(L=L, N=N)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from chainsaw import config
+from chainsaw.data.py_csv_reader import PyCSVIterator, PyCSVReader
+
+# name, whether chunks are converted at once or row by row (the error reporting fallback)
+MODES = [('per row', False),
+         ('block', True)]
+
+
+def time_read(reader, chunksize, stride=1, nrep=3):
+    """ mean time of iterating all data of the reader """
+    t1 = time.time()
+    for _ in range(nrep):
+        for X in reader.iterator(chunk=chunksize, stride=stride, return_trajindex=False):
+            pass
+    t2 = time.time()
+    return (t2 - t1) / float(nrep)
+
+
+def benchmark_csv(L=20000, N=100, delimiter=' ', chunksize=1000, stride=1, nrep=3):
+    tmp = tempfile.mkdtemp()
+    try:
+        f = os.path.join(tmp, 'data.csv')
+        np.savetxt(f, np.random.random((L, N)), delimiter=delimiter)
+        size = os.path.getsize(f) / 1024. ** 2
+        config.use_trajectory_lengths_cache = False
+        reader = PyCSVReader(f, chunksize=chunksize)
+
+        print('CSV read throughput\tL = {}\tN = {}\tdelimiter = {!r}\tchunksize = {}\tstride = {}'
+              .format(L, N, delimiter, chunksize, stride))
+        print('mode\t\ttime [s]\tthroughput [MB/s]')
+        old = PyCSVIterator.block_parsing
+        try:
+            for name, block_parsing in MODES:
+                PyCSVIterator.block_parsing = block_parsing
+                t = time_read(reader, chunksize, stride=stride, nrep=nrep)
+                print('{:<10}\t{:.3f}\t\t{:.1f}'.format(name, t, size / t))
+        finally:
+            PyCSVIterator.block_parsing = old
+        print()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def benchmark_sparse(L=200000, N=10, strides=(1, 10, 100, 1000), nrep=3):
+    """ strided reads seek to the wanted lines, so their time should decrease with the stride """
+    tmp = tempfile.mkdtemp()
+    try:
+        f = os.path.join(tmp, 'data.csv')
+        np.savetxt(f, np.random.random((L, N)))
+        config.use_trajectory_lengths_cache = False
+        reader = PyCSVReader(f)
+
+        print('CSV strided reads\tL = {}\tN = {}'.format(L, N))
+        print('stride\t\ttime [s]')
+        for stride in strides:
+            t = time_read(reader, 1000, stride=stride, nrep=nrep)
+            print('{:<10}\t{:.4f}'.format(stride, t))
+        print()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main():
+    config.show_progress_bars = False
+    for N, delimiter, stride in [(100, ' ', 1), (100, ',', 1), (1000, ' ', 1), (100, ' ', 3), (3, ' ', 1)]:
+        benchmark_csv(N=N, L=2000000 // N, delimiter=delimiter, stride=stride)
+    benchmark_sparse()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from chainsaw import config, source
+
+
+def dir_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+
+
+def time_call(f, nrep=3):
+    """ minimal time of calling f """
+    times = []
+    for _ in range(nrep):
+        t1 = time.time()
+        f()
+        times.append(time.time() - t1)
+    return min(times)
+
+
+def benchmark_feature_store(L=200000, N=50, block_size=1000, n_samples=1000):
+    tmp = tempfile.mkdtemp()
+    try:
+        # smooth features (like the ones of MD trajectories) compress better than noise.
+        X = np.cumsum(np.random.normal(scale=0.01, size=(L, N)), axis=0).astype(np.float32)
+        npy = os.path.join(tmp, 'features.npy')
+        np.save(npy, X)
+        frames = np.sort(np.random.randint(0, L, size=n_samples))
+        ra_stride = np.column_stack((np.zeros_like(frames), frames))
+
+        print('Feature store\tL = {}\tN = {}\tblock size = {}\trandom frames = {}'.format(L, N, block_size, n_samples))
+        print('format\t\t\tsize [MB]\twrite [s]\tread [s]\tone column [s]\trandom frames [s]')
+        formats = [('npy', None, False)] + [('store ' + str(c), c, False) for c in (None, 'zlib', 'lzma')] + \
+                  [('store ' + c + ' shuffle', c, True) for c in ('zlib', 'lzma')]
+        for name, compression, shuffle in formats:
+            if name == 'npy':
+                path, t_write = npy, float('nan')
+                reader = source(npy)
+            else:
+                path = os.path.join(tmp, 'store_%s_%s' % (compression, shuffle))
+                t1 = time.time()
+                reader = source(X).write_store(path, block_size=block_size, compression=compression,
+                                               shuffle=shuffle)
+                t_write = time.time() - t1
+            t_read = time_call(lambda: reader.get_output(chunk=block_size))
+            t_column = time_call(lambda: reader.get_output(chunk=block_size, dimensions=[N // 2]))
+            t_ra = time_call(lambda: list(reader.iterator(stride=ra_stride, chunk=block_size)))
+            print('{:<20}\t{:.1f}\t\t{:.3f}\t\t{:.3f}\t\t{:.3f}\t\t{:.3f}'.format(
+                name, dir_size(path) / 1024. ** 2, t_write, t_read, t_column, t_ra))
+        print()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main():
+    config.show_progress_bars = False
+    benchmark_feature_store()
+    benchmark_feature_store(N=500, L=20000)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import time
+
+import h5py
+import numpy as np
+
+from chainsaw import config
+from chainsaw.data.h5_reader import H5FileReader
+
+
+def read_naive(filename, chunksize):
+    """ reads the rows of every chunk with a slice of the dataset """
+    with h5py.File(filename, mode='r') as f:
+        ds = f['features']
+        for start in range(0, len(ds), chunksize):
+            ds[start:start + chunksize]
+
+
+def read_reader(filename, chunksize):
+    reader = H5FileReader(filename, selection='/features')
+    for _ in reader.iterator(chunk=chunksize, return_trajindex=False):
+        pass
+
+
+def benchmark_h5(L=200000, N=100, rows_per_chunk=40000, chunksize=1000, compression='gzip'):
+    tmp = tempfile.mkdtemp()
+    try:
+        f = os.path.join(tmp, 'features.h5')
+        with h5py.File(f, mode='w') as fh:
+            fh.create_dataset('features', data=np.random.random((L, N)), chunks=(rows_per_chunk, N),
+                              compression=compression)
+        size = L * N * 8 / 1024. ** 2
+
+        print('HDF5 read throughput\tL = {}\tN = {}\trows per HDF5 chunk = {}\tchunksize = {}\tcompression = {}'
+              .format(L, N, rows_per_chunk, chunksize, compression))
+        print('mode\t\ttime [s]\tthroughput [MB/s]')
+        for name, read in [('slices', read_naive), ('H5FileReader', read_reader)]:
+            t1 = time.time()
+            read(f, chunksize)
+            t = time.time() - t1
+            print('{:<12}\t{:.3f}\t\t{:.1f}'.format(name, t, size / t))
+        print()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main():
+    config.show_progress_bars = False
+    for rows_per_chunk, compression in [(1000, None), (40000, None), (1000, 'gzip'), (40000, 'gzip')]:
+        benchmark_h5(rows_per_chunk=rows_per_chunk, compression=compression)
+
+
+if __name__ == "__main__":
+    main()
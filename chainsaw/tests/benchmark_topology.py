@@ -0,0 +1,85 @@
+from __future__ import absolute_import
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import time
+
+import mdtraj as md
+import numpy as np
+
+from chainsaw import config
+from chainsaw.data.util import topology_cache
+
+RESIDUE = [('N', 'N'), ('CA', 'C'), ('C', 'C'), ('O', 'O'), ('CB', 'C')]
+
+
+def gen_pdb(filename, n_atoms):
+    """ writes a chain of alanine like residues with n_atoms atoms """
+    top = md.Topology()
+    chain = top.add_chain()
+    for r in range(n_atoms // len(RESIDUE)):
+        residue = top.add_residue('ALA', chain, resSeq=r % 10000)
+        prev = None
+        for name, symbol in RESIDUE:
+            atom = top.add_atom(name, md.element.get_by_symbol(symbol), residue)
+            if prev is not None:
+                top.add_bond(prev, atom)
+            prev = atom
+    xyz = np.random.random((1, top.n_atoms, 3)).astype(np.float32)
+    md.Trajectory(xyz, top).save_pdb(filename)
+
+
+def time_call(f, nrep=3, setup=None):
+    """ minimal time of calling f """
+    times = []
+    for _ in range(nrep):
+        if setup is not None:
+            setup()
+        t1 = time.time()
+        f()
+        times.append(time.time() - t1)
+    return min(times)
+
+
+def benchmark_topology(n_atoms=100000, nrep=3):
+    tmp = tempfile.mkdtemp()
+    old_cache_dir = config.cache_dir
+    try:
+        pdb = os.path.join(tmp, 'top.pdb')
+        gen_pdb(pdb, n_atoms)
+        config.cache_dir = tmp
+
+        def new_process():
+            topology_cache._topologies.clear()
+
+        def empty_cache():
+            new_process()
+            shutil.rmtree(os.path.join(tmp, 'topologies'), ignore_errors=True)
+
+        load = lambda: topology_cache.load_topology_cached(pdb)
+        t_parse = time_call(lambda: md.load_topology(pdb), nrep=nrep)
+        t_cold = time_call(load, nrep=nrep, setup=empty_cache)
+        t_disk = time_call(load, nrep=nrep, setup=new_process)
+        t_memory = time_call(load, nrep=nrep)
+
+        print('Topology startup\tn_atoms = {}'.format(n_atoms))
+        print('mode\t\t\ttime [s]\tspeedup')
+        for name, t in [('mdtraj.load_topology', t_parse), ('cold cache', t_cold),
+                        ('disk cache', t_disk), ('same process', t_memory)]:
+            print('{:<20}\t{:.4f}\t\t{:.1f}'.format(name, t, t_parse / t))
+        print()
+    finally:
+        config.cache_dir = old_cache_dir
+        topology_cache._topologies.clear()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main():
+    for n_atoms in [10000, 100000, 500000]:
+        benchmark_topology(n_atoms=n_atoms)
+
+
+if __name__ == "__main__":
+    main()
@@ -22,12 +22,16 @@ import unittest
 import os
 import tempfile
 
+import mdtraj
+import mock
+
 from chainsaw.data.md import MDFeaturizer
 from logging import getLogger
 import chainsaw.api as api
 import numpy as np
 from chainsaw.data.numpy_filereader import NumPyFileReader
 from chainsaw.data.py_csv_reader import PyCSVReader as CSVReader
+from chainsaw.data.util.fileformat_registry import FileFormatRegistry
 import shutil
 
 
@@ -112,6 +116,52 @@ class TestApiSourceFileReader(unittest.TestCase):
 
         self.assertIn("could not parse", exc.exception.args[0])
 
+    def test_lazy(self):
+        from chainsaw.util.contexts import settings
+        data = [np.random.random((10 * (i + 1), 3)) for i in range(5)]
+        for ext, save in (('.npy', np.save), ('.dat', np.savetxt)):
+            files = [os.path.join(self.dir, 'lazy_%i%s' % (i, ext)) for i in range(len(data))]
+            for f, x in zip(files, data):
+                save(f, x)
+            with settings(use_trajectory_lengths_cache=False):
+                with mock.patch.object(FileFormatRegistry[ext], '_get_traj_info',
+                                       autospec=True, side_effect=FileFormatRegistry[ext]._get_traj_info) as info:
+                    reader = api.source(files, lazy=True)
+                    info.assert_not_called()
+
+                    self.assertEqual(reader.number_of_trajectories(), len(files))
+                    self.assertEqual(reader.trajectory_length(3), 40)
+                    self.assertEqual(info.call_count, 1)
+                    self.assertEqual(reader.dimension(), 3)
+                    self.assertEqual(info.call_count, 1)
+
+                    # iterating a single trajectory obtains at most its length
+                    it = reader.iterator(stride=np.array([[1, 0], [1, 5]]), return_trajindex=False)
+                    np.testing.assert_allclose(np.vstack(list(it)), data[1][[0, 5]])
+                    self.assertLessEqual(info.call_count, 2)
+
+                    self.assertEqual(reader.n_frames_total(), sum(len(x) for x in data))
+                    self.assertEqual(info.call_count, len(files))
+            out = reader.get_output()
+            for x, y in zip(data, out):
+                np.testing.assert_allclose(y, x)
+
+        # different dimensions are detected, once the files are accessed.
+        f = os.path.join(self.dir, 'lazy_other_dim.npy')
+        np.save(f, np.zeros((10, 2)))
+        reader = api.source([os.path.join(self.dir, 'lazy_0.npy'), f], lazy=True)
+        self.assertEqual(reader.dimension(), 3)
+        with self.assertRaises(ValueError):
+            reader.trajectory_length(1)
+
+    def test_lazy_feature_reader(self):
+        with mock.patch('mdtraj.load_frame', side_effect=mdtraj.load_frame) as load_frame:
+            reader = api.source(self.bpti_mini_files[0], top=self.bpti_pdbfile, lazy=True)
+            load_frame.assert_not_called()
+            X = reader.get_output()
+            load_frame.assert_called_once()
+        np.testing.assert_allclose(X, api.source(self.bpti_mini_files[0], top=self.bpti_pdbfile).get_output())
+
 import pkg_resources
 class TestApiSourceFeatureReader(unittest.TestCase):
 
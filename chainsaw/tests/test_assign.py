@@ -250,6 +250,19 @@ class TestClusterAssign(unittest.TestCase):
 
         np.testing.assert_equal(assignment_mp, assignment_sp)
 
+    def test_assignment_parallel_input(self):
+        data = [self.X[:2000], self.X[2000:2500], self.X[2500:]]
+        for stage in (coor.source(data, chunk_size=300), coor.pca(data, dim=2)):
+            ass = coor.assign_to_centers(stage, self.centers[:, :stage.dimension()], return_dtrajs=False)
+            ass.chunksize = 300
+            desired = ass.get_output(stride=3)
+            actual = ass.assign(stride=3, n_jobs=2)
+            self.assertIs(ass.dtrajs, actual)
+            for a, d in zip(actual, desired):
+                np.testing.assert_equal(a, d[:, 0])
+        with self.assertRaises(ValueError):
+            ass.assign(self.X, n_jobs=2)
+
     def test_assignment_multithread_minrsmd(self):
         # re-do assignment with multiple threads and compare results
         n = 10000
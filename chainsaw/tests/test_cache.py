@@ -3,10 +3,13 @@ import tempfile
 import unittest
 from glob import glob
 
+import mock
 import numpy as np
 from chainsaw import config
 
+from chainsaw.data._base.iterable import Iterable
 from chainsaw.data.cache import Cache
+from chainsaw.util.contexts import settings
 import chainsaw
 
 from logging import getLogger
@@ -21,6 +24,15 @@ class ProfilerCase(unittest.TestCase):
         self.pr.dump_stats(self._testMethodName)
 
 
+def _fill_shared_cache(args):
+    files, cache_dir = args
+    config.cache_dir = cache_dir
+    config.use_trajectory_lengths_cache = False
+    cache = Cache(chainsaw.source(files, chunk_size=0), fill_cache=False)
+    out = [X for _, X in cache.iterator(chunk=0)]
+    return cache.data.misses, out
+
+
 class TestCache(unittest.TestCase):
     
     @classmethod
@@ -65,6 +77,198 @@ class TestCache(unittest.TestCase):
 
         #self.assertIn("items={}".format(len(cache)), repr(cache))
 
+    def test_write_through(self):
+        src = chainsaw.source(self.files, chunk_size=0)
+        desired = src.get_output()
+        cache = Cache(src)
+        # the first pass streams the data from the source and writes it to the cache on the fly.
+        chunks = {i: [] for i in range(len(self.files))}
+        with cache.iterator(chunk=300) as it:
+            for itraj, X in it:
+                if not chunks[itraj]:
+                    self.assertFalse(cache.data.is_complete(itraj))
+                chunks[itraj].append(X)
+        self.assertEqual(cache.data.misses, len(self.files))
+        for itraj in chunks:
+            self.assertTrue(cache.data.is_complete(itraj))
+            np.testing.assert_allclose(np.vstack(chunks[itraj]), desired[itraj])
+
+        # the second pass only reads the cache.
+        with mock.patch.object(src, '_create_iterator') as create_iterator:
+            np.testing.assert_allclose(cache.get_output(), desired)
+            for itraj, X in cache.iterator(chunk=300):
+                pass
+            create_iterator.assert_not_called()
+
+    def test_write_through_interrupted(self):
+        src = chainsaw.source(self.files, chunk_size=0)
+        cache = Cache(src)
+        with cache.iterator(chunk=300) as it:
+            next(it)
+        self.assertFalse(cache.data.is_complete(0))
+        # incomplete trajectories are filled again
+        np.testing.assert_allclose(cache.get_output(), src.get_output())
+
+    def test_write_through_empty_trajectory(self):
+        d = tempfile.mkdtemp(dir=self.test_dir)
+        files = [os.path.join(d, "{}.npy".format(i)) for i in range(3)]
+        for f, n in zip(files, (10, 0, 7)):
+            np.save(f, np.random.random((n, self.dim)))
+        src = chainsaw.source(files, chunk_size=0)
+        desired = src.get_output()
+        cache = Cache(src)
+        for _ in range(2):
+            chunks = {i: [np.empty((0, self.dim))] for i in range(len(files))}
+            for itraj, X in cache.iterator(chunk=3):
+                chunks[itraj].append(X)
+            for itraj in chunks:
+                self.assertTrue(cache.data.is_complete(itraj))
+                np.testing.assert_allclose(np.vstack(chunks[itraj]), desired[itraj])
+
+    def test_write_through_by_two_caches(self):
+        from chainsaw.util.files import FileLock
+        acquire = FileLock.acquire
+
+        def acquire_without_waiting(lock, exclusive=True, blocking=True):
+            # no other process holds the locks, so waiting for one would wait for this process forever.
+            if not acquire(lock, exclusive, blocking=False):
+                raise AssertionError('waiting for lock {}'.format(lock.path))
+            return True
+
+        src = chainsaw.source(self.files, chunk_size=0)
+        desired = src.get_output()
+        caches = [Cache(src, fill_cache=False), Cache(src, fill_cache=False)]
+        with mock.patch.object(FileLock, 'acquire', autospec=True, side_effect=acquire_without_waiting):
+            # eg. the instantaneous and time-lagged iterators of TICA on cached stages.
+            its = [cache.iterator(chunk=300, lag=lag, return_trajindex=True) for cache, lag in zip(caches, (0, 1))]
+            chunks = {i: [] for i in range(len(self.files))}
+            for (itraj, X), (_, _, Y) in zip(*its):
+                chunks[itraj].append(X)
+        for itraj in chunks:
+            np.testing.assert_allclose(np.vstack(chunks[itraj]), desired[itraj])
+            self.assertTrue(caches[0].data.is_complete(itraj))
+        self.assertEqual(caches[0].data.misses + caches[1].data.misses, len(self.files))
+
+    def _large_files(self, n):
+        # 1.2 MB per trajectory in the cache (float32)
+        d = tempfile.mkdtemp(dir=self.test_dir)
+        files = [os.path.join(d, "{}.npy".format(i)) for i in range(n)]
+        for f in files:
+            np.save(f, np.random.random((100000, 3)))
+        return files
+
+    def test_eviction(self):
+        src = chainsaw.source(self._large_files(4), chunk_size=0)
+        with settings(cache_max_size=3, cache_memory_size=0):
+            cache = Cache(src)
+            cache.get_output()
+            manager = cache.data.manager
+            self.assertLessEqual(manager.size, 3 * 1024 * 1024)
+            self.assertEqual(cache.data.misses, 4)
+            self.assertEqual(cache.data.evictions, 2)
+            self.assertEqual(len(cache.data), 2)
+            # the least recently used trajectories have been evicted
+            self.assertFalse(cache.data.is_complete(0))
+            self.assertFalse(cache.data.is_complete(1))
+            self.assertTrue(cache.data.is_complete(2))
+
+            # access traj 2, so traj 3 gets evicted next.
+            cache.data[2]
+            cache.data[0]
+            self.assertEqual(cache.data.misses, 5)
+            self.assertTrue(cache.data.is_complete(2))
+            self.assertFalse(cache.data.is_complete(3))
+            self.assertEqual(cache.data.evictions, 3)
+            self.assertEqual(manager.evictions, 3)
+            # evicted datasets leave no lock files behind
+            files = os.listdir(os.path.join(manager.directory, cache.data.name))
+            self.assertEqual(sorted(f for f in files if f.endswith('.lock')),
+                             sorted(f + '.lock' for f in files if f.endswith('.h5')))
+
+            np.testing.assert_allclose(cache.get_output(), src.get_output())
+
+    def test_eviction_across_caches(self):
+        src = chainsaw.source(self._large_files(2), chunk_size=0)
+        with settings(cache_max_size=3):
+            cache_src = Cache(src)
+            cache_src.get_output()
+            manager = cache_src.data.manager
+            self.assertEqual(len(manager.files()), 1)
+
+            tica = chainsaw.tica(src, dim=3)
+            cache_tica = Cache(tica)
+            cache_tica.get_output()
+            self.assertNotEqual(cache_tica.data.file_name, cache_src.data.file_name)
+            # the cache of the source is the least recently used one
+            self.assertEqual(len(cache_src.data), 0)
+            self.assertEqual(cache_src.data.evictions, 2)
+            self.assertEqual(len(cache_tica.data), 2)
+            self.assertEqual([f[0] for f in manager.files()], [cache_tica.data.name])
+            self.assertLessEqual(manager.size, 3 * 1024 * 1024)
+
+    def test_memory_tier(self):
+        from chainsaw.data.cache import _memory_cache
+        src = chainsaw.source(self._large_files(3), chunk_size=0)
+        desired = src.get_output()
+        with settings(cache_memory_size=3):
+            cache = Cache(src)
+            cache.get_output()
+            self.assertEqual(cache.data.memory_hits, 0)
+            # only two trajectories fit into memory
+            self.assertLessEqual(_memory_cache.size, 3 * 1024 * 1024)
+            with mock.patch.object(cache.data, '_published', wraps=cache.data._published) as published:
+                for itraj in (1, 2):
+                    traj = cache.data[itraj]
+                    self.assertIsInstance(traj, np.ndarray)
+                    self.assertFalse(traj.flags.writeable)
+                    np.testing.assert_allclose(traj, desired[itraj])
+                published.assert_not_called()
+                self.assertEqual(cache.data.memory_hits, 2)
+
+                # falls back to the cache file
+                np.testing.assert_allclose(cache.data[0], desired[0])
+                published.assert_called_once()
+
+            # chunks read from memory are equal to those of the source
+            for (i1, X1), (i2, X2) in zip(cache.iterator(chunk=3000), src.iterator(chunk=3000)):
+                self.assertEqual(i1, i2)
+                np.testing.assert_allclose(X1, X2, rtol=1e-6)
+            self.assertEqual(cache.data.misses, 3)
+
+    def test_warm(self):
+        src = chainsaw.source(self.files, chunk_size=300)
+        tica = chainsaw.tica(src, dim=2)
+        desired = tica.get_output()
+        cache = Cache(tica)
+        self.assertEqual(cache.warm(n_jobs=3), len(self.files))
+        self.assertEqual(cache.data.misses, len(self.files))
+        for itraj in range(len(self.files)):
+            self.assertTrue(cache.data.is_complete(itraj))
+        with mock.patch.object(src, '_create_iterator') as create_iterator:
+            np.testing.assert_allclose(cache.get_output(), desired, rtol=1e-5)
+            create_iterator.assert_not_called()
+        self.assertEqual(cache.warm(n_jobs=3), 0)
+
+    def test_shared_by_processes(self):
+        from multiprocessing import Pool
+        src = chainsaw.source(self.files, chunk_size=0)
+        cache = Cache(src, fill_cache=False)
+        pool = Pool(4)
+        try:
+            results = pool.map(_fill_shared_cache, [(self.files, self.tmp_cache_dir)] * 4)
+        finally:
+            pool.close()
+            pool.join()
+        # every trajectory is filled by exactly one process, all processes get the same data.
+        self.assertEqual(sum(r[0] for r in results), len(self.files))
+        desired = src.get_output()
+        for _, out in results:
+            np.testing.assert_allclose(out, desired)
+        self.assertEqual(len(cache.data), len(self.files))
+        self.assertEqual(cache.data.misses, 0)
+        np.testing.assert_allclose(cache.get_output(), desired)
+        self.assertFalse([f for f in os.listdir(cache.data.file_name) if '.tmp.' in f])
+
     def test_get_output(self):
         src = chainsaw.source(self.files, chunk_size=0)
         dim = 1
@@ -76,6 +280,51 @@ class TestCache(unittest.TestCase):
         actual = cache.get_output(stride=stride, dimensions=dim, skip=skip)
         np.testing.assert_allclose(actual, desired)
 
+    def test_get_output_parallel(self):
+        src = chainsaw.source(self.files, chunk_size=0)
+        cache = Cache(chainsaw.tica(src, dim=2), fill_cache=False)
+        desired = cache.data_producer.get_output()
+        with mock.patch.object(Iterable, 'get_output', autospec=True,
+                               side_effect=Iterable.get_output) as get_output:
+            actual = cache.get_output(n_jobs=2)
+            self.assertEqual(get_output.call_args[0][5], 2)
+        np.testing.assert_allclose(actual, desired, rtol=1e-5)
+        # the workers have filled the cache
+        for itraj in range(len(self.files)):
+            self.assertTrue(cache.data.is_complete(itraj))
+
+    def test_storage_options(self):
+        src = chainsaw.source(self.files, chunk_size=0)
+        desired = src.get_output()
+        with settings(cache_memory_size=0):
+            cache = Cache(src, chunksize=300, compression='lzf', shuffle=True, chunks='auto')
+            for itraj, X in cache.iterator():
+                pass
+            table = cache.data[0]
+            self.assertEqual(table.compression, 'lzf')
+            self.assertTrue(table.shuffle)
+            self.assertEqual(table.chunks, (300, self.dim))
+            np.testing.assert_allclose(cache.get_output(), desired, rtol=1e-6)
+
+            cache_half = Cache(src, storage_dtype=np.float16, compression='gzip', compression_opts=4)
+            self.assertNotEqual(cache_half.current_cache_file_name, cache.current_cache_file_name)
+            out = cache_half.get_output()
+            self.assertEqual(cache_half.data[0].dtype, np.float16)
+            for actual, expected in zip(out, desired):
+                self.assertEqual(actual.dtype, cache_half.output_type())
+                np.testing.assert_allclose(actual, expected, rtol=1e-3, atol=1e-3)
+            chunks = {}
+            for itraj, X in cache_half.iterator(chunk=300):
+                self.assertEqual(X.dtype, cache_half.output_type())
+                chunks.setdefault(itraj, []).append(X)
+            for itraj in chunks:
+                np.testing.assert_equal(np.vstack(chunks[itraj]), out[itraj])
+
+        with self.assertRaises(ValueError):
+            Cache(src, compression='bzip2')
+        with self.assertRaises(ValueError):
+            Cache(src, compression='lzf', compression_opts=4)
+
     def test_tica_cached_input(self):
         src = chainsaw.source(self.files, chunk_size=0)
         cache = Cache(src)
@@ -100,6 +349,83 @@ class TestCache(unittest.TestCase):
 
         np.testing.assert_allclose(cache.get_output(), tica_output)
 
+    def test_cluster_cached_tica_output(self):
+        src = chainsaw.source(self.files, chunk_size=0)
+        tica = chainsaw.tica(src, dim=2)
+        cache = Cache(tica)
+        self.assertEqual(cache.ntraj, len(self.files))
+        np.testing.assert_equal(cache.trajectory_lengths(), tica.trajectory_lengths())
+
+        km_cache = chainsaw.cluster_kmeans(cache, k=5, max_iter=3, fixed_seed=True)
+        km = chainsaw.cluster_kmeans(tica, k=5, max_iter=3, fixed_seed=True)
+        np.testing.assert_allclose(km_cache.clustercenters, km.clustercenters, rtol=1e-5)
+        for d_cache, d in zip(km_cache.dtrajs, km.dtrajs):
+            np.testing.assert_equal(d_cache, d)
+
+    def test_stage_key(self):
+        src = chainsaw.source(self.files, chunk_size=0)
+        tica = chainsaw.tica(src, lag=1, dim=2)
+        key = Cache.stage_key(tica)
+        # caches are transparent
+        self.assertEqual(Cache.stage_key(Cache(tica)), key)
+        tica.data_producer = Cache(src)
+        self.assertEqual(Cache.stage_key(tica), key)
+        self.assertNotEqual(Cache.stage_key(chainsaw.tica(src, lag=2, dim=2)), key)
+        # runtime options do not change the output
+        tica.n_jobs = 2
+        self.assertEqual(Cache.stage_key(tica), key)
+        self.assertNotEqual(Cache.stage_key(src), key)
+        self.assertEqual(Cache(tica).current_cache_file_name, 'TICA_' + key)
+
+    def test_stage_key_of_estimated_model(self):
+        src = chainsaw.source(self.files, chunk_size=0)
+        # the same estimation parameters give different models (k-means without a fixed seed).
+        km = chainsaw.cluster_kmeans(src, k=3, max_iter=2)
+        km2 = chainsaw.cluster_kmeans(src, k=3, max_iter=2)
+        km2.clustercenters = km.clustercenters[::-1]
+        self.assertEqual(repr(km), repr(km2))
+        self.assertNotEqual(Cache.stage_key(km), Cache.stage_key(km2))
+        km_cache = Cache(km)
+        np.testing.assert_equal(km_cache.get_output(), km.get_output())
+        np.testing.assert_equal(Cache(km2).get_output(), km2.get_output())
+        self.assertEqual(km_cache.data.misses, len(self.files))
+
+        # refitting changes the key
+        key = Cache.stage_key(km)
+        km.estimate(src, init_strategy='uniform')
+        self.assertNotEqual(Cache.stage_key(km), key)
+        tica = chainsaw.tica(src, lag=1, dim=2)
+        key = Cache.stage_key(tica)
+        tica.estimate(chainsaw.source(self.files[:3]))
+        self.assertNotEqual(Cache.stage_key(tica), key)
+
+        # the output of stages, which have not been estimated yet, can not be identified
+        tica = chainsaw.tica(lag=1, dim=2)
+        tica.data_producer = src
+        with self.assertRaises(ValueError):
+            Cache.stage_key(tica)
+        self.assertFalse(tica._estimated)
+
+    def test_cache_stages(self):
+        src = chainsaw.source(self.files, chunk_size=0)
+        with settings(cache_stages=True):
+            tica = chainsaw.tica(src, lag=1, dim=2)
+            self.assertIsInstance(tica.data_producer, Cache)
+            self.assertEqual(tica.data_producer.data.misses, len(self.files))
+
+            # changing the lag time reuses the output of the reader
+            with mock.patch.object(src, '_create_iterator') as create_iterator:
+                tica2 = chainsaw.tica(src, lag=5, dim=2)
+                create_iterator.assert_not_called()
+            self.assertEqual(tica2.data_producer.data.misses, 0)
+
+            # changing k reuses the output of tica
+            km = chainsaw.cluster_kmeans(tica2, k=2, max_iter=2)
+            self.assertEqual(km.data_producer.data.misses, len(self.files))
+            km2 = chainsaw.cluster_kmeans(tica2, k=3, max_iter=2)
+            self.assertEqual(km2.data_producer.data.misses, 0)
+            np.testing.assert_allclose(km2.data_producer.get_output(), tica2.get_output(), rtol=1e-5)
+
     def test_cache_switch_cache_file(self):
         src = chainsaw.source(self.files, chunk_size=0)
         t = chainsaw.tica(src, dim=2)
@@ -1,4 +1,5 @@
 import unittest
+import mock
 import numpy as np
 
 from chainsaw.data import DataInMemory
@@ -63,6 +64,10 @@ class TestCoordinatesIterator(unittest.TestCase):
         r = DataInMemory(self.d)
         lagged_it = r.iterator(lag=5)
         assert lagged_it._it.skip == 0
+        assert lagged_it._lag == 5
+
+        lagged_it = r.iterator(lag=5, stride=2)
+        assert lagged_it._it.skip == 0
         assert lagged_it._it_lagged.skip == 5
 
         it = r.iterator()
@@ -72,6 +77,295 @@ class TestCoordinatesIterator(unittest.TestCase):
             if itraj == 1:
                 assert it.skip == 5
 
+    def _assert_lagged_iterators_equal(self, r, lags, chunks=(0, 1, 7, 30, 100), strides=(1, 2, 3), skips=(0, 4),
+                                       rtol=0, aligned=True):
+        # the single pass (buffered) lagged iterator returns the same chunks as one with two iterators.
+        from chainsaw.data._base.iterable import BufferedLaggedIterator, LaggedIterator
+        for stride in strides:
+            for lag in lags:
+                for chunk in chunks:
+                    for skip in skips:
+                        it = r.iterator(lag=lag, chunk=chunk, stride=stride, skip=skip)
+                        buffered = lag % stride == 0
+                        if buffered:
+                            self.assertIsInstance(it, BufferedLaggedIterator)
+                        else:
+                            # nothing to compare, it is a LaggedIterator itself.
+                            continue
+                        it_two_readers = LaggedIterator(
+                            r._create_iterator(skip=skip, chunk=chunk, stride=stride, return_trajindex=True),
+                            r._create_iterator(skip=skip + lag, chunk=chunk, stride=stride, return_trajindex=True),
+                            return_trajindex=True)
+                        with it:
+                            actual = list(it)
+                        with it_two_readers:
+                            desired = list(it_two_readers)
+                        msg = 'lag=%s, chunk=%s, stride=%s, skip=%s' % (lag, chunk, stride, skip)
+                        if aligned:
+                            self.assertEqual(len(actual), it._n_chunks, msg=msg)
+                            self.assertEqual(len(actual), len(desired), msg=msg)
+                            for (itraj, X, Y), (itraj_d, X_d, Y_d) in zip(actual, desired):
+                                self.assertEqual(itraj, itraj_d, msg=msg)
+                                np.testing.assert_allclose(X, X_d, rtol=rtol, err_msg=msg)
+                                np.testing.assert_allclose(Y, Y_d, rtol=rtol, err_msg=msg)
+                            continue
+                        # compare the concatenated chunks of every trajectory.
+                        self.assertEqual([c[0] for c in actual], sorted(c[0] for c in actual), msg=msg)
+                        self.assertEqual(set(c[0] for c in actual), set(c[0] for c in desired), msg=msg)
+                        for itraj in set(c[0] for c in desired):
+                            for k in (1, 2):
+                                np.testing.assert_allclose(np.concatenate([c[k] for c in actual if c[0] == itraj]),
+                                                           np.concatenate([c[k] for c in desired if c[0] == itraj]),
+                                                           rtol=rtol, err_msg=msg)
+
+    def test_lagged_iterator_single_pass(self):
+        r = DataInMemory(self.d)
+        self._assert_lagged_iterators_equal(r, lags=(1, 3, 6, 99, 100, 150))
+
+    def test_lagged_iterator_single_pass_numpy_files(self):
+        from chainsaw import source
+        with TemporaryDirectory() as td:
+            files = [os.path.join(td, '%i.npy' % i) for i in range(len(self.d))]
+            for f, x in zip(files, self.d):
+                np.save(f, x)
+            self._assert_lagged_iterators_equal(source(files), lags=(1, 6, 30, 99))
+
+    def test_lagged_iterator_single_pass_csv(self):
+        from chainsaw import source
+        from chainsaw.data import PyCSVReader
+        with TemporaryDirectory() as td:
+            files = [os.path.join(td, '%i.txt' % i) for i in range(len(self.d))]
+            for f, x in zip(files, self.d):
+                np.savetxt(f, x)
+            r = source(files)
+            self.assertIsInstance(r, PyCSVReader)
+            self._assert_lagged_iterators_equal(r, lags=(1, 6, 30), chunks=(0, 2, 7, 100))
+
+    def test_lagged_iterator_single_pass_fragmented(self):
+        from chainsaw import source
+        from chainsaw.data.fragmented_trajectory_reader import FragmentedTrajectoryReader
+        with TemporaryDirectory() as td:
+            files = [os.path.join(td, '%i.npy' % i) for i in range(len(self.d))]
+            for f, x in zip(files, self.d):
+                # float32, chunks collected from several fragments are converted to the output type.
+                np.save(f, x[:int(len(x) * 0.8)].astype(np.float32))
+            r = source([[files[0], files[1]], [files[2], files[0], files[1]]])
+            self.assertIsInstance(r, FragmentedTrajectoryReader)
+            # lags within the first fragment, the reference iterator can not skip over whole fragments.
+            self._assert_lagged_iterators_equal(r, lags=(1, 6, 30, 75), chunks=(0, 2, 7, 100))
+
+    def test_lagged_iterator_single_pass_feature_reader(self):
+        from chainsaw import source
+        from chainsaw.tests.util import get_bpti_test_data
+        xtcfiles, pdbfile = get_bpti_test_data()
+        r = source(xtcfiles, top=pdbfile)
+        r.featurizer.add_selection([0, 10, 20])
+        self._assert_lagged_iterators_equal(r, lags=(1, 3, 6, 33), chunks=(0, 2, 7, 100), strides=(1, ))
+        # with chunk=0, the reference iterator with skip=lag applies stride before skip (see patches.iterload).
+        # the strided chunks read by mdtraj can be larger than the chunk size, so only the data is compared.
+        self._assert_lagged_iterators_equal(r, lags=(6, 12, 33), chunks=(2, 7, 100), strides=(2, 3),
+                                            aligned=False)
+
+    def test_lagged_iterator_single_pass_transformer(self):
+        from chainsaw import tica
+        t = tica(DataInMemory(self.d), lag=1, dim=2)
+        self._assert_lagged_iterators_equal(t, lags=(1, 6, 99), chunks=(0, 2, 7, 100), rtol=1e-5)
+
+    def test_lagged_iterator_reads_once(self):
+        from chainsaw.data.data_in_memory import DataInMemoryIterator
+        r = DataInMemory(self.d)
+        calls = [0]
+        orig = DataInMemoryIterator._next_chunk
+
+        def counting_next_chunk(it):
+            X = orig(it)
+            calls[0] += len(X)
+            return X
+        try:
+            DataInMemoryIterator._next_chunk = counting_next_chunk
+            pairs = sum(len(X) for X, Y in r.iterator(lag=10, chunk=13, return_trajindex=False))
+        finally:
+            DataInMemoryIterator._next_chunk = orig
+        self.assertEqual(pairs, sum(len(x) - 10 for x in self.d))
+        self.assertEqual(calls[0], sum(len(x) for x in self.d))
+
+    def test_prefetch(self):
+        from chainsaw.data._base.iterable import PrefetchIterator
+        r = DataInMemory(self.d)
+        for chunk in (0, 7, 100):
+            it = r.iterator(chunk=chunk, prefetch=3)
+            self.assertIsInstance(it, PrefetchIterator)
+            self.assertEqual(it._n_chunks, r.iterator(chunk=chunk)._n_chunks)
+            expected = r.iterator(chunk=chunk)
+            with it:
+                for (itraj, X), (itraj_e, X_e) in zip(it, expected):
+                    self.assertEqual(itraj, itraj_e)
+                    self.assertEqual(it.current_trajindex, expected.current_trajindex)
+                    self.assertEqual(it.pos, expected.pos)
+                    self.assertEqual(it.last_chunk_in_traj, expected.last_chunk_in_traj)
+                    self.assertEqual(it.last_chunk, expected.last_chunk)
+                    np.testing.assert_equal(X, X_e)
+            self.assertRaises(StopIteration, next, it)
+
+    def test_prefetch_lagged(self):
+        r = DataInMemory(self.d)
+        for stride in (1, 2):
+            actual = list(r.iterator(lag=6, chunk=11, stride=stride, prefetch=2))
+            desired = list(r.iterator(lag=6, chunk=11, stride=stride, prefetch=0))
+            self.assertEqual(len(actual), len(desired))
+            for a, d in zip(actual, desired):
+                self.assertEqual(a[0], d[0])
+                np.testing.assert_equal(a[1], d[1])
+                np.testing.assert_equal(a[2], d[2])
+
+    def test_prefetch_reset(self):
+        r = DataInMemory(self.d)
+        it = r.iterator(chunk=10, prefetch=2, return_trajindex=False)
+        first = next(it)
+        it.reset()
+        np.testing.assert_equal(next(it), first)
+        it.close()
+
+    def test_prefetch_config(self):
+        from chainsaw.data._base.iterable import PrefetchIterator
+        from chainsaw.util.contexts import settings
+        r = DataInMemory(self.d)
+        with settings(iterator_prefetch=4):
+            it = r.iterator()
+            self.assertIsInstance(it, PrefetchIterator)
+            self.assertEqual(it._prefetch, 4)
+        self.assertNotIsInstance(r.iterator(prefetch=0), PrefetchIterator)
+
+    def test_prefetch_exception(self):
+        r = DataInMemory(self.d)
+
+        class Failure(Exception):
+            pass
+        it = r.iterator(chunk=10, prefetch=2)
+
+        def fail():
+            raise Failure()
+        it._it._next_chunk = fail
+        with self.assertRaises(Failure):
+            next(it)
+
+    @staticmethod
+    def _collect(it):
+        # trajectory index -> list of chunks (X, ) or (X, Y)
+        res = {}
+        with it:
+            for chunk in it:
+                res.setdefault(chunk[0], []).append(chunk[1:])
+        return res
+
+    def test_parallel(self):
+        d = [np.random.random((n, 3)) for n in (23, 100, 5, 57)]
+        r = DataInMemory(d)
+        for chunk in (0, 7, 50):
+            for stride in (1, 3):
+                for lag in (0, 3, 4):
+                    serial = self._collect(r.iterator(chunk=chunk, stride=stride, lag=lag))
+                    parallel = self._collect(r.iterator(chunk=chunk, stride=stride, lag=lag, n_jobs=3))
+                    self.assertEqual(sorted(serial.keys()), sorted(parallel.keys()))
+                    for itraj in serial:
+                        self.assertEqual(len(serial[itraj]), len(parallel[itraj]))
+                        for a, b in zip(serial[itraj], parallel[itraj]):
+                            for x, y in zip(a, b):
+                                np.testing.assert_equal(x, y)
+
+    def test_parallel_longest_first(self):
+        from chainsaw.data._base.iterable import ParallelIterator
+        d = [np.random.random((n, 3)) for n in (23, 100, 5, 57, 0)]
+        it = ParallelIterator(DataInMemory(d), n_jobs=2, chunk=10)
+        self.assertEqual(it._schedule(), [1, 3, 0, 2])
+        self.assertEqual(it._n_chunks, 3 + 10 + 1 + 6)
+        n = 0
+        pos = {}
+        with it:
+            for itraj, X in it:
+                self.assertEqual(it.pos, pos.get(itraj, 0))
+                pos[itraj] = it.pos + len(X)
+                n += 1
+                if n == it._n_chunks:
+                    assert it.last_chunk
+                else:
+                    assert not it.last_chunk
+        self.assertEqual(n, it._n_chunks)
+
+    def test_parallel_get_output(self):
+        from chainsaw import source
+        with TemporaryDirectory() as td:
+            fns = [os.path.join(td, '%i.npy' % i) for i in range(len(self.d))]
+            for x, fn in zip(self.d, fns):
+                np.save(fn, x)
+            reader = source(fns, chunk_size=17)
+            expected = reader.get_output(stride=2, skip=3)
+            actual = reader.get_output(stride=2, skip=3, n_jobs=2)
+            for a, e in zip(actual, expected):
+                np.testing.assert_equal(a, e)
+
+    def test_parallel_csv(self):
+        from chainsaw import source
+        with TemporaryDirectory() as td:
+            fns = [os.path.join(td, '%i.dat' % i) for i in range(len(self.d))]
+            for x, fn in zip(self.d, fns):
+                np.savetxt(fn, x)
+            reader = source(fns, chunk_size=30)
+            expected = reader.get_output()
+            actual = reader.get_output(n_jobs=3)
+            for a, e in zip(actual, expected):
+                np.testing.assert_allclose(a, e)
+
+    def test_parallel_exception(self):
+        r = DataInMemory(self.d)
+
+        def fail(*args, **kw):
+            raise ValueError('expected')
+        r._create_iterator = fail
+        with self.assertRaises(ValueError):
+            r.get_output(n_jobs=2)
+
+    def test_parallel_random_access_stride(self):
+        r = DataInMemory(self.d)
+        with self.assertRaises(ValueError):
+            r.iterator(stride=np.array([[0, 1], [1, 2]]), n_jobs=2)
+
+    def test_reuse_buffers(self):
+        from chainsaw import tica, pca, assign_to_centers
+        r = DataInMemory([x.astype(np.float32) for x in self.d], chunksize=30)
+        t = tica(r, lag=1, dim=2)
+        centers = np.random.random((5, 2)).astype(np.float32)
+        stages = (t, pca(t, dim=1), assign_to_centers(t, centers, return_dtrajs=False))
+        for stage in stages:
+            for prefetch in (0, 2):
+                expected = list(stage.iterator(prefetch=prefetch))
+                it = stage.iterator(prefetch=prefetch, reuse_buffers=True)
+                actual = [(itraj, X.copy()) for itraj, X in it]
+                self.assertEqual(len(actual), len(expected))
+                for (i1, X1), (i2, X2) in zip(actual, expected):
+                    self.assertEqual(i1, i2)
+                    np.testing.assert_allclose(X1, X2, rtol=1e-6)
+
+        # consecutive chunks share their memory
+        it = t.iterator(reuse_buffers=True, return_trajindex=False)
+        first = next(it)
+        second = next(it)
+        assert np.shares_memory(first, second)
+
+    def test_reuse_buffers_lagged(self):
+        r = DataInMemory(self.d)
+        from chainsaw import tica
+        t = tica(r, lag=1, dim=2)
+        for lag, stride in ((2, 1), (3, 2)):
+            expected = list(t.iterator(lag=lag, stride=stride, chunk=7))
+            actual = [(i, X.copy(), Y.copy()) for i, X, Y in
+                      t.iterator(lag=lag, stride=stride, chunk=7, reuse_buffers=True)]
+            self.assertEqual(len(actual), len(expected))
+            for a, e in zip(actual, expected):
+                self.assertEqual(a[0], e[0])
+                np.testing.assert_allclose(a[1], e[1])
+                np.testing.assert_allclose(a[2], e[2])
+
     def test_chunksize(self):
         r = DataInMemory(self.d)
         cs = np.arange(1, 17)
@@ -87,6 +381,38 @@ class TestCoordinatesIterator(unittest.TestCase):
             it.chunksize = cs[i]
             assert it.chunksize == cs[i]
 
+    def test_chunksize_auto(self):
+        r = DataInMemory(self.d)
+        bytes_per_frame = 3 * np.dtype(r.output_type()).itemsize
+        r.chunk_bytes = 10 * bytes_per_frame
+        self.assertEqual(r.chunksize, 10)
+        it = r.iterator()
+        self.assertEqual(it.chunksize, 10)
+        self.assertEqual(r.iterator(chunk='auto').chunksize, 10)
+
+        # a chain uses the frame count of its largest stage.
+        from chainsaw import tica
+        t = tica(r, lag=1, dim=1)
+        self.assertEqual(t.chunksize, 10)
+        t.chunk_bytes = 50 * bytes_per_frame
+        self.assertEqual(r.chunk_bytes, 50 * bytes_per_frame)
+        self.assertEqual(t.chunksize, 50)
+
+        r.chunksize = 7
+        self.assertEqual(t.chunksize, 7)
+        with self.assertRaises(ValueError):
+            r.chunksize = 'foo'
+
+    def test_chunksize_auto_memory_budget(self):
+        from chainsaw.util.contexts import settings
+        r = DataInMemory(self.d, chunksize='auto')
+        with settings(memory_budget=1):
+            self.assertEqual(r.chunksize, 1024**2 // (3 * np.dtype(r.output_type()).itemsize))
+        with settings(memory_budget=0):
+            self.assertEqual(r.chunksize, r._DEFAULT_CHUNK_BYTES // (3 * np.dtype(r.output_type()).itemsize))
+        for actual, desired in zip(r.get_output(chunk='auto'), self.d):
+            np.testing.assert_allclose(actual, desired, rtol=1e-6)
+
     def test_last_chunk(self):
         r = DataInMemory(self.d)
         it = r.iterator(chunk=0)
@@ -139,6 +465,60 @@ class TestCoordinatesIterator(unittest.TestCase):
             if it.last_chunk_in_traj:
                 t = 0
 
+    def test_get_output_out(self):
+        from chainsaw import source
+        d = [np.random.random((n, 3)) for n in (13, 7, 42)]
+        r = DataInMemory(d, chunksize=5)
+        with TemporaryDirectory() as td:
+            for out in (os.path.join(td, 'npy'), os.path.join(td, 'out.h5')):
+                res = r.get_output(dimensions=[0, 2], stride=2, out=out)
+                self.assertEqual(len(res), len(d))
+                for a, e in zip(res, d):
+                    np.testing.assert_allclose(a[:], e[::2, [0, 2]], rtol=1e-6)
+                if not out.endswith('.h5'):
+                    self.assertEqual(sorted(os.listdir(out)), ['traj_0.npy', 'traj_1.npy', 'traj_2.npy'])
+                    assert all(isinstance(a, np.memmap) for a in res)
+                    # feed the result back
+                    for a, e in zip(source(res).get_output(), d):
+                        np.testing.assert_allclose(a, e[::2, [0, 2]], rtol=1e-6)
+                # write again to the same target, the previous output is still referenced.
+                res2 = r.get_output(out=out)
+                for a, e in zip(res2, d):
+                    np.testing.assert_allclose(a[:], e, rtol=1e-6)
+                if out.endswith('.h5'):
+                    self.assertFalse(res[0].id.valid)
+                    res2.close()
+                del res, res2
+
+            # less trajectories do not leave the datasets of the previous output behind, other datasets are kept.
+            import h5py
+            out = os.path.join(td, 'out.h5')
+            with h5py.File(out, mode='a') as f:
+                f.create_dataset('foreign', data=np.arange(3))
+            with DataInMemory(d[:2]).get_output(out=out) as res:
+                self.assertEqual(sorted(res[0].file.keys()), ['foreign', 'traj_0', 'traj_1'])
+            # feed the result back
+            for a, e in zip(source(out, selection='/traj_*').get_output(), d[:2]):
+                np.testing.assert_allclose(a, e, rtol=1e-6)
+
+            # datasets, which have not been written by get_output, are not overwritten.
+            with h5py.File(out, mode='a') as f:
+                f.create_dataset('traj_2', data=np.arange(3))
+            with self.assertRaises(ValueError):
+                r.get_output(out=out)
+            with h5py.File(out, mode='r') as f:
+                np.testing.assert_equal(f['traj_2'][:], np.arange(3))
+                np.testing.assert_allclose(f['traj_0'][:], d[0], rtol=1e-6)
+
+    def test_get_output_out_memory_error(self):
+        import h5py
+        r = DataInMemory([np.random.random((10, 3))])
+        n_open = len(h5py.h5f.get_obj_ids(types=h5py.h5f.OBJ_FILE))
+        with TemporaryDirectory() as td, \
+                mock.patch.object(h5py.Group, 'create_dataset', side_effect=MemoryError):
+            self.assertIsNone(r.get_output(out=os.path.join(td, 'out.h5')))
+            self.assertEqual(len(h5py.h5f.get_obj_ids(types=h5py.h5f.OBJ_FILE)), n_open)
+
     def test_write_to_csv_propagate_filenames(self):
         from chainsaw import source, tica
         with TemporaryDirectory() as td:
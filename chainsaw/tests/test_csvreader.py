@@ -27,6 +27,8 @@ import unittest
 import tempfile
 import os
 
+import mock
+
 from chainsaw.data.py_csv_reader import PyCSVReader as CSVReader
 import shutil
 
@@ -258,6 +260,15 @@ class TestCSVReader(unittest.TestCase):
             for x in it:
                 np.testing.assert_equal(x, self.data[:, cols])
 
+    def test_get_output_dimensions(self):
+        reader = CSVReader([self.filename1, self.file_with_header])
+        for dims in ([1, 3], [0], slice(0, 4, 2), 2):
+            expected = self.data[:, dims].reshape(self.nt, -1)
+            for kw in (dict(), dict(stride=3), dict(n_jobs=2)):
+                out = reader.get_output(dimensions=dims, **kw)
+                for x in out:
+                    np.testing.assert_equal(x, expected[::kw.get('stride', 1)])
+
     def test_newline_at_eof(self):
         x = "1 2 3\n4 5 6\n\n"
         desired = np.fromstring(x, sep=" ", dtype=np.float32).reshape(-1, 3)
@@ -307,6 +318,91 @@ class TestCSVReader(unittest.TestCase):
         data2 = [chunk for chunk in it]
         np.testing.assert_equal(data, data2)
 
+    def test_block_parsing(self):
+        from chainsaw.data.py_csv_reader import PyCSVIterator
+        reader = CSVReader((self.filename1, self.file_with_header))
+        # blocks smaller than a chunk and the fallback parsing row by row give the same results
+        old_block_size = PyCSVIterator._BLOCK_SIZE
+        PyCSVIterator._BLOCK_SIZE = 100
+        try:
+            for kw in (dict(chunk=0), dict(chunk=7), dict(chunk=7, stride=3, skip=2),
+                       dict(chunk=11, stride=np.array([[0, 1], [0, 1], [0, 5], [1, 2], [1, 299]]))):
+                PyCSVIterator.block_parsing = True
+                blocks = [x for x in reader.iterator(return_trajindex=False, **kw)]
+                PyCSVIterator.block_parsing = False
+                rows = [x for x in reader.iterator(return_trajindex=False, **kw)]
+                self.assertEqual(len(blocks), len(rows))
+                for x, y in zip(blocks, rows):
+                    np.testing.assert_equal(x, y)
+        finally:
+            PyCSVIterator.block_parsing = True
+            PyCSVIterator._BLOCK_SIZE = old_block_size
+        np.testing.assert_equal(reader.get_output(stride=3, skip=2)[1], self.data[2::3])
+
+    def test_random_access(self):
+        reader = CSVReader((self.filename1, self.file_with_header))
+        self.assertTrue(reader.is_random_accessible)
+        np.testing.assert_equal(reader.ra_itraj_cuboid[:, [0, 5, 299, 17]], self.data[[0, 5, 299, 17]][np.newaxis].repeat(2, 0))
+        np.testing.assert_equal(reader.ra_itraj_jagged[1, 10:20:3][0], self.data[10:20:3])
+        np.testing.assert_equal(reader.ra_linear[[0, 299, 300, 599]], self.data[[0, 299, 0, 299]])
+
+        stride = np.array([[0, 0], [0, 2], [1, 3], [1, 3], [1, 299]])
+        out = np.vstack([x for x in reader.iterator(stride=stride, chunk=2, return_trajindex=False)])
+        np.testing.assert_equal(out, self.data[[0, 2, 3, 3, 299]])
+
+        # lines are separated by empty lines
+        x = "1 2\n\n3 4\n\n\n5 6\r\n7 8\n\n"
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.dat', delete=False) as f:
+            f.write(x)
+        reader = CSVReader(f.name)
+        self.assertEqual(reader.trajectory_length(0), 4)
+        np.testing.assert_equal(reader.ra_itraj_jagged[0, [1, 2, 3]][0], [[3, 4], [5, 6], [7, 8]])
+        np.testing.assert_equal(reader.get_output(stride=2)[0], [[1, 2], [5, 6]])
+
+    def test_skip_empty_lines(self):
+        # skip counts frames, not the empty lines between them
+        x = "1 1\n\n2 2\n\n3 3\n\n4 4\n5 5\n"
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.dat', delete=False) as f:
+            f.write(x)
+        reader = CSVReader(f.name, delimiters=' ')
+        data = np.arange(1, 6).repeat(2).reshape(-1, 2)
+        for skip in range(6):
+            for chunk in (0, 1, 2):
+                out = [X for X in reader.iterator(skip=skip, chunk=chunk, return_trajindex=False)]
+                np.testing.assert_equal(np.vstack(out) if out else np.empty((0, 2)), data[skip:])
+            np.testing.assert_equal(reader.get_output(skip=skip)[0], data[skip:])
+        np.testing.assert_equal(reader.get_output(skip=1, stride=2)[0], data[1::2])
+
+    def test_strided_reads_seek(self):
+        # a large stride reads only the wanted lines instead of the whole file.
+        read = []
+
+        def counting_open(*args, **kw):
+            fh = open(*args, **kw)
+            fh_read = fh.read
+            fh.read = lambda n=-1: read.append(n) or fh_read(n)
+            return fh
+
+        reader = CSVReader(self.file_with_header)
+        with mock.patch('chainsaw.data.py_csv_reader.open', create=True, side_effect=counting_open):
+            out = reader.get_output(stride=100)[0]
+        np.testing.assert_equal(out, self.data[::100])
+        self.assertEqual(len(read), 3)
+        self.assertLess(sum(read), os.path.getsize(self.file_with_header) / 10)
+
+    def test_quoted_and_invalid_entries(self):
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.csv', delete=False) as f:
+            f.write('1,2,3\n"4",5,6\n7,8,9\n')
+        reader = CSVReader(f.name, delimiters=',')
+        np.testing.assert_equal(reader.get_output()[0], np.arange(1, 10).reshape(3, 3))
+
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.csv', delete=False) as f:
+            f.write('1,2,3\n4,x,6\n7,8,9\n')
+        reader = CSVReader(f.name, delimiters=',')
+        with self.assertRaises(ValueError) as cm:
+            reader.get_output()
+        self.assertIn('line 1', cm.exception.args[0])
+
 
 if __name__ == '__main__':
     unittest.main()
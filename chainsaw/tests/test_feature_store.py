@@ -0,0 +1,158 @@
+from __future__ import absolute_import
+
+import errno
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+import numpy as np
+
+import chainsaw
+from chainsaw.data.feature_store import FeatureStoreReader, FeatureStoreWriter
+
+
+class TestFeatureStore(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.data = [np.random.random((L, 5)) for L in (1000, 333, 7)]
+        cls.dir = tempfile.mkdtemp(prefix='featurestore')
+        cls.path = os.path.join(cls.dir, 'store')
+        cls.store = chainsaw.source(cls.data).write_store(cls.path, block_size=64, chunksize=50)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.dir, ignore_errors=True)
+
+    def test_roundtrip(self):
+        self.assertEqual(self.store.trajectory_lengths().tolist(), [1000, 333, 7])
+        self.assertEqual(self.store.dimension(), 5)
+        for kw in (dict(), dict(chunk=0), dict(chunk=10), dict(chunk=100, stride=3, skip=5),
+                   dict(chunk=7, stride=100), dict(dimensions=[4, 1]),
+                   dict(dimensions=[0], chunk=30), dict(dimensions=slice(0, 5, 2), stride=2)):
+            out = self.store.get_output(**kw)
+            start, stride, dims = kw.get('skip', 0), kw.get('stride', 1), kw.get('dimensions', slice(None))
+            for x, y in zip(out, self.data):
+                np.testing.assert_equal(x, y[start::stride][:, dims])
+                self.assertEqual(x.dtype, np.float64)
+
+        for itraj, X, Y in self.store.iterator(lag=10, chunk=40):
+            self.assertEqual(len(X), len(Y))
+
+    def test_empty_trajectory(self):
+        store = chainsaw.source([self.data[2], np.empty((0, 5))]).write_store(os.path.join(self.dir, 'store_empty'))
+        self.assertEqual(store.trajectory_lengths().tolist(), [7, 0])
+        out = store.get_output()
+        np.testing.assert_equal(out[0], self.data[2])
+        self.assertEqual(out[1].shape, (0, 5))
+        self.assertEqual(store.block_ranges(1)[0].shape, (0, 5))
+
+    def test_source(self):
+        reader = chainsaw.source(self.path)
+        self.assertIsInstance(reader, FeatureStoreReader)
+        np.testing.assert_equal(reader.get_output()[1], self.data[1])
+
+    def test_compressions(self):
+        X = np.arange(3000, dtype=np.float32).reshape(-1, 3)
+        sizes = {}
+        for compression in (None, 'zlib', 'bz2', 'lzma'):
+            path = os.path.join(self.dir, 'store_%s' % compression)
+            store = chainsaw.source(X).write_store(path, compression=compression)
+            np.testing.assert_equal(store.get_output()[0], X)
+            self.assertEqual(store.output_type(), np.float32)
+            sizes[compression] = os.path.getsize(store.filenames[0])
+        self.assertEqual(sizes[None], X.nbytes)
+        self.assertLess(sizes['zlib'], X.nbytes / 2)
+
+        store = chainsaw.source(X).write_store(os.path.join(self.dir, 'store_shuffle'), shuffle=True)
+        np.testing.assert_equal(store.get_output(dimensions=[2, 1])[0], X[:, [2, 1]])
+        self.assertLess(os.path.getsize(store.filenames[0]), sizes['zlib'])
+        with self.assertRaises(ValueError):
+            chainsaw.source(X).write_store(os.path.join(self.dir, 'store_x'), compression='snappy')
+
+    def test_statistics(self):
+        mins, maxs = self.store.block_ranges(0)
+        self.assertEqual(mins.shape, (16, 5))
+        np.testing.assert_equal(mins[3], self.data[0][192:256].min(axis=0))
+        np.testing.assert_equal(maxs[-1], self.data[0][960:].max(axis=0))
+        mins, maxs = self.store.column_ranges()
+        np.testing.assert_equal(mins, np.concatenate(self.data).min(axis=0))
+        np.testing.assert_equal(maxs, np.concatenate(self.data).max(axis=0))
+
+    def test_random_access(self):
+        self.assertTrue(self.store.is_random_accessible)
+        np.testing.assert_equal(self.store.ra_itraj_jagged[0, [3, 500, 999]][0], self.data[0][[3, 500, 999]])
+        np.testing.assert_equal(self.store.ra_itraj_cuboid[:3, [0, 6], [4, 2]],
+                                [x[[0, 6]][:, [4, 2]] for x in self.data[:3]])
+        np.testing.assert_equal(self.store.ra_linear[[0, 1000, 1333]], [self.data[0][0], self.data[1][0],
+                                                                        self.data[2][0]])
+        np.testing.assert_equal(self.store.ra_itraj_linear[[0, 1], [999, 1000]], [self.data[0][999],
+                                                                                  self.data[1][0]])
+        stride = np.array([[0, 1], [0, 1], [0, 900], [2, 6]])
+        X = np.vstack([x for x in self.store.iterator(stride=stride, chunk=2, return_trajindex=False)])
+        np.testing.assert_equal(X, np.vstack((self.data[0][[1, 1, 900]], self.data[2][[6]])))
+
+    def test_only_touched_blocks_and_columns_are_decompressed(self):
+        from chainsaw.data import feature_store
+        with mock.patch.object(feature_store, '_decompress', side_effect=feature_store._decompress) as decompress:
+            X = next(iter(self.store.iterator(stride=np.array([[0, 100], [0, 130], [0, 900]]),
+                                              cols=[3], return_trajindex=False)))
+        np.testing.assert_equal(X, self.data[0][[100, 130, 900]][:, [3]])
+        # blocks 1, 2 and 14, column 3 only
+        self.assertEqual(decompress.call_count, 3)
+
+        # chunks smaller than a block decompress every block once.
+        with mock.patch.object(feature_store, '_decompress', side_effect=feature_store._decompress) as decompress:
+            self.store.get_output(chunk=10, dimensions=[0, 1])
+        self.assertEqual(decompress.call_count, 2 * (16 + 6 + 1))
+
+    def test_overwrite(self):
+        path = os.path.join(self.dir, 'store_overwrite')
+        chainsaw.source(self.data[2]).write_store(path)
+        with self.assertRaises(OSError) as cm:
+            chainsaw.source(self.data[1]).write_store(path)
+        self.assertEqual(cm.exception.errno, errno.EEXIST)
+        store = chainsaw.source(self.data[1]).write_store(path, overwrite=True)
+        np.testing.assert_equal(store.get_output()[0], self.data[1])
+
+        # other files and directories within a store are kept
+        with open(os.path.join(path, 'notes.txt'), 'w'):
+            pass
+        os.mkdir(os.path.join(path, 'plots'))
+        store = chainsaw.source(self.data[2]).write_store(path, overwrite=True)
+        np.testing.assert_equal(store.get_output()[0], self.data[2])
+        self.assertEqual(sorted(os.listdir(path)),
+                         ['index.json', 'notes.txt', 'plots', 'traj_0.blocks', 'traj_0.index.npz'])
+
+        # directories with other files are not touched
+        with open(os.path.join(self.dir, 'other'), 'w'):
+            pass
+        with self.assertRaises(ValueError):
+            chainsaw.source(self.data[1]).write_store(self.dir, overwrite=True)
+        self.assertTrue(os.path.exists(os.path.join(self.dir, 'other')))
+        # neither are files
+        with self.assertRaises(ValueError):
+            chainsaw.source(self.data[1]).write_store(os.path.join(self.dir, 'other'), overwrite=True)
+        # block sizes of any integer type
+        store = chainsaw.source(self.data[2]).write_store(path, overwrite=True, block_size=np.int64(3))
+        self.assertEqual(store.block_ranges(0)[0].shape, (3, 5))
+
+    def test_incomplete_store(self):
+        path = os.path.join(self.dir, 'store_incomplete')
+        writer = FeatureStoreWriter(path, 1, 5)
+        writer.write(0, self.data[0])
+        self.assertFalse(FeatureStoreReader.is_store(path))
+        with self.assertRaises(ValueError):
+            FeatureStoreReader(path)
+        writer.close()
+        with open(os.path.join(path, 'index.json')) as fh:
+            index = json.load(fh)
+        self.assertEqual(index['trajectories'], [{'name': 'traj_0', 'length': 1000}])
+        np.testing.assert_equal(FeatureStoreReader(path).get_output()[0], self.data[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -28,6 +28,7 @@ import unittest
 from logging import getLogger
 
 import mdtraj
+import mock
 import numpy as np
 import pkg_resources
 from chainsaw import api
@@ -175,6 +176,19 @@ class TestFeatureReader(unittest.TestCase):
             for x in it:
                 np.testing.assert_equal(x, ref)
 
+    def test_get_output_dimensions(self):
+        trajs = pkg_resources.resource_filename('chainsaw.tests', 'data/bpti_mini.xtc')
+        top = pkg_resources.resource_filename('chainsaw.tests', 'data/bpti_ca.pdb')
+        reader = api.source(trajs, top=top)
+        inds = reader.featurizer.pairs(reader.featurizer.select('name CA'))
+        reader.featurizer.add_distances(inds)
+        ref = mdtraj.compute_distances(mdtraj.load(trajs, top=top), inds)
+        for dims in ([1, 3], [0], slice(0, 6, 2), 2):
+            expected = ref[:, dims].reshape(len(ref), -1)
+            for kw in (dict(), dict(stride=3, chunk=7)):
+                np.testing.assert_allclose(reader.get_output(dimensions=dims, **kw)[0],
+                                           expected[::kw.get('stride', 1)], rtol=1e-5)
+
     def test_with_pipeline_time_lagged(self):
         reader = api.source(self.trajfile, top=self.topfile)
         assert isinstance(reader, FeatureReader)
@@ -261,5 +275,23 @@ class TestFeatureReader(unittest.TestCase):
         self.assertNotIn(0, res)
         self.assertIn(1, res)
 
+    def test_read_required_atoms_only(self):
+        reader = source([self.trajfile, self.trajfile2], top=self.topfile)
+        reader.featurizer.add_selection([2, 0])
+        expected = [xyz[:, [2, 0], :].reshape(-1, 6) for xyz in (self.xyz, self.xyz2)]
+        with reader.iterator() as it:
+            np.testing.assert_equal(it._atom_indices, [0, 2])
+            self.assertEqual(next(it._mditer).n_atoms, 2)
+
+        for chunk in (0, 100):
+            np.testing.assert_almost_equal(reader.get_output(chunk=chunk), expected, decimal=5)
+        ra_indices = np.array([[0, 1], [0, 3], [1, 2], [1, 500]])
+        subset = mdtraj.Topology.subset
+        with mock.patch.object(mdtraj.Topology, 'subset', autospec=True, side_effect=subset) as subset_mock:
+            np.testing.assert_almost_equal(reader.get_output(stride=ra_indices, chunk=1),
+                                           [expected[0][[1, 3]], expected[1][[2, 500]]], decimal=5)
+        # the subset topology is only created once per trajectory, not for every chunk.
+        self.assertEqual(subset_mock.call_count, 2)
+
 if __name__ == "__main__":
     unittest.main()
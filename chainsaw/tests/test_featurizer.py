@@ -439,6 +439,64 @@ class TestFeaturizer(unittest.TestCase):
         # TODO: test me
         pass
 
+    def test_transform_cols(self):
+        self.feat.add_distances_ca()
+        self.feat.add_selection([0, 3, 5])
+        self.feat.add_angles([[0, 1, 2], [3, 4, 5]])
+        self.feat.add_dihedrals([[0, 1, 2, 3], [3, 4, 5, 6]], cossin=True)
+        calls = []
+
+        def count_calls(traj):
+            calls.append(1)
+            return traj.xyz[:, 0, :]
+        self.feat.add_custom_feature(CustomFeature(count_calls, dim=3))
+        full = self.feat.transform(self.traj)
+        n = self.feat.dimension()
+        calls[:] = []
+
+        for cols in ([0, 5, n - 5], [n - 4, 3, n - 13, n - 7, n - 10], np.arange(n - 13, n - 3),
+                     [n - 6, n - 6, 1], slice(2, 10)):
+            Y = self.feat.transform(self.traj, cols=cols)
+            np.testing.assert_allclose(Y, full[:, cols], rtol=1e-5)
+            out = np.empty_like(Y)
+            self.feat.transform(self.traj, out=out, cols=cols)
+            np.testing.assert_equal(out, Y)
+        # the custom feature has not been requested, so it is never evaluated.
+        self.assertEqual(len(calls), 0)
+        np.testing.assert_equal(self.feat.transform(self.traj, cols=[n - 2]), full[:, [n - 2]])
+        self.assertEqual(len(calls), 1)
+
+    def test_required_atoms(self):
+        self.assertIsNone(self.feat.required_atoms())
+        self.feat.add_distances([[0, 10], [20, 30]])
+        self.feat.add_selection([5, 3])
+        self.feat.add_dihedrals([[0, 1, 2, 3]], cossin=True)
+        self.feat.add_minrmsd_to_ref(self.traj[self.ref_frame], atom_indices=[1, 2, 7])
+        atoms = self.feat.required_atoms()
+        np.testing.assert_equal(atoms, [0, 1, 2, 3, 5, 7, 10, 20, 30])
+
+        expected = self.feat.transform(self.traj)
+        Y = self.feat.transform(self.traj.atom_slice(atoms))
+        np.testing.assert_allclose(Y, expected, rtol=1e-5, atol=1e-6)
+
+        # replacing the active features by new ones on another subset of the same size invalidates the
+        # remapped features.
+        active = self.feat.active_features
+        self.feat.active_features = []
+        del active
+        self.feat.add_distances([[1, 11], [21, 31]])
+        self.feat.add_selection([6, 4])
+        self.feat.add_dihedrals([[1, 2, 3, 4]], cossin=True)
+        self.feat.add_minrmsd_to_ref(self.traj[self.ref_frame], atom_indices=[2, 3, 8])
+        atoms = self.feat.required_atoms()
+        np.testing.assert_equal(atoms, [1, 2, 3, 4, 6, 8, 11, 21, 31])
+        Y = self.feat.transform(self.traj.atom_slice(atoms))
+        np.testing.assert_allclose(Y, self.feat.transform(self.traj), rtol=1e-5, atol=1e-6)
+
+        # custom features need all atoms
+        self.feat.add_custom_func(lambda traj: traj.xyz[:, 0, :], dim=3)
+        self.assertIsNone(self.feat.required_atoms())
+
     def test_MinRmsd(self):
         # Test the Trajectory-input variant
         self.feat.add_minrmsd_to_ref(self.traj[self.ref_frame])
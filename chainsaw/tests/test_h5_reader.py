@@ -0,0 +1,122 @@
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import h5py
+import mock
+import numpy as np
+
+import chainsaw
+from chainsaw.data.cache import Cache
+from chainsaw.data.h5_reader import H5FileReader, H5FileIterator
+
+
+class TestH5FileReader(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.dir = tempfile.mkdtemp(prefix='h5reader')
+        cls.f1 = os.path.join(cls.dir, 'features1.h5')
+        cls.f2 = os.path.join(cls.dir, 'features2.hdf5')
+        cls.data = {'/run_0': np.random.random((1000, 3)),
+                    '/run_1': np.random.random((357, 3)),
+                    '/group/run_2': np.random.random((123, 3)),
+                    '/other': np.random.random((10, 2))}
+        with h5py.File(cls.f1, mode='w') as f:
+            f.create_dataset('run_0', data=cls.data['/run_0'], chunks=(64, 3), compression='gzip')
+            f.create_dataset('run_1', data=cls.data['/run_1'])
+            f.create_dataset('group/run_2', data=cls.data['/group/run_2'], chunks=(10, 3))
+            f.create_dataset('other', data=cls.data['/other'])
+        cls.data2 = np.random.random((50, 3, 1))
+        with h5py.File(cls.f2, mode='w') as f:
+            f.create_dataset('run_0', data=cls.data2, chunks=(7, 3, 1))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.dir, ignore_errors=True)
+
+    def test_selection(self):
+        reader = H5FileReader(self.f1, selection='/run_*')
+        self.assertEqual(reader.number_of_trajectories(), 2)
+        self.assertEqual(reader.trajectory_lengths().tolist(), [1000, 357])
+        self.assertEqual(reader.dimension(), 3)
+        self.assertEqual(reader.filenames, [self.f1, self.f1])
+
+        reader = H5FileReader([self.f1, self.f2], selection='/**run_?')
+        self.assertEqual(reader.number_of_trajectories(), 4)
+        out = reader.get_output()
+        desired = [self.data['/group/run_2'], self.data['/run_0'], self.data['/run_1'], self.data2[:, :, 0]]
+        for x, y in zip(out, desired):
+            np.testing.assert_allclose(x, y)
+
+        with self.assertRaises(ValueError) as cm:
+            H5FileReader(self.f1)
+        self.assertIn('different dimensions', cm.exception.args[0])
+        with self.assertRaises(ValueError):
+            H5FileReader(self.f1, selection='/nothing')
+
+    def test_chunked_reads(self):
+        reader = H5FileReader(self.f1, selection='/run_*')
+        for kw in (dict(chunk=0), dict(chunk=100), dict(chunk=30, stride=3, skip=5), dict(chunk=7, stride=100),
+                   dict(dimensions=[2, 0]), dict(dimensions=[1], chunk=30), dict(dimensions=slice(0, 3, 2))):
+            out = reader.get_output(**kw)
+            start, stride, dims = kw.get('skip', 0), kw.get('stride', 1), kw.get('dimensions', slice(None))
+            np.testing.assert_allclose(out[0], self.data['/run_0'][start::stride][:, dims])
+            np.testing.assert_allclose(out[1], self.data['/run_1'][start::stride][:, dims])
+
+        for lag in (1, 10):
+            for itraj, X, Y in reader.iterator(lag=lag, chunk=40, stride=3):
+                self.assertEqual(len(X), len(Y))
+
+    def test_whole_hdf5_chunks_read_once(self):
+        # chunks of 100 rows do not align with HDF5 chunks of 64 rows, still every row is read only once.
+        reader = H5FileReader(self.f1, selection='/run_0')
+        rows = []
+        flat = H5FileIterator._flat
+
+        def read(it, X):
+            rows.append(len(X))
+            return flat(it, X)
+
+        with mock.patch.object(H5FileIterator, '_flat', autospec=True, side_effect=read):
+            out = reader.get_output(chunk=100)[0]
+        np.testing.assert_allclose(out, self.data['/run_0'])
+        self.assertEqual(sum(rows), 1000)
+
+    def test_random_access(self):
+        reader = H5FileReader([self.f1, self.f2], selection='/**run_?')
+        self.assertTrue(reader.is_random_accessible)
+        np.testing.assert_allclose(reader.ra_itraj_jagged[1, [0, 5, 999]][0], self.data['/run_0'][[0, 5, 999]])
+        desired = [self.data['/group/run_2'][3], self.data['/run_0'][3], self.data['/run_1'][3], self.data2[3, :, 0]]
+        np.testing.assert_allclose(reader.ra_itraj_cuboid[:, [3]][:, 0], desired)
+        stride = np.array([[1, 2], [1, 2], [1, 900], [3, 0]])
+        X = np.vstack([x for x in reader.iterator(stride=stride, chunk=2, return_trajindex=False)])
+        np.testing.assert_allclose(X, np.vstack((self.data['/run_0'][[2, 2, 900]], self.data2[[0], :, 0])))
+
+    def test_source(self):
+        reader = chainsaw.source(self.f2)
+        self.assertIsInstance(reader, H5FileReader)
+        reader = chainsaw.source(self.f1, selection='/run_*')
+        self.assertIsInstance(reader, H5FileReader)
+        self.assertEqual(reader.number_of_trajectories(), 2)
+
+    def test_cache_datasets_of_same_file(self):
+        old_cache_dir = chainsaw.config.cache_dir
+        chainsaw.config.cache_dir = tempfile.mkdtemp(dir=self.dir)
+        try:
+            reader = H5FileReader(self.f1, selection='/run_*')
+            cache = Cache(reader)
+            out = cache.get_output()
+            np.testing.assert_allclose(out[0], self.data['/run_0'])
+            np.testing.assert_allclose(out[1], self.data['/run_1'])
+            # the datasets of the same file are stored separately
+            self.assertEqual(len(cache.data.datasets()), 2)
+        finally:
+            chainsaw.config.cache_dir = old_cache_dir
+
+
+if __name__ == '__main__':
+    unittest.main()
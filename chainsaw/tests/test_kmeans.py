@@ -178,5 +178,15 @@ class TestKmeans(unittest.TestCase):
     def test_skip(self):
         cluster_kmeans(np.random.rand(100, 3), skip=42)
 
+    def test_memory_budget(self):
+        from chainsaw.util.contexts import settings
+        data = np.random.rand(100000, 5)  # ~2MB as float32
+        from chainsaw.clustering.kmeans import KmeansClustering
+        with settings(memory_budget=1):
+            with self.assertRaises(MemoryError):
+                KmeansClustering(2, max_iter=1, oom_strategy='raise').estimate(data)
+            kmeans = KmeansClustering(2, max_iter=1, oom_strategy='memmap').estimate(data)
+            self.assertEqual(len(kmeans.clustercenters), 2)
+
 if __name__ == "__main__":
     unittest.main()
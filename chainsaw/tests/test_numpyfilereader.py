@@ -29,6 +29,8 @@ import shutil
 import tempfile
 import unittest
 
+import mock
+
 from chainsaw.data.numpy_filereader import NumPyFileReader
 from logging import getLogger
 
@@ -198,6 +200,78 @@ class TestNumPyFileReader(unittest.TestCase):
             for x in it:
                 np.testing.assert_equal(x, self.d2[:, cols])
 
+    def test_get_output_dimensions(self):
+        reader = NumPyFileReader(self.f4)
+        for dims in ([1, 2], [0], slice(0, 3, 2), 2):
+            expected = self.d2[:, dims].reshape(len(self.d2), -1)
+            for kw in (dict(), dict(stride=3), dict(n_jobs=2)):
+                np.testing.assert_equal(reader.get_output(dimensions=dims, **kw)[0], expected[::kw.get('stride', 1)])
+
+    def test_file_pool(self):
+        reader = NumPyFileReader(self.files2d)
+        with mock.patch.object(reader, '_load_file', side_effect=reader._load_file) as load:
+            for _ in range(3):
+                lagged = {0: [], 1: []}
+                for itraj, X, Y in reader.iterator(lag=5, chunk=7):
+                    lagged[itraj].append(Y)
+                out = reader.get_output()
+            # every file has been loaded once by all passes and (time-lagged) iterators.
+            self.assertLessEqual(load.call_count, len(self.files2d))
+        np.testing.assert_equal(out[0], self.d)
+        np.testing.assert_equal(out[1], self.d2)
+        np.testing.assert_equal(np.vstack(lagged[1]), self.d2[5:])
+
+        # loaded arrays are shared read-only
+        reader = NumPyFileReader(self.files2d, mmap_mode=None)
+        it = reader._create_iterator(chunk=7)
+        X = next(it)
+        self.assertFalse(X.flags.writeable)
+        self.assertIs(it._array, reader._get_array(0))
+        self.assertNotIsInstance(it._array, np.memmap)
+        it.close()
+        np.testing.assert_equal(reader.get_output()[1], self.d2)
+
+        # copy-on-write arrays are neither shared nor kept, they stay writable.
+        reader = NumPyFileReader(self.files2d, mmap_mode='c')
+        it = reader._create_iterator(chunk=7)
+        X = next(it)
+        self.assertTrue(X.flags.writeable)
+        self.assertFalse(np.shares_memory(it._array, reader._get_array(0)))
+        it.close()
+        self.assertIsNone(reader._pool)
+        np.testing.assert_equal(reader.get_output()[1], self.d2)
+
+        # loaded arrays are only kept up to max_loaded_bytes
+        reader = NumPyFileReader(self.files2d, mmap_mode=None, max_loaded_bytes=self.d2.nbytes)
+        reader.get_output()
+        self.assertEqual(len(reader._pool), 1)
+        reader = NumPyFileReader(self.files2d, mmap_mode=None, max_loaded_bytes=self.d2.nbytes - 1)
+        reader.get_output()
+        self.assertEqual(len(reader._pool), 0)
+
+        # only max_open_files are kept
+        reader = NumPyFileReader(self.files2d, max_open_files=1)
+        reader.get_output()
+        self.assertEqual(len(reader._pool), 1)
+
+        # pickling (eg. for worker processes) does not carry the open files.
+        from six.moves import cPickle as pickle
+        reader2 = pickle.loads(pickle.dumps(reader))
+        self.assertEqual(len(reader2._pool), 0)
+        np.testing.assert_equal(reader2.get_output()[1], self.d2)
+
+    def test_strided_chunks_are_views(self):
+        for mmap_mode in ('r', None):
+            reader = NumPyFileReader(self.f4, mmap_mode=mmap_mode)
+            for cols in (None, (0, 2), [1]):
+                it = reader._create_iterator(stride=3, chunk=10, cols=cols)
+                for X in it:
+                    self.assertTrue(np.shares_memory(X, it._array))
+                    self.assertFalse(X.flags.writeable)
+                np.testing.assert_equal(reader.get_output(stride=3, skip=1)[0], self.d2[1::3])
+            X = next(iter(reader.iterator(chunk=0, cols=(2, 0), return_trajindex=False)))
+            np.testing.assert_equal(X, self.d2[:, (2, 0)])
+
     def test_different_shapes_value_error(self):
         with tempfile.NamedTemporaryFile(delete=False, suffix='.npy') as f:
             x=np.zeros((3, 42))
@@ -28,7 +28,7 @@ import unittest
 
 import numpy as np
 
-from chainsaw import pca
+from chainsaw import pca, source
 from logging import getLogger
 from chainsaw.util import types
 from six.moves import range
@@ -185,5 +185,12 @@ class TestPCAExtensive(unittest.TestCase):
         np.testing.assert_allclose(pca_part.eigenvalues, ref.eigenvalues)
         np.testing.assert_allclose(pca_part.eigenvectors, ref.eigenvectors)
 
+    def test_parallel_estimation(self):
+        data = [np.random.random((L, 3)) for L in (300, 70, 150)]
+        ref = pca(data, stride=2)
+        parallel = pca(source(data, chunk_size=20), stride=2, n_jobs=2)
+        np.testing.assert_allclose(parallel.mean, ref.mean)
+        np.testing.assert_allclose(parallel.cov, ref.cov)
+
 if __name__ == "__main__":
     unittest.main()
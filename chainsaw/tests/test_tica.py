@@ -155,6 +155,28 @@ class TestTICA_Basic(unittest.TestCase):
         with self.assertRaises(ValueError):
             tica(trajs, lag=100)
 
+    def test_dimensions_pushdown(self):
+        data = [np.random.random((100, 10)), np.random.random((60, 10))]
+        tica_obj = api.tica(data, lag=10, dim=4, kinetic_map=True)
+        full = tica_obj.get_output()
+        for dimensions in ([3, 1], slice(1, 3), 2):
+            for Y, Y_full in zip(tica_obj.get_output(dimensions=dimensions), full):
+                np.testing.assert_allclose(Y, Y_full[:, dimensions].reshape(len(Y), -1))
+            cols = np.arange(4)[dimensions]
+            for itraj, X in tica_obj.iterator(cols=cols, chunk=30):
+                self.assertEqual(X.shape[1], np.atleast_1d(cols).shape[0])
+
+    def test_parallel_estimation(self):
+        data = [np.random.random((L, 4)) for L in (300, 70, 150, 5)]
+        serial = api.tica(data, lag=7, dim=2)
+        for chunk in (0, 20):
+            parallel = _internal_tica(lag=7, dim=2, n_jobs=2)
+            parallel.chunksize = chunk
+            parallel.estimate(data)
+            np.testing.assert_allclose(parallel.mean, serial.mean)
+            np.testing.assert_allclose(parallel.cov, serial.cov)
+            np.testing.assert_allclose(parallel.cov_tau, serial.cov_tau)
+
     def test_with_skip(self):
         data = np.random.random((100, 10))
         tica_obj = api.tica(lag=10, dim=1, skip=1)
@@ -0,0 +1,87 @@
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import mdtraj
+import mock
+import pkg_resources
+
+from chainsaw import config
+from chainsaw.data.util import topology_cache
+from chainsaw.util.contexts import settings
+
+
+class TestTopologyCache(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        path = pkg_resources.resource_filename('chainsaw.tests', 'data') + os.path.sep
+        cls.pdb_ca = os.path.join(path, 'bpti_ca.pdb')
+        cls.pdb_aa = os.path.join(path, 'opsin_aa_1_frame.pdb.gz')
+
+    def setUp(self):
+        self.old_cache_dir = config.cache_dir
+        self.cache_dir = tempfile.mkdtemp()
+        config.cache_dir = self.cache_dir
+        topology_cache._topologies.clear()
+
+    def tearDown(self):
+        config.cache_dir = self.old_cache_dir
+        topology_cache._topologies.clear()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_dump_load(self):
+        for f in (self.pdb_ca, self.pdb_aa):
+            top = mdtraj.load_topology(f)
+            out = os.path.join(self.cache_dir, 'top.npz')
+            topology_cache.dump_topology(top, out)
+            loaded = topology_cache.load_topology(out)
+            self.assertEqual(loaded, top)
+            self.assertEqual(loaded.n_bonds, top.n_bonds)
+            self.assertEqual([a.serial for a in loaded.atoms], [a.serial for a in top.atoms])
+            self.assertEqual([c.chain_id for c in loaded.chains], [c.chain_id for c in top.chains])
+
+    def test_shared_by_processes(self):
+        top = topology_cache.load_topology_cached(self.pdb_aa)
+        # the same object is returned within a process.
+        self.assertIs(topology_cache.load_topology_cached(self.pdb_aa), top)
+        self.assertEqual(len(os.listdir(os.path.join(self.cache_dir, 'topologies'))), 1)
+
+        # a new process (without topologies in memory) does not parse the file again.
+        topology_cache._topologies.clear()
+        with mock.patch('mdtraj.load_topology') as load:
+            top2 = topology_cache.load_topology_cached(self.pdb_aa)
+            load.assert_not_called()
+        self.assertIsNot(top2, top)
+        self.assertEqual(top2, top)
+
+    def test_disabled(self):
+        with settings(cache_topologies=False):
+            top = topology_cache.load_topology_cached(self.pdb_ca)
+        self.assertEqual(top, mdtraj.load_topology(self.pdb_ca))
+        self.assertFalse(os.path.exists(os.path.join(self.cache_dir, 'topologies')))
+
+    def test_corrupted_file(self):
+        top = topology_cache.load_topology_cached(self.pdb_ca)
+        cache_dir = os.path.join(self.cache_dir, 'topologies')
+        cache_file = os.path.join(cache_dir, os.listdir(cache_dir)[0])
+        with open(cache_file, 'wb') as fh:
+            fh.write(b'garbage')
+        topology_cache._topologies.clear()
+        self.assertEqual(topology_cache.load_topology_cached(self.pdb_ca), top)
+
+    def test_featurizer(self):
+        import chainsaw
+        feat = chainsaw.featurizer(self.pdb_ca)
+        topology_cache._topologies.clear()
+        with mock.patch('mdtraj.load_topology') as load:
+            feat2 = chainsaw.featurizer(self.pdb_ca)
+            load.assert_not_called()
+        self.assertEqual(feat.topology, feat2.topology)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -46,6 +46,24 @@ from chainsaw.util.files import TemporaryDirectory
 xtcfiles, pdbfile = get_bpti_test_data()
 
 
+def _concurrent_lookups(db_file, reader, seed, n_iter, queue):
+    # performs lookups of random subsets of the readers files on a shared database.
+    try:
+        random = np.random.RandomState(seed)
+        db = TrajectoryInfoCache(db_file)
+        lengths = {}
+        for _ in range(n_iter):
+            files = [reader.filenames[i] for i in
+                     random.choice(len(reader.filenames), size=len(reader.filenames) // 2, replace=False)]
+            for f, info in zip(files, db.get_many(files, reader, n_jobs=2)):
+                lengths[f] = info.length
+        db.close()
+        queue.put(('ok', lengths))
+    except Exception:
+        import traceback
+        queue.put(('error', traceback.format_exc()))
+
+
 class TestTrajectoryInfoCache(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
@@ -233,6 +251,113 @@ class TestTrajectoryInfoCache(unittest.TestCase):
         r = api.source(xtcfiles[0], top=pdbfile)
         db[xtcfiles[0], r]
 
+    def test_get_many(self):
+        with settings(use_trajectory_lengths_cache=False):
+            reader = FeatureReader(xtcfiles, pdbfile)
+        expected = [reader._get_traj_info(f) for f in xtcfiles]
+
+        calls = []
+        with mock.patch.object(self.db._database, 'set_many', wraps=self.db._database.set_many) as set_many:
+            infos = self.db.get_many(xtcfiles, reader, n_jobs=3, callback=lambda: calls.append(1))
+            # all new entries are written at once
+            set_many.assert_called_once()
+        self.assertEqual(len(calls), len(xtcfiles))
+        self.assertEqual(self.db.num_entries, len(xtcfiles))
+        for info, exp in zip(infos, expected):
+            self.assertEqual((info.length, info.ndim), (exp.length, exp.ndim))
+            np.testing.assert_equal(info.offsets, exp.offsets)
+
+        # second lookup only hits the cache
+        with mock.patch.object(reader, '_get_traj_info') as get_traj_info:
+            infos2 = self.db.get_many(list(reversed(xtcfiles)), reader, n_jobs=2)
+            get_traj_info.assert_not_called()
+        self.assertEqual([(i.hash_value, i.length) for i in reversed(infos2)],
+                         [(i.hash_value, i.length) for i in infos])
+
+    def test_single_lookups_defer_time_stamps(self):
+        with settings(use_trajectory_lengths_cache=False):
+            reader = FeatureReader(xtcfiles, pdbfile)
+        self.db.get_many(xtcfiles, reader)
+        with mock.patch.object(self.db._database, '_flush_time_stamps',
+                               wraps=self.db._database._flush_time_stamps) as flush:
+            for f in xtcfiles:
+                self.db[f, reader]
+            flush.assert_not_called()
+            self.assertEqual(len(self.db._database._pending_time_stamps), len(xtcfiles))
+            # written by the next batch lookup
+            self.db.get_many(xtcfiles[:1], reader)
+            flush.assert_called_once()
+        self.assertEqual(self.db._database._pending_time_stamps, {})
+
+    def test_stat_hash_policy(self):
+        with settings(use_trajectory_lengths_cache=False):
+            reader = FeatureReader(xtcfiles, pdbfile)
+        content_infos = self.db.get_many(xtcfiles, reader, n_jobs=2)
+
+        with settings(traj_info_hash_policy='stat'):
+            # entries stored with the content policy are found by sampling the files once.
+            with mock.patch.object(reader, '_get_traj_info') as get_traj_info:
+                infos = self.db.get_many(xtcfiles, reader, n_jobs=2)
+                get_traj_info.assert_not_called()
+            self.assertEqual([i.length for i in infos], [i.length for i in content_infos])
+            self.assertNotEqual([i.hash_value for i in infos], [i.hash_value for i in content_infos])
+            self.assertEqual(self.db.num_entries, 2 * len(xtcfiles))
+
+            # afterwards no file is opened anymore.
+            with mock.patch.object(self.db, '_get_file_hash_v2') as content_hash, \
+                    mock.patch.object(reader, '_get_traj_info') as get_traj_info:
+                infos2 = self.db.get_many(xtcfiles, reader, n_jobs=2)
+                content_hash.assert_not_called()
+                get_traj_info.assert_not_called()
+            self.assertEqual([i.hash_value for i in infos2], [i.hash_value for i in infos])
+
+        # the content policy still finds its own entries.
+        with mock.patch.object(reader, '_get_traj_info') as get_traj_info:
+            self.db.get_many(xtcfiles, reader, n_jobs=2)
+            get_traj_info.assert_not_called()
+
+        with self.assertRaises(ValueError):
+            config.traj_info_hash_policy = 'inode'
+
+    def test_concurrent_processes(self):
+        import multiprocessing
+        import sqlite3
+        n_files, n_procs = 40, 6
+        with TemporaryDirectory() as td:
+            files = []
+            for i in range(n_files):
+                f = os.path.join(td, "%i.npy" % i)
+                np.save(f, np.empty((i + 1, 2)))
+                files.append(f)
+            with settings(use_trajectory_lengths_cache=False):
+                reader = NumPyFileReader(files)
+
+            queue = multiprocessing.Queue()
+            procs = [multiprocessing.Process(target=_concurrent_lookups,
+                                             args=(self.tmpfile, reader, seed, 5, queue))
+                     for seed in range(n_procs)]
+            for p in procs:
+                p.start()
+            results = [queue.get(timeout=120) for _ in procs]
+            for p in procs:
+                p.join()
+
+        for status, value in results:
+            self.assertEqual(status, 'ok', msg=value)
+            for f, length in value.items():
+                self.assertEqual(length, files.index(f) + 1)
+        self.assertEqual(self.db.num_entries, n_files)
+
+        # every entry got exactly one access time in the usage databases
+        usage_dir = os.path.join(self.work_dir, 'traj_info_usage')
+        n_time_stamps = 0
+        for db in os.listdir(usage_dir):
+            if db.endswith('.db'):
+                conn = sqlite3.connect(os.path.join(usage_dir, db))
+                n_time_stamps += conn.execute("SELECT COUNT(*) FROM usage").fetchone()[0]
+                conn.close()
+        self.assertEqual(n_time_stamps, n_files)
+
     def test_n_entries(self):
         self.assertEqual(self.db.num_entries, 0)
         assert TrajectoryInfoCache._instance is self.db
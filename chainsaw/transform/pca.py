@@ -29,6 +29,7 @@ from decorator import decorator
 from chainsaw.base.reporter import ProgressReporter
 from chainsaw.base.model import Model
 from chainsaw.util.reflection import get_default_args
+from chainsaw.util.buffers import empty
 
 
 __all__ = ['PCA']
@@ -54,7 +55,7 @@ class PCAModel(Model):
 class PCA(StreamingTransformer, ProgressReporter):
     r""" Principal component analysis."""
 
-    def __init__(self, dim=-1, var_cutoff=0.95, mean=None, stride=1, skip=0):
+    def __init__(self, dim=-1, var_cutoff=0.95, mean=None, stride=1, skip=0, n_jobs=None):
         r""" Principal component analysis.
 
         Given a sequence of multivariate data :math:`X_t`,
@@ -91,6 +92,10 @@ class PCA(StreamingTransformer, ProgressReporter):
             Optionally pass pre-calculated means to avoid their re-computation.
             The shape has to match the input dimension.
 
+        n_jobs : int, default=None
+            if greater than one, the input is read (and featurized) by this many worker
+            processes, while the moments are accumulated in this process.
+
         """
         super(PCA, self).__init__()
         default_var_cutoff = get_default_args(self.__init__)['var_cutoff']
@@ -98,7 +103,7 @@ class PCA(StreamingTransformer, ProgressReporter):
             raise ValueError('Trying to set both the number of dimension and the subspace variance. Use either or.')
 
         self._model = PCAModel()
-        self.set_params(dim=dim, var_cutoff=var_cutoff, mean=mean, stride=stride, skip=skip)
+        self.set_params(dim=dim, var_cutoff=var_cutoff, mean=mean, stride=stride, skip=skip, n_jobs=n_jobs)
 
     def describe(self):
         return "[PCA, output dimension = %i]" % self.dim
@@ -198,7 +203,7 @@ class PCA(StreamingTransformer, ProgressReporter):
         partial_fit = 'partial' in kw
 
         with iterable.iterator(return_trajindex=False, chunk=self.chunksize,
-                               stride=self.stride, skip=self.skip) as it:
+                               stride=self.stride, skip=self.skip, n_jobs=self.n_jobs) as it:
             n_chunks = it._n_chunks
             self._progress_register(n_chunks, "calc mean+cov", 0)
             self._init_covar(partial_fit, n_chunks)
@@ -216,12 +221,19 @@ class PCA(StreamingTransformer, ProgressReporter):
 
         return self._model
 
-    def _transform_array(self, X):
+    def _transform_array(self, X, buffers=None, cols=None):
         r"""
         Projects the data onto the dominant principal components.
         :param X: the input data
+        :param buffers: optional ChunkBuffers to reuse the memory of
+        :param cols: optional, only project onto these principal components
         :return: the projected data
         """
-        X_meanfree = X - self._model.mean
-        Y = np.dot(X_meanfree, self._model.eigenvectors[:, 0:self.dimension()])
+        V = self._model.eigenvectors[:, 0:self.dimension()]
+        if cols is not None:
+            V = V[:, np.atleast_1d(np.arange(self.dimension())[cols])]
+        X_meanfree = empty(buffers, self, 'meanfree', X.shape, np.result_type(X, self._model.mean))
+        np.subtract(X, self._model.mean, out=X_meanfree)
+        Y = empty(buffers, self, 'Y', (X.shape[0], V.shape[1]), np.result_type(X_meanfree, V))
+        np.dot(X_meanfree, V, out=Y)
         return Y
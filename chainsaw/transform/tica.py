@@ -27,6 +27,7 @@ from math import log
 import numpy as np
 from chainsaw._ext.variational_estimators import running_covar
 from chainsaw.util.annotators import fix_docs, deprecated
+from chainsaw.util.buffers import empty
 from decorator import decorator
 from chainsaw.base.model import Model
 from chainsaw.util.linalg import eig_corr
@@ -59,7 +60,7 @@ class TICA(StreamingTransformer):
     r""" Time-lagged independent component analysis (TICA)"""
 
     def __init__(self, lag, dim=-1, var_cutoff=0.95, kinetic_map=True, epsilon=1e-6,
-                 mean=None, stride=1, remove_mean=True, skip=0):
+                 mean=None, stride=1, remove_mean=True, skip=0, n_jobs=None):
         r""" Time-lagged independent component analysis (TICA) [1]_, [2]_, [3]_.
 
         Parameters
@@ -87,6 +88,9 @@ class TICA(StreamingTransformer):
             remove mean during covariance estimation. Should not be turned off.
         skip : int, default=0
             skip the first initial n frames per trajectory.
+        n_jobs : int, default=None
+            if greater than one, the input is read (and featurized) by this many worker
+            processes, while the moments are accumulated in this process.
 
         Notes
         -----
@@ -139,7 +143,8 @@ class TICA(StreamingTransformer):
         # empty dummy model instance
         self._model = TICAModel()
         self.set_params(lag=lag, dim=dim, var_cutoff=var_cutoff, kinetic_map=kinetic_map,
-                        epsilon=epsilon, mean=mean, stride=stride, remove_mean=remove_mean, skip=skip)
+                        epsilon=epsilon, mean=mean, stride=stride, remove_mean=remove_mean, skip=skip,
+                        n_jobs=n_jobs)
 
     @property
     def lag(self):
@@ -287,7 +292,8 @@ class TICA(StreamingTransformer):
         self.logger.debug("will use {} total frames for {}".
                           format(iterable.trajectory_lengths(self.stride, skip=self.skip), self.name))
 
-        it = iterable.iterator(lag=self.lag, return_trajindex=False, chunk=self.chunksize, skip=self.skip)
+        it = iterable.iterator(lag=self.lag, return_trajindex=False, chunk=self.chunksize, skip=self.skip,
+                               n_jobs=self.n_jobs)
         with it:
             self._progress_register(it._n_chunks, "calculate mean+cov", 0)
             self._init_covar(partial_fit, it._n_chunks)
@@ -325,23 +331,35 @@ class TICA(StreamingTransformer):
 
         self._estimated = True
 
-    def _transform_array(self, X):
+    def _transform_array(self, X, buffers=None, cols=None):
         r"""Projects the data onto the dominant independent components.
 
         Parameters
         ----------
         X : ndarray(n, m)
             the input data
+        buffers : ChunkBuffers, optional
+            reuse the memory of these buffers for the result.
+        cols : array like, optional
+            only project onto these independent components.
 
         Returns
         -------
         Y : ndarray(n,)
             the projected data
         """
-        X_meanfree = X - self.mean
-        Y = np.dot(X_meanfree, self.eigenvectors[:, 0:self.dimension()])
+        V = self.eigenvectors[:, 0:self.dimension()]
+        eigenvalues = self.eigenvalues[0:self.dimension()]
+        if cols is not None:
+            cols = np.atleast_1d(np.arange(self.dimension())[cols])
+            V = V[:, cols]
+            eigenvalues = eigenvalues[cols]
+        X_meanfree = empty(buffers, self, 'meanfree', X.shape, np.result_type(X, self.mean))
+        np.subtract(X, self.mean, out=X_meanfree)
+        Y = empty(buffers, self, 'Y', (X.shape[0], V.shape[1]), np.result_type(X_meanfree, V))
+        np.dot(X_meanfree, V, out=Y)
         if self.kinetic_map:  # scale by eigenvalues
-            Y *= self.eigenvalues[0:self.dimension()]
+            Y *= eigenvalues
         return Y
 
     @property
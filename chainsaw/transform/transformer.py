@@ -31,6 +31,7 @@ from chainsaw.util.change_notification import (inform_children_upon_change,
                                                NotifyOnChangesMixIn)
 from chainsaw.util.annotators import fix_docs
 from chainsaw.util.exceptions import NotConvergedWarning
+from chainsaw.util.reflection import getargspec_no_self
 from six.moves import range
 import numpy as np
 
@@ -103,6 +104,13 @@ class Transformer(six.with_metaclass(ABCMeta, TransformerMixin)):
             The projected data, where T is the number of time steps of the
             input data and d is the output dimension of this transformer.
 
+        Notes
+        -----
+        Implementations may accept an optional argument buffers (a
+        :class:`chainsaw.util.buffers.ChunkBuffers` instance or None). If given,
+        the result (and intermediate arrays) should be stored in arrays obtained
+        from it, to avoid allocating new memory for every chunk.
+
         """
         pass
 
@@ -200,11 +208,11 @@ class StreamingTransformer(Transformer, Estimator, DataSource, NotifyOnChangesMi
 
         return self
 
-    def get_output(self, dimensions=slice(0, None), stride=1, skip=0, chunk=None):
+    def get_output(self, dimensions=slice(0, None), stride=1, skip=0, chunk=None, n_jobs=None, out=None):
         if not self._estimated:
             self.estimate(self.data_producer, stride=stride)
 
-        return super(StreamingTransformer, self).get_output(dimensions, stride, skip, chunk)
+        return super(StreamingTransformer, self).get_output(dimensions, stride, skip, chunk, n_jobs, out)
 
     def parametrize(self, stride=1):
         if self._data_producer is None:
@@ -215,17 +223,63 @@ class StreamingTransformer(Transformer, Estimator, DataSource, NotifyOnChangesMi
 
     @property
     def chunksize(self):
-        """chunksize defines how much data is being processed at once."""
+        """chunksize defines how much data is being processed at once.
+
+        If it is 'auto', the number of frames is chosen so that the output of no
+        stage of the chain exceeds the memory budget.
+        """
+        if self._chunksize_auto:
+            return self._auto_chunksize()
         if not self.data_producer:
             return self._default_chunksize
         return self.data_producer.chunksize
 
     @chunksize.setter
     def chunksize(self, size):
-        if not size >= 0:
+        if isinstance(size, six.string_types):
+            Iterable._check_chunksize(size)
+        elif not size >= 0:
             raise ValueError("chunksize has to be positive")
+        else:
+            size = int(size)
+
+        if not self.data_producer:
+            self._default_chunksize = size
+        else:
+            self.data_producer.chunksize = size
+
+    @property
+    def _chunksize_auto(self):
+        # the chunksize of the chain is stored in its first stage.
+        if not self.data_producer:
+            return super(StreamingTransformer, self)._chunksize_auto
+        return self.data_producer._chunksize_auto
 
-        self.data_producer.chunksize = int(size)
+    @property
+    def chunk_bytes(self):
+        if not self.data_producer:
+            return self._chunk_bytes
+        return self.data_producer.chunk_bytes
+
+    @chunk_bytes.setter
+    def chunk_bytes(self, value):
+        if not self.data_producer:
+            self._chunk_bytes = value
+            if value is not None:
+                self.chunksize = 'auto'
+        else:
+            self.data_producer.chunk_bytes = value
+
+    def _bytes_per_frame(self):
+        # all stages of the chain process chunks of the same number of frames, so the largest one counts.
+        try:
+            own = super(StreamingTransformer, self)._bytes_per_frame()
+        except RuntimeError:
+            # output dimension not known before the estimation.
+            own = 0
+        if not self.data_producer:
+            return own
+        return max(own, self.data_producer._bytes_per_frame())
 
     def number_of_trajectories(self):
         return self.data_producer.number_of_trajectories()
@@ -249,13 +303,30 @@ class StreamingTransformerIterator(DataSourceIterator):
             skip=skip, chunk=chunk, stride=stride, return_trajindex=return_trajindex, cols=cols
         )
         self.state = self._it.state
+        args = getargspec_no_self(self._data_source._transform_array).args
+        self._transform_with_buffers = 'buffers' in args
+        self._transform_with_cols = 'cols' in args
 
     def close(self):
         self._it.close()
 
-    def _next_chunk(self):
+    def _select_trajectory(self, itraj):
+        self._it._select_trajectory(itraj)
+
+    def _next_chunk_cols(self):
+        if self.use_cols is None or not self._transform_with_cols:
+            return super(StreamingTransformerIterator, self)._next_chunk_cols()
+        # let the transformer compute the requested output columns only
+        return self._next_chunk(cols=self.use_cols)
+
+    def _next_chunk(self, cols=None):
         X = self._it._next_chunk()
-        return self._data_source._transform_array(X)
+        kw = {}
+        if self.state.buffers is not None and self._transform_with_buffers:
+            kw['buffers'] = self.state.buffers
+        if cols is not None:
+            kw['cols'] = cols
+        return self._data_source._transform_array(X, **kw)
 
 
 class StreamingTransformerRandomAccessStrategy(RandomAccessStrategy):
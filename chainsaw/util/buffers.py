@@ -0,0 +1,86 @@
+# This file is part of PyEMMA.
+#
+# Copyright (c) 2015, 2014 Computational Molecular Biology Group, Freie Universitaet Berlin (GER)
+#
+# PyEMMA is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import
+
+import numpy as np
+
+__all__ = ['ChunkBuffers', 'empty']
+
+
+class ChunkBuffers(object):
+    """ Pool of arrays, which are reused for every chunk of an iterator.
+
+    Every stage of a pipeline requests its output (and scratch) arrays by a name, so no new memory
+    has to be allocated for the next chunk. The arrays are only valid until the pool advances to the
+    same slot again, so n_slots chunks can be alive at the same time (eg. if chunks are read ahead).
+
+    Parameters
+    ----------
+    n_slots : int, default=1
+        number of chunks, which can be alive at the same time.
+    """
+
+    def __init__(self, n_slots=1):
+        if n_slots < 1:
+            raise ValueError("n_slots has to be positive, but was %s" % n_slots)
+        self._slots = [{} for _ in range(n_slots)]
+        self._current = 0
+
+    @property
+    def n_slots(self):
+        return len(self._slots)
+
+    def next_slot(self):
+        """ advance to the next slot, called once per chunk by the iterator. """
+        self._current = (self._current + 1) % len(self._slots)
+
+    def empty(self, owner, name, shape, dtype):
+        """ returns an uninitialized array of given shape and dtype, reusing memory of previous chunks.
+
+        Parameters
+        ----------
+        owner : object
+            the stage requesting the array (eg. a transformer), so that equally named buffers of
+            different stages do not collide.
+        name : str
+            name of the buffer.
+        shape : tuple
+            shape of the array, only the first dimension (number of frames) may vary between calls.
+        dtype : numpy dtype
+            type of the array.
+
+        Returns
+        -------
+        array : ndarray
+            a C-contiguous view of the buffer.
+        """
+        slot = self._slots[self._current]
+        key = (id(owner), name)
+        buf = slot.get(key, None)
+        dtype = np.dtype(dtype)
+        if buf is None or buf.dtype != dtype or buf.shape[1:] != tuple(shape[1:]) or len(buf) < shape[0]:
+            buf = np.empty(shape, dtype=dtype)
+            slot[key] = buf
+        return buf[:shape[0]]
+
+
+def empty(buffers, owner, name, shape, dtype):
+    """ returns an array from given ChunkBuffers, or a new one if buffers is None. """
+    if buffers is None:
+        return np.empty(shape, dtype=dtype)
+    return buffers.empty(owner, name, shape, dtype)
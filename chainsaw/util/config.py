@@ -32,9 +32,14 @@ import pkg_resources
 
 # for IDE stupidity, just add a new cfg var here, if you add a property to Wrapper
 cache_dir = cfg_dir = default_config_file = default_logging_config = logging_config = \
-    show_progress_bars = used_filenames = use_trajectory_lengths_cache = None
+    show_progress_bars = used_filenames = use_trajectory_lengths_cache = iterator_prefetch = memory_budget = \
+    traj_info_n_jobs = traj_info_hash_policy = cache_max_size = cache_memory_size = cache_stages = cache_topologies = None
 
 __all__ = ('cache_dir',
+           'cache_max_size',
+           'cache_memory_size',
+           'cache_stages',
+           'cache_topologies',
            'cfg_dir',
            'default_config_file',
            'default_logging_file',
@@ -44,6 +49,10 @@ __all__ = ('cache_dir',
            'use_trajectory_lengths_cache',
            'traj_info_max_entries',
            'traj_info_max_size',
+           'traj_info_n_jobs',
+           'traj_info_hash_policy',
+           'iterator_prefetch',
+           'memory_budget',
            )
 
 if six.PY2:
@@ -330,6 +339,51 @@ In order to load a pre-saved configuration file, use the :py:func:`load` method:
         value = os.path.abspath(value)
         self._conf_values.set('chainsaw', 'cache_dir', value)
 
+    @property
+    def cache_max_size(self):
+        """ Size (in MB) all cache files in the cache directory may occupy, zero means no limit.
+
+        If exceeded, the least recently used cache entries are evicted.
+        """
+        return self._conf_values.getint('chainsaw', 'cache_max_size')
+
+    @cache_max_size.setter
+    def cache_max_size(self, val):
+        val = int(val)
+        if val < 0:
+            raise ValueError("cache_max_size has to be non-negative")
+        self._conf_values.set('chainsaw', 'cache_max_size', str(val))
+
+    @property
+    def cache_memory_size(self):
+        """ Memory (in MB) caches may use to keep recently used trajectories as arrays, zero disables it. """
+        return self._conf_values.getint('chainsaw', 'cache_memory_size')
+
+    @cache_memory_size.setter
+    def cache_memory_size(self, val):
+        val = int(val)
+        if val < 0:
+            raise ValueError("cache_memory_size has to be non-negative")
+        self._conf_values.set('chainsaw', 'cache_memory_size', str(val))
+
+    @property
+    def cache_stages(self):
+        """ Cache the output of every file based stage, which is used as input by the API functions. """
+        return self._conf_values.getboolean('chainsaw', 'cache_stages')
+
+    @cache_stages.setter
+    def cache_stages(self, val):
+        self._conf_values.set('chainsaw', 'cache_stages', str(bool(val)))
+
+    @property
+    def cache_topologies(self):
+        """ Store parsed topologies in the cache directory, so they are loaded faster by every process. """
+        return self._conf_values.getboolean('chainsaw', 'cache_topologies')
+
+    @cache_topologies.setter
+    def cache_topologies(self, val):
+        self._conf_values.set('chainsaw', 'cache_topologies', str(bool(val)))
+
     @property
     def logging_config(self):
         cfg = self._conf_values.get('chainsaw', 'logging_config')
@@ -368,6 +422,31 @@ In order to load a pre-saved configuration file, use the :py:func:`load` method:
         val = str(int(val))
         self._conf_values.set('chainsaw', 'traj_info_max_size', val)
 
+    @property
+    def traj_info_n_jobs(self):
+        """ Number of threads used to hash and scan files not yet in the trajectory info cache. """
+        return self._conf_values.getint('chainsaw', 'traj_info_n_jobs')
+
+    @traj_info_n_jobs.setter
+    def traj_info_n_jobs(self, val):
+        val = int(val)
+        if val < 1:
+            raise ValueError("traj_info_n_jobs has to be positive")
+        self._conf_values.set('chainsaw', 'traj_info_n_jobs', str(val))
+
+    @property
+    def traj_info_hash_policy(self):
+        """ How files are identified in the trajectory info cache: 'content' hashes name, size, mtime and the
+        first kilobyte of every file, 'stat' only uses name, inode, size and mtime (no file is opened). """
+        return self._conf_values.get('chainsaw', 'traj_info_hash_policy')
+
+    @traj_info_hash_policy.setter
+    def traj_info_hash_policy(self, val):
+        val = str(val)
+        if val not in ('content', 'stat'):
+            raise ValueError("traj_info_hash_policy has to be 'content' or 'stat', but was '%s'" % val)
+        self._conf_values.set('chainsaw', 'traj_info_hash_policy', val)
+
     @property
     def show_progress_bars(self):
         return self._conf_values.getboolean('chainsaw', 'show_progress_bars')
@@ -384,6 +463,33 @@ In order to load a pre-saved configuration file, use the :py:func:`load` method:
     def use_trajectory_lengths_cache(self, val):
         self._conf_values.set('chainsaw', 'use_trajectory_lengths_cache', str(val))
 
+    @property
+    def iterator_prefetch(self):
+        """ How many chunks are read ahead by a background thread, if not given to iterator(). """
+        return self._conf_values.getint('chainsaw', 'iterator_prefetch')
+
+    @iterator_prefetch.setter
+    def iterator_prefetch(self, val):
+        val = int(val)
+        if val < 0:
+            raise ValueError("iterator_prefetch has to be non-negative")
+        self._conf_values.set('chainsaw', 'iterator_prefetch', str(val))
+
+    @property
+    def memory_budget(self):
+        """ Memory (in MB) a single stage should use at most, zero means no limit.
+
+        Determines the chunksize of iterables with chunksize='auto' and the amount of data k-means keeps in memory.
+        """
+        return self._conf_values.getint('chainsaw', 'memory_budget')
+
+    @memory_budget.setter
+    def memory_budget(self, val):
+        val = int(val)
+        if val < 0:
+            raise ValueError("memory_budget has to be non-negative")
+        self._conf_values.set('chainsaw', 'memory_budget', str(val))
+
     @property
     def show_config_notification(self):
         return self._conf_values.getboolean('chainsaw', 'show_config_notification')
@@ -29,6 +29,11 @@ import errno
 import tempfile
 import shutil
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
 
 def mkdir_p(path):
     try:
@@ -70,4 +75,72 @@ class TemporaryDirectory(object):
         return self.tmpdir
 
     def __exit__(self, *args):
-        shutil.rmtree(self.tmpdir, ignore_errors=True)
\ No newline at end of file
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+class FileLock(object):
+    """ Advisory lock on a file, which coordinates several processes (eg. sharing a cache directory).
+
+    Uses flock, so the lock is released by the operating system, if the owning process dies. Two
+    instances conflict even within the same process. The lock file may be removed by its holder, the
+    lock is then acquired on a new file. On platforms without fcntl (Windows) locking is a no-op.
+
+    Examples
+    --------
+    >>> with TemporaryDirectory() as tmp:
+    ...    lock = FileLock(os.path.join(tmp, "lock"))
+    ...    lock.acquire()
+    ...    FileLock(lock.path).acquire(blocking=False)
+    ...    lock.release()
+    True
+    False
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fh = None
+
+    @property
+    def locked(self):
+        return self._fh is not None
+
+    def acquire(self, exclusive=True, blocking=True):
+        """ acquires the lock, returns False if it is held by someone else and blocking is False. """
+        if self._fh is not None:
+            raise RuntimeError("lock {} already acquired".format(self.path))
+        while True:
+            fh = open(self.path, 'a')
+            if fcntl is None:
+                break
+            flags = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+            if not blocking:
+                flags |= fcntl.LOCK_NB
+            try:
+                fcntl.flock(fh.fileno(), flags)
+            except (IOError, OSError) as e:
+                fh.close()
+                if not blocking and e.errno in (errno.EAGAIN, errno.EACCES):
+                    return False
+                raise
+            # the previous holder might have removed the file, while we were waiting for it.
+            try:
+                if os.fstat(fh.fileno()).st_ino == os.stat(self.path).st_ino:
+                    break
+            except OSError:
+                pass
+            fh.close()
+        self._fh = fh
+        return True
+
+    def release(self):
+        if self._fh is not None:
+            if fcntl is not None:
+                fcntl.flock(self._fh.fileno(), fcntl.LOCK_UN)
+            self._fh.close()
+            self._fh = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
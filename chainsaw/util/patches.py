@@ -37,37 +37,12 @@ from itertools import groupby
 from operator import itemgetter, attrgetter
 
 from chainsaw.data.util.reader_utils import copy_traj_attributes, preallocate_empty_trajectory
+from chainsaw.data.util.topology_cache import load_topology_cached
 from six.moves import map
 
 TrajData = namedtuple("traj_data", ('xyz', 'unitcell_lengths', 'unitcell_angles', 'box'))
 
 
-def _cache_mdtraj_topology(args):
-    import hashlib
-    from mdtraj import load_topology as md_load_topology
-    _top_cache = {}
-
-    def wrap(top_file):
-        if isinstance(top_file, Topology):
-            return top_file
-        hasher = hashlib.md5()
-        with open(top_file, 'rb') as f:
-            hasher.update(f.read())
-        hash = hasher.hexdigest()
-
-        if hash in _top_cache:
-            top = _top_cache[hash]
-        else:
-            top = md_load_topology(top_file)
-            _top_cache[hash] = top
-        return top
-
-    return wrap
-
-
-load_topology_cached = _cache_mdtraj_topology(load_topology)
-
-
 class iterload(object):
     def __init__(self, filename, chunk=1000, **kwargs):
         """An iterator over a trajectory from one or more files on disk, in fragments
@@ -124,6 +99,7 @@ class iterload(object):
         self._extension = _get_extension(self._filename)
         self._closed = False
         self._seeked = False
+        self._subset_topology = None
         if self._extension not in _TOPOLOGY_EXTS:
             self._topology = load_topology_cached(self._top)
         else:
@@ -153,6 +129,16 @@ class iterload(object):
             if hasattr(self._f, 'offsets') and offsets is not None:
                 self._f.offsets = offsets
 
+    @property
+    def _join_topology(self):
+        # topology of the chunks read in random access mode, the subset of the atoms is only created once.
+        if self._subset_topology is None:
+            top = load_topology_cached(self._topology)
+            if self._atom_indices is not None:
+                top = top.subset(self._atom_indices)
+            self._subset_topology = top
+        return self._subset_topology
+
     @property
     def skip(self):
         return self._skip
@@ -192,7 +178,8 @@ class iterload(object):
             # TODO: this will first apply stride, then skip!
             if self._extension not in _TOPOLOGY_EXTS:
                 self._kwargs['top'] = self._top
-            traj = load(self._filename, stride=self._stride, **self._kwargs)[self.skip:]
+            traj = load(self._filename, stride=self._stride, atom_indices=self._atom_indices,
+                        **self._kwargs)[self.skip:]
         elif isinstance(self._stride, np.ndarray):
             return next(self._ra_it)
         else:
@@ -234,7 +221,7 @@ class iterload(object):
                     coords.append(local_traj_data)
                     curr_size += len(grouped_stride)
                 if curr_size == chunksize:
-                    yield _join_traj_data(coords, self._topology)
+                    yield _join_traj_data(coords, self._join_topology)
                     curr_size = 0
                     coords = []
                 while leftovers:
@@ -244,11 +231,11 @@ class iterload(object):
                     leftovers = leftovers[min(chunksize, len(leftovers)):]
                     curr_size += len(local_chunk)
                     if curr_size == chunksize:
-                        yield _join_traj_data(coords, self._topology)
+                        yield _join_traj_data(coords, self._join_topology)
                         curr_size = 0
                         coords = []
             if coords:
-                yield _join_traj_data(coords, self._topology)
+                yield _join_traj_data(coords, self._join_topology)
 
             raise StopIteration("delivered all RA indices")
 
@@ -331,8 +318,7 @@ def _read_traj_data(atom_indices, f, n_frames, **kwargs):
     return TrajData(xyz, cell_lengths, cell_angles, box)
 
 
-def _join_traj_data(traj_data, top_file):
-    top = load_topology_cached(top_file)
+def _join_traj_data(traj_data, top):
     xyz = np.concatenate(tuple(map(itemgetter(0), traj_data)))
 
     traj = Trajectory(xyz, top)